@@ -0,0 +1,79 @@
+"""Synthetic, seeded configs that look like a large company/family secret santa."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import numpy as np
+
+# Average number of people sharing an office or a household.
+OFFICE_SIZE = 25
+HOUSEHOLD_SIZE = 3
+
+CONSTRAINTS: list[dict[str, str]] = [
+    {
+        "relationship_key": "partner",
+        "comparator": "either contains",
+        "limit": "exclude",
+    },
+    {"relationship_key": "household", "comparator": "equality", "limit": "exclude"},
+    {
+        "relationship_key": "office",
+        "comparator": "equality",
+        "limit": "medium-probability",
+    },
+    {
+        "relationship_key": "last-year",
+        "comparator": "one-way contains",
+        "limit": "low-probability",
+    },
+]
+
+
+def make_config_data(n_people: int, seed: int) -> dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    names = [f"person-{i}" for i in range(n_people)]
+
+    # pair up half of the people as partners
+    partners = rng.permutation(n_people)[: n_people // 2 * 2].reshape(-1, 2)
+    partner_of: dict[int, int] = {}
+    for a, b in partners.tolist():
+        partner_of[a] = b
+        partner_of[b] = a
+
+    households = rng.integers(0, max(1, n_people // HOUSEHOLD_SIZE), size=n_people)
+    offices = rng.integers(0, max(1, n_people // OFFICE_SIZE), size=n_people)
+    last_year = rng.integers(0, n_people, size=n_people)
+
+    people: list[dict[str, Any]] = []
+    for i, name in enumerate(names):
+        relationships: dict[str, list[str]] = {
+            "household": [f"household-{households[i]}"],
+            "office": [f"office-{offices[i]}"],
+            "last-year": [names[last_year[i]]],
+        }
+        if i in partner_of:
+            relationships["partner"] = [names[partner_of[i]]]
+
+        people.append(
+            {
+                "name": name,
+                "email": f"{name}@example.com",
+                "relationships": relationships,
+            }
+        )
+
+    return {"people": people, "constraints": CONSTRAINTS}
+
+
+def make_config_json(n_people: int, seed: int) -> str:
+    return json.dumps(make_config_data(n_people, seed))
+
+
+def make_people_lines(n_people: int, seed: int) -> list[str]:
+    data = make_config_data(n_people, seed)
+    return [
+        json.dumps({"constraints": data["constraints"]}),
+        *(json.dumps(person) for person in data["people"]),
+    ]
@@ -0,0 +1,294 @@
+"""Benchmark the main stages of generating a secret santa at realistic scales.
+
+Every (stage, size) pair runs in a fresh process, so one stage's memory use doesn't
+hide the next one's and a stage that runs out of memory doesn't stop the run. The
+results are written as JSON so that they can be diffed between versions.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from importlib.metadata import PackageNotFoundError, version
+import json
+from multiprocessing import get_context
+from pathlib import Path
+import platform
+import time
+from typing import Annotated, Any, Literal, Optional
+
+from pydantic import BaseModel
+from rich.console import Console
+import typer
+
+from benchmarks.data import make_config_json, make_people_lines
+from secret_santa_pp.config import Config
+from secret_santa_pp.config_file import load_people_lines
+from secret_santa_pp.email_message_manager import EmailMessageManager, TemplateManager
+from secret_santa_pp.mailer import RECIPIENT_TEMPLATE_KEYS
+from secret_santa_pp.solution import Solution
+from secret_santa_pp.wrapper import DiGraph
+
+SIZES = [50, 500, 5_000, 20_000]
+SEED = 0
+N_RECIPIENTS = 2
+SHARD_SIZE = 1_000
+
+SAMPLE_DIR = Path(__file__).parent.parent
+DEFAULT_OUTPUT = Path("bench-results.json")
+
+console = Console()
+
+type StageStatus = Literal["ok", "skipped", "failed"]
+
+
+class Stage(BaseModel):
+    # setup isn't timed, run returns the total weight of the solution (if any)
+    setup: Callable[[int], Any]
+    run: Callable[[Any], int | None]
+    # larger sizes are skipped, e.g. the dense networkx graph doesn't fit in memory
+    max_people: int | None = None
+
+
+class StageResult(BaseModel):
+    stage: str
+    n_people: int
+    status: StageStatus
+    wall_time_s: float | None = None
+    peak_memory_mib: float | None = None
+    total_weight: int | None = None
+    error: str | None = None
+
+
+def _setup_config(n_people: int) -> Config:
+    return Config.model_validate_json(make_config_json(n_people, SEED))
+
+
+def _setup_weight_matrix(n_people: int) -> Solution:
+    solution = Solution(graph=DiGraph())
+    solution.init_weight_matrix(_setup_config(n_people), None)
+    return solution
+
+
+def _setup_emails(n_people: int) -> tuple[EmailMessageManager, list[dict[str, str]]]:
+    email_message_manager = EmailMessageManager(
+        TemplateManager(),
+        (SAMPLE_DIR / "sample-subject.txt").read_text().strip(),
+        None,
+        SAMPLE_DIR / "sample-message.txt",
+        [*RECIPIENT_TEMPLATE_KEYS, "limit"],
+    )
+
+    # rendering doesn't depend on the solution, so just give to the next people
+    names = [f"person-{i}" for i in range(n_people)]
+    template_data = [
+        {
+            "gifter": name,
+            "recipients": " and ".join(
+                names[(i + j) % n_people] for j in range(1, N_RECIPIENTS + 1)
+            ),
+            "limit": "£10",
+        }
+        for i, name in enumerate(names)
+    ]
+    return email_message_manager, template_data
+
+
+def _run_validate_config(config_json: str) -> None:
+    Config.model_validate_json(config_json)
+
+
+def _run_load_people_lines(lines: list[str]) -> None:
+    load_people_lines(lines)
+
+
+def _run_init_weight_matrix(config: Config) -> None:
+    Solution(graph=DiGraph()).init_weight_matrix(config, None)
+
+
+def _run_init_graph(config: Config) -> None:
+    Solution(graph=DiGraph()).init_graph(config, None)
+
+
+def _run_generate_solution(solution: Solution) -> int:
+    solution.generate_solution(N_RECIPIENTS, seed=SEED)
+    return _get_total_weight(solution)
+
+
+def _run_generate_solution_sharded(config: Config) -> int:
+    # the shards' weights are built as part of the solve, so they're timed with it
+    solution = Solution(graph=DiGraph())
+    solution.generate_sharded_solution(
+        config, None, N_RECIPIENTS, SHARD_SIZE, seed=SEED
+    )
+    return _get_total_weight(solution)
+
+
+def _run_generate_assignment(solution: Solution) -> int:
+    solution.generate_assignment(N_RECIPIENTS)
+    return _get_total_weight(solution)
+
+
+def _run_render_emails(
+    emails: tuple[EmailMessageManager, list[dict[str, str]]],
+) -> None:
+    email_message_manager, template_data = emails
+    email_message_manager.render_batch(template_data)
+
+
+def _get_total_weight(solution: Solution) -> int:
+    return int(solution.graph.size(weight="weight"))
+
+
+STAGES: dict[str, Stage] = {
+    "validate-config": Stage(
+        setup=lambda n_people: make_config_json(n_people, SEED),
+        run=_run_validate_config,
+    ),
+    "load-people-lines": Stage(
+        setup=lambda n_people: make_people_lines(n_people, SEED),
+        run=_run_load_people_lines,
+    ),
+    "init-weight-matrix": Stage(setup=_setup_config, run=_run_init_weight_matrix),
+    "init-graph": Stage(setup=_setup_config, run=_run_init_graph, max_people=2_000),
+    "generate-solution": Stage(setup=_setup_weight_matrix, run=_run_generate_solution),
+    "generate-solution-sharded": Stage(
+        setup=_setup_config, run=_run_generate_solution_sharded
+    ),
+    "generate-assignment": Stage(
+        setup=_setup_weight_matrix, run=_run_generate_assignment
+    ),
+    "render-emails": Stage(setup=_setup_emails, run=_run_render_emails),
+}
+
+
+def _read_memory_kib(field: str) -> int | None:
+    # Linux only, other platforms don't report peak memory
+    with suppress(OSError), Path("/proc/self/status").open() as fp:
+        for line in fp:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+
+    return None
+
+
+def _reset_peak_memory() -> None:
+    # resets VmHWM to the current resident set size
+    with suppress(OSError):
+        Path("/proc/self/clear_refs").write_text("5")
+
+
+def _run_stage(stage_name: str, n_people: int) -> StageResult:
+    stage = STAGES[stage_name]
+    state = stage.setup(n_people)
+
+    _reset_peak_memory()
+    start_memory = _read_memory_kib("VmRSS")
+    start_time = time.perf_counter()
+    total_weight = stage.run(state)
+    wall_time = time.perf_counter() - start_time
+    peak_memory = _read_memory_kib("VmHWM")
+
+    return StageResult(
+        stage=stage_name,
+        n_people=n_people,
+        status="ok",
+        wall_time_s=round(wall_time, 4),
+        peak_memory_mib=(
+            None
+            if start_memory is None or peak_memory is None
+            else round((peak_memory - start_memory) / 1024, 1)
+        ),
+        total_weight=total_weight,
+    )
+
+
+def run_benchmarks(sizes: list[int], stage_names: list[str]) -> list[StageResult]:
+    results: list[StageResult] = []
+
+    for stage_name in stage_names:
+        max_people = STAGES[stage_name].max_people
+        for n_people in sizes:
+            if max_people is not None and n_people > max_people:
+                console.log(f"Skipping {stage_name} ({n_people} people)")
+                results.append(
+                    StageResult(stage=stage_name, n_people=n_people, status="skipped")
+                )
+                continue
+
+            console.log(f"Running {stage_name} ({n_people} people)")
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+                try:
+                    result = executor.submit(_run_stage, stage_name, n_people).result()
+                except Exception as e:  # noqa: BLE001 (recorded in the results)
+                    result = StageResult(
+                        stage=stage_name,
+                        n_people=n_people,
+                        status="failed",
+                        error=f"{type(e).__name__}: {e}",
+                    )
+
+            if result.status == "ok":
+                console.log(
+                    f"Done in {result.wall_time_s}s, peak memory"
+                    f" {result.peak_memory_mib} MiB"
+                )
+            else:
+                console.log(f"Failed: {result.error}")
+            results.append(result)
+
+    return results
+
+
+def get_metadata() -> dict[str, Any]:
+    package_version = "unknown"
+    with suppress(PackageNotFoundError):
+        package_version = version("secret-santa-pp")
+
+    return {
+        "version": package_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "n_recipients": N_RECIPIENTS,
+    }
+
+
+def main(
+    output: Annotated[
+        Path, typer.Option(help="Path of the JSON results file.")
+    ] = DEFAULT_OUTPUT,
+    size: Annotated[
+        Optional[list[int]],
+        typer.Option(help="Number of participants, can be repeated."),
+    ] = None,
+    stage: Annotated[
+        Optional[list[str]],
+        typer.Option(help=f"Stage to run, can be repeated: {', '.join(STAGES)}."),
+    ] = None,
+) -> None:
+    """Run the benchmark suite and write the results to a JSON file."""
+    stage_names = list(STAGES) if stage is None else stage
+    if unknown := sorted(set(stage_names) - set(STAGES)):
+        msg = f"Stage not found: {', '.join(unknown)}."
+        raise LookupError(msg)
+
+    results = run_benchmarks(SIZES if size is None else size, stage_names)
+
+    with output.open(mode="w+") as fp:
+        json.dump(
+            {
+                "metadata": get_metadata(),
+                "results": [result.model_dump() for result in results],
+            },
+            fp,
+            indent=2,
+        )
+        fp.write("\n")
+
+    console.log(f"Results written to: {output}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from typing import cast
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.optimize import (  # pyright: ignore [reportMissingTypeStubs]
+    linear_sum_assignment,  # pyright: ignore [reportUnknownVariableType]
+    linprog,  # pyright: ignore [reportUnknownVariableType]
+)
+from scipy.sparse import coo_array  # pyright: ignore [reportMissingTypeStubs]
+
+from secret_santa_pp.relationship_index import PairArrays
+from secret_santa_pp.weights import WeightMatrix
+
+# Number of cheap edges per person, on top of 2 * n_recipients, that are considered
+# before pricing in the rest (see _solve_regular_assignment).
+ASSIGNMENT_EXTRA_CANDIDATES = 2
+REDUCED_COST_TOLERANCE = 1e-9
+
+
+def solve_assignment(weight_matrix: WeightMatrix, n_recipients: int) -> PairArrays:
+    """Find a minimum weight assignment where everyone gives and receives n times.
+
+    Unlike the TSP solver, the result is not necessarily made up of a single cycle per
+    recipient round: any set of allowed edges where each person has exactly
+    `n_recipients` outgoing and incoming edges is accepted. The result is optimal.
+    """
+    if n_recipients == 1:
+        return _solve_linear_sum_assignment(weight_matrix)
+
+    return _solve_regular_assignment(weight_matrix, n_recipients)
+
+
+def _solve_linear_sum_assignment(weight_matrix: WeightMatrix) -> PairArrays:
+    cost = np.where(weight_matrix.allowed, weight_matrix.weights, np.inf)
+
+    try:
+        return cast(PairArrays, linear_sum_assignment(cost))
+    except ValueError as e:
+        msg = "Invalid solution: no feasible assignment"
+        raise RuntimeError(msg) from e
+
+
+def _solve_regular_assignment(
+    weight_matrix: WeightMatrix, n_recipients: int
+) -> PairArrays:
+    # Each allowed edge is a 0/1 variable and every person needs exactly n_recipients
+    # outgoing and incoming edges. The constraint matrix is the incidence matrix of a
+    # bipartite graph, which is totally unimodular, so a basic optimal solution of the
+    # LP relaxation is already integral.
+    #
+    # Solving the LP over all n^2 edges is slow, so we start from a small set of cheap
+    # candidate edges per person (plus a feasible solution so that the restricted LP
+    # has one) and use the duals of the restricted LP to price the remaining edges.
+    # Once no edge has a negative reduced cost, the restricted optimum is also optimal
+    # for the full problem.
+    allowed = weight_matrix.allowed
+    weights = weight_matrix.weights
+    n_people = len(weight_matrix.names)
+    n_candidates = 2 * n_recipients + ASSIGNMENT_EXTRA_CANDIDATES
+
+    # random tie breaking so that equal weight candidates are spread out evenly
+    rng = np.random.default_rng(0)
+    noisy_weights = np.where(allowed, weights + rng.random(weights.shape) / 2, np.inf)
+
+    candidates = _get_cheapest_edges(noisy_weights, n_candidates)
+    candidates |= _get_sequential_assignment(noisy_weights, n_recipients)
+
+    while True:
+        src, dst = np.nonzero(candidates)
+        result = _solve_restricted_lp(
+            weights[src, dst], src, dst, n_people, n_recipients
+        )
+
+        if result is None:
+            if (candidates == allowed).all():
+                msg = "Invalid solution: no feasible assignment"
+                raise RuntimeError(msg)
+
+            candidates = allowed.copy()
+            continue
+
+        selected, src_duals, dst_duals = result
+        reduced_costs = weights - src_duals[:, np.newaxis] - dst_duals[np.newaxis, :]
+        reduced_costs[~allowed | candidates] = np.inf
+        violating = reduced_costs < -REDUCED_COST_TOLERANCE
+
+        if not violating.any():
+            return src[selected], dst[selected]
+
+        candidates |= violating & _get_cheapest_edges(reduced_costs, n_candidates)
+
+
+def _get_sequential_assignment(
+    noisy_weights: NDArray[np.float64], n_recipients: int
+) -> NDArray[np.bool_]:
+    # n_recipients edge-disjoint assignments, solved one after another. Not optimal,
+    # but good enough to make sure the first restricted LP is feasible.
+    cost = noisy_weights.copy()
+    edges = np.zeros(cost.shape, dtype=np.bool_)
+
+    for _ in range(n_recipients):
+        try:
+            src, dst = cast(PairArrays, linear_sum_assignment(cost))
+        except ValueError:
+            return np.zeros(cost.shape, dtype=np.bool_)
+
+        edges[src, dst] = True
+        cost[src, dst] = np.inf
+
+    return edges
+
+
+def _get_cheapest_edges(
+    noisy_weights: NDArray[np.float64], n_edges: int
+) -> NDArray[np.bool_]:
+    n_people = noisy_weights.shape[0]
+    if n_edges >= n_people:
+        return np.isfinite(noisy_weights)
+
+    edges = np.zeros(noisy_weights.shape, dtype=np.bool_)
+    rows = np.arange(n_people)[:, np.newaxis]
+    edges[rows, np.argpartition(noisy_weights, n_edges, axis=1)[:, :n_edges]] = True
+    edges[np.argpartition(noisy_weights, n_edges, axis=0)[:n_edges, :], rows.T] = True
+    return edges & np.isfinite(noisy_weights)
+
+
+def _solve_restricted_lp(
+    costs: NDArray[np.int32],
+    src: NDArray[np.intp],
+    dst: NDArray[np.intp],
+    n_people: int,
+    n_recipients: int,
+) -> tuple[NDArray[np.bool_], NDArray[np.float64], NDArray[np.float64]] | None:
+    n_edges = len(src)
+    incidence = coo_array(
+        (
+            np.ones(2 * n_edges),
+            (np.concatenate([src, n_people + dst]), np.tile(np.arange(n_edges), 2)),
+        ),
+        shape=(2 * n_people, n_edges),
+    ).tocsr()
+
+    result = linprog(
+        costs.astype(np.float64),
+        A_eq=incidence,
+        b_eq=np.full(2 * n_people, n_recipients),
+        bounds=(0, 1),
+        method="highs-ds",
+        # presolve doesn't reduce these problems and takes longer than the solve
+        options={"presolve": False},
+    )
+    if result.status != 0:  # pyright: ignore [reportUnknownMemberType]
+        return None
+
+    x = cast(NDArray[np.float64], result.x)  # pyright: ignore [reportUnknownMemberType]
+    duals = cast(NDArray[np.float64], result.eqlin.marginals)  # pyright: ignore [reportUnknownMemberType]
+    return x > 0.5, duals[:n_people], duals[n_people:]  # noqa: PLR2004
@@ -1,16 +1,115 @@
 from __future__ import annotations
 
+from datetime import datetime
+from enum import StrEnum
 from pathlib import Path
-from typing import Annotated, Optional
+import sys
+from typing import TYPE_CHECKING, Annotated, Optional
 
 from rich.console import Console
 import typer
 
-from secret_santa_pp.config import Config
+from secret_santa_pp.config_file import (
+    load_config,
+    load_config_and_solution,
+    load_solution,
+    save_config,
+    save_solution,
+)
+from secret_santa_pp.email_message_manager import EmailMessageManager, TemplateManager
+from secret_santa_pp.history import find_history_keys
+from secret_santa_pp.mailer import (
+    RECIPIENT_TEMPLATE_KEYS,
+    SmtpPool,
+    SmtpSettings,
+    TokenBucket,
+    build_messages,
+    send_messages,
+)
+from secret_santa_pp.selection import select_participants
 from secret_santa_pp.solution import Solution
+from secret_santa_pp.tsp import DEFAULT_TSP_SOLVER
+from secret_santa_pp.wrapper import DiGraph
+
+if TYPE_CHECKING:  # pragma: no cover
+    from secret_santa_pp.config import Config
 
 app = typer.Typer()
 console = Console()
+# for logging when stdout is used for the output itself
+err_console = Console(stderr=True)
+
+# Delimiter of each solution output format, or None to print with rich.
+OUTPUT_DELIMITERS: dict[str, str | None] = {"console": None, "tsv": "\t", "csv": ","}
+
+
+# Choices of the options below, which tests/test_cli.py keeps in sync with the values
+# they stand for.
+class ModeChoice(StrEnum):
+    CYCLE = "cycle"
+    ASSIGNMENT = "assignment"
+
+
+class SolverChoice(StrEnum):
+    ANNEALING = "annealing"
+    NEAREST_NEIGHBOUR = "nearest-neighbour"
+    LOCAL_SEARCH = "local-search"
+
+
+DEFAULT_SOLVER_CHOICE = SolverChoice(DEFAULT_TSP_SOLVER)
+
+
+class FormatChoice(StrEnum):
+    CONSOLE = "console"
+    TSV = "tsv"
+    CSV = "csv"
+
+
+class TlsChoice(StrEnum):
+    NONE = "none"
+    STARTTLS = "starttls"
+    SSL = "ssl"
+
+
+def get_log_console(output_format: FormatChoice) -> Console:
+    # delimited output is written to stdout, so the log goes to stderr instead
+    return console if OUTPUT_DELIMITERS[output_format.value] is None else err_console
+
+
+def print_solution(
+    solution: Solution,
+    output_format: FormatChoice,
+    gifters: list[str] | None,
+    pager: bool,
+) -> None:
+    if (delimiter := OUTPUT_DELIMITERS[output_format.value]) is None:
+        solution.print(console, gifters=gifters, pager=pager)
+    else:
+        solution.write_delimited(sys.stdout, delimiter, gifters=gifters)
+
+
+def load_participants(
+    config: Config,
+    participants_file_path: Path | None,
+    select: str | None,
+    log_console: Console = console,
+) -> list[str] | None:
+    participants: list[str] | None = None
+    if participants_file_path is not None:
+        log_console.log(f"Load participants list: {participants_file_path}")
+        with participants_file_path.open() as fp:
+            participants = [name.strip() for name in fp.readlines()]
+
+    if select is not None:
+        log_console.log(f"Selecting participants: {select}")
+        selected = select_participants(config, select)
+        if participants is not None:
+            participant_set = set(participants)
+            selected = [name for name in selected if name in participant_set]
+        participants = selected
+        log_console.log(f"Selected participants: {len(participants)}")
+
+    return participants
 
 
 @app.command()
@@ -25,7 +124,99 @@ def generate_solution(
             )
         ),
     ] = None,
-    n_recipients: Annotated[int, typer.Option(help="Number of recipients.")] = 1,
+    n_recipients: Annotated[int, typer.Option(min=1, help="Number of recipients.")] = 1,
+    select: Annotated[
+        Optional[str],
+        typer.Option(
+            help=(
+                "Select the participants with an expression of names and"
+                " relationships, e.g. 'office=London except \"Jane Doe\"'. Terms are"
+                " 'all', a name or key=value, combined with and, or, except and"
+                " parentheses. Applied to the participants file if both are given."
+            )
+        ),
+    ] = None,
+    mode: Annotated[
+        ModeChoice,
+        typer.Option(
+            help=(
+                "'cycle' forms a single gifting cycle per recipient round"
+                " (approximate). 'assignment' allows any cycle structure and finds the"
+                " optimal solution (exact, much faster for large events)."
+            )
+        ),
+    ] = ModeChoice.CYCLE,
+    solver: Annotated[
+        SolverChoice,
+        typer.Option(
+            help="TSP solver used to find each gifting cycle in 'cycle' mode."
+        ),
+    ] = DEFAULT_SOLVER_CHOICE,
+    seed: Annotated[
+        Optional[int], typer.Option(help="Random seed, for reproducible solutions.")
+    ] = None,
+    restarts: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help=(
+                "Number of independently seeded solver starts in 'cycle' mode. The"
+                " lowest weight solution is kept."
+            ),
+        ),
+    ] = 1,
+    workers: Annotated[
+        int,
+        typer.Option(min=1, help="Number of processes used to run the solver starts."),
+    ] = 1,
+    time_limit: Annotated[
+        Optional[float],
+        typer.Option(
+            min=0,
+            help=(
+                "Time limit in seconds for 'cycle' mode. Solving stops improving once"
+                " it's reached (or on Ctrl-C) and keeps the best solution found."
+            ),
+        ),
+    ] = None,
+    shard_size: Annotated[
+        Optional[int],
+        typer.Option(
+            min=2,
+            help=(
+                "Solve 'cycle' mode in shards of at least this many people, which are"
+                " then stitched into a single cycle per recipient round. Much faster"
+                " for very large events."
+            ),
+        ),
+    ] = None,
+    shard_key: Annotated[
+        Optional[str],
+        typer.Option(
+            help=(
+                "Relationship key (e.g. office) used to keep people with the same"
+                " relationships in the same shard. If unspecified, shards are random."
+            )
+        ),
+    ] = None,
+    history: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Penalise giving to past recipients, from every relationship key that"
+                " looks like a stored solution (sorted, with the most recent last)."
+            )
+        ),
+    ] = False,
+    history_key: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            help=(
+                "Relationship key of a past solution to penalise repeats of, can be"
+                " repeated (from oldest to most recent). Implies --history."
+            )
+        ),
+    ] = None,
     solution_key: Annotated[
         Optional[str],
         typer.Option(
@@ -41,42 +232,265 @@ def generate_solution(
     print_console: Annotated[
         bool, typer.Option(help="Print the solution to the console")
     ] = False,
+    gifter: Annotated[
+        Optional[list[str]],
+        typer.Option(help="Only print this gifter's recipients, can be repeated."),
+    ] = None,
+    output_format: Annotated[
+        FormatChoice,
+        typer.Option(
+            "--format",
+            help=(
+                "Format of the printed solution, 'tsv' and 'csv' write plain rows to"
+                " stdout (with the log on stderr) for piping."
+            ),
+        ),
+    ] = FormatChoice.CONSOLE,
+    pager: Annotated[
+        bool, typer.Option(help="Page the printed solution, e.g. with less.")
+    ] = False,
 ) -> None:
     """Generate a new secret santa solution."""
-    console.log(f"Loading config file: {config_file_path}")
-    with config_file_path.open() as fp:
-        config = Config.model_validate_json(fp.read())
+    if shard_size is not None and shard_size <= 2 * n_recipients:
+        msg = f"Must be more than twice the number of recipients ({n_recipients})."
+        raise typer.BadParameter(msg, param_hint="--shard-size")
 
-    participants: list[str] | None = None
-    if participants_file_path is not None:
-        console.log(f"Load participants list: {participants_file_path}")
-        with participants_file_path.open() as fp:
-            participants = [name.strip() for name in fp.readlines()]
+    log_console = get_log_console(
+        output_format if print_console is True else FormatChoice.CONSOLE
+    )
+
+    log_console.log(f"Loading config file: {config_file_path}")
+    config = load_config(config_file_path)
+
+    participants = load_participants(
+        config, participants_file_path, select, log_console
+    )
 
-    console.log(f"Generating solution ({n_recipients} recipients)")
+    history_keys = history_key
+    if history_keys is None and history is True:
+        history_keys = find_history_keys(config)
+    if history_keys:
+        log_console.log(f"Penalising past solutions: {', '.join(history_keys)}")
+
+    log_console.log(f"Generating solution ({n_recipients} recipients, mode: {mode})")
     solution = Solution.generate(
-        config=config, participants=participants, n_recipients=n_recipients
+        config=config,
+        participants=participants,
+        n_recipients=n_recipients,
+        mode=mode.value,
+        solver=solver.value,
+        seed=seed,
+        restarts=restarts,
+        workers=workers,
+        time_limit=time_limit,
+        shard_size=shard_size,
+        shard_key=shard_key,
+        history_keys=history_keys,
     )
 
     if display_graph is True:
-        console.log("Visualising solution graph")
+        log_console.log("Visualising solution graph")
         solution.visualise()
 
     if print_console is True:
-        console.log("Printing solution to console")
-        solution.print(console)
+        log_console.log("Printing solution to console")
+        print_solution(solution, output_format, gifter, pager)
 
     if solution_key is not None:
         confirmation = typer.confirm(
             "Would you like to update the config file with this solution?",
             default=False,
+            err=log_console is err_console,
         )
         if confirmation is True:
-            console.log(f"Updating config with solution (key: {solution_key})")
-            config.update_from_graph(solution.graph, solution_key)
+            log_console.log(f"Updating config with solution (key: {solution_key})")
+            save_solution(config_file_path, config, solution.graph, solution_key)
+
+
+@app.command()
+def check_feasibility(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    participants_file_path: Annotated[
+        Optional[Path],
+        typer.Argument(
+            help=(
+                "Path to the file containing a list of participants. If unspecified, we"
+                " assume all people in the config file are participants."
+            )
+        ),
+    ] = None,
+    n_recipients: Annotated[int, typer.Option(min=1, help="Number of recipients.")] = 1,
+    select: Annotated[
+        Optional[str],
+        typer.Option(
+            help=(
+                "Select the participants with an expression of names and"
+                " relationships, e.g. 'office=London except \"Jane Doe\"'. Terms are"
+                " 'all', a name or key=value, combined with and, or, except and"
+                " parentheses. Applied to the participants file if both are given."
+            )
+        ),
+    ] = None,
+    mode: Annotated[
+        ModeChoice,
+        typer.Option(
+            help="Solution mode, 'cycle' also checks that a single cycle is possible."
+        ),
+    ] = ModeChoice.CYCLE,
+) -> None:
+    """Check whether a solution is possible without solving."""
+    console.log(f"Loading config file: {config_file_path}")
+    config = load_config(config_file_path)
+
+    participants = load_participants(config, participants_file_path, select)
+
+    solution = Solution(graph=DiGraph())
+    solution.init_weight_matrix(config, participants)
+    report = solution.check_feasibility(n_recipients, mode.value, config)
 
-            with config_file_path.open(mode="w+") as fp:
-                fp.write(config.model_dump_json(indent=2))
+    console.print(str(report))
+    if not report.feasible:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def add_rounds(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    solution_key: Annotated[
+        str,
+        typer.Argument(
+            help="The key under which the solution is stored in the config file."
+        ),
+    ],
+    n_rounds: Annotated[
+        int, typer.Option(min=1, help="Number of recipient rounds to add.")
+    ] = 1,
+    mode: Annotated[
+        ModeChoice,
+        typer.Option(
+            help="Solution mode used for the new rounds, see generate-solution."
+        ),
+    ] = ModeChoice.CYCLE,
+    solver: Annotated[
+        SolverChoice,
+        typer.Option(
+            help="TSP solver used to find each gifting cycle in 'cycle' mode."
+        ),
+    ] = DEFAULT_SOLVER_CHOICE,
+    seed: Annotated[
+        Optional[int], typer.Option(help="Random seed, for reproducible solutions.")
+    ] = None,
+    restarts: Annotated[
+        int,
+        typer.Option(
+            min=1, help="Number of independently seeded solver starts in 'cycle' mode."
+        ),
+    ] = 1,
+    workers: Annotated[
+        int,
+        typer.Option(min=1, help="Number of processes used to run the solver starts."),
+    ] = 1,
+    time_limit: Annotated[
+        Optional[float],
+        typer.Option(min=0, help="Time limit in seconds for 'cycle' mode."),
+    ] = None,
+) -> None:
+    """Add recipient rounds to an existing solution, keeping the existing ones."""
+    console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    config, solution = load_config_and_solution(config_file_path, solution_key)
+
+    console.log(f"Adding {n_rounds} recipient rounds (mode: {mode})")
+    solution.add_rounds(
+        config,
+        n_rounds,
+        mode=mode.value,
+        solver=solver.value,
+        seed=seed,
+        restarts=restarts,
+        workers=workers,
+        time_limit=time_limit,
+    )
+    solution.print(console)
+
+    confirmation = typer.confirm(
+        "Would you like to update the config file with this solution?", default=False
+    )
+    if confirmation is True:
+        console.log(f"Updating config with solution (key: {solution_key})")
+        save_solution(config_file_path, config, solution.graph, solution_key)
+
+
+@app.command()
+def update_solution(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    solution_key: Annotated[
+        str,
+        typer.Argument(
+            help="The key under which the solution is stored in the config file."
+        ),
+    ],
+    remove: Annotated[
+        Optional[list[str]],
+        typer.Option(help="Participant that dropped out, can be repeated."),
+    ] = None,
+    add: Annotated[
+        Optional[list[str]],
+        typer.Option(help="Person in the config file that joined, can be repeated."),
+    ] = None,
+    seed: Annotated[
+        Optional[int], typer.Option(help="Random seed, for reproducible solutions.")
+    ] = None,
+) -> None:
+    """Update an existing solution for people that dropped out or joined.
+
+    Only the gifters next to the people that changed get new recipients, everyone else
+    keeps theirs.
+    """
+    removed, added = remove or [], add or []
+    console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    config, solution = load_config_and_solution(config_file_path, solution_key, added)
+    console.log(f"Updating solution ({len(removed)} removed, {len(added)} added)")
+    changed_gifters = solution.update_participants(config, removed, added, seed)
+
+    console.log(f"Gifters with new recipients: {len(changed_gifters)}")
+    for gifter in changed_gifters:
+        console.print(f"{gifter}: {', '.join(solution.graph[gifter])}")
+
+    confirmation = typer.confirm(
+        "Would you like to update the config file with this solution?", default=False
+    )
+    if confirmation is True:
+        console.log(f"Updating config with solution (key: {solution_key})")
+        save_solution(
+            config_file_path, config, solution.graph, solution_key, removed=removed
+        )
+
+
+@app.command()
+def score_solution(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    solution_key: Annotated[
+        str,
+        typer.Argument(
+            help="The key under which the solution is stored in the config file."
+        ),
+    ],
+    lower_bound: Annotated[
+        bool,
+        typer.Option(
+            help=(
+                "Work out the lowest total penalty that any solution can have (solves"
+                " an assignment problem)."
+            )
+        ),
+    ] = True,
+) -> None:
+    """Report how well an existing solution meets the constraints."""
+    console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    config, solution = load_config_and_solution(config_file_path, solution_key)
+
+    console.log("Scoring solution")
+    console.print(str(solution.score(config, lower_bound=lower_bound)))
 
 
 @app.command()
@@ -88,17 +502,35 @@ def display_solution_graph(
             help="The key under which the solution is stored in the config file."
         ),
     ],
+    output: Annotated[
+        Optional[Path],
+        typer.Option(
+            help=(
+                "Write the graph to a PNG, SVG or HTML file instead of displaying it,"
+                " which doesn't need a display."
+            )
+        ),
+    ] = None,
+    layout_cache: Annotated[
+        bool,
+        typer.Option(
+            help="Reuse the layout from last time if the solution hasn't changed."
+        ),
+    ] = True,
 ) -> None:
     """Visualise an existing santa solution graph."""
-    console.log(f"Loading config file: {config_file_path}")
-    with config_file_path.open() as fp:
-        config = Config.model_validate_json(fp.read())
+    console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    solution = load_solution(config_file_path, solution_key)
 
-    console.log(f"Loading solution (key: {solution_key})")
-    solution = Solution.load(config=config, solution_key=solution_key)
-
-    console.log("Displaying solution")
-    solution.visualise()
+    layout_key = (
+        f"{config_file_path.resolve()}:{solution_key}" if layout_cache else None
+    )
+    if output is not None:
+        console.log(f"Writing solution graph: {output}")
+        solution.export(output, layout_key)
+    else:
+        console.log("Displaying solution")
+        solution.visualise(layout_key)
 
 
 @app.command()
@@ -110,17 +542,196 @@ def display_solution_console(
             help="The key under which the solution is stored in the config file."
         ),
     ],
+    gifter: Annotated[
+        Optional[list[str]],
+        typer.Option(help="Only show this gifter's recipients, can be repeated."),
+    ] = None,
+    output_format: Annotated[
+        FormatChoice,
+        typer.Option(
+            "--format",
+            help=(
+                "Output format, 'tsv' and 'csv' write plain rows to stdout (with the"
+                " log on stderr) for piping."
+            ),
+        ),
+    ] = FormatChoice.CONSOLE,
+    pager: Annotated[
+        bool, typer.Option(help="Page the console output, e.g. with less.")
+    ] = False,
 ) -> None:
     """Visualise an existing santa solution in the console."""
+    log_console = get_log_console(output_format)
+
+    log_console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    solution = load_solution(config_file_path, solution_key)
+
+    log_console.log("Displaying solution")
+    print_solution(solution, output_format, gifter, pager)
+
+
+@app.command()
+def convert_config(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    output_file_path: Annotated[
+        Path,
+        typer.Argument(
+            help=(
+                "Path to write the config to, as SQLite (.db, .sqlite), JSON Lines"
+                " (.jsonl) or JSON (anything else)."
+            )
+        ),
+    ],
+) -> None:
+    """Convert a config file to another format, e.g. to a SQLite store."""
     console.log(f"Loading config file: {config_file_path}")
-    with config_file_path.open() as fp:
-        config = Config.model_validate_json(fp.read())
+    config = load_config(config_file_path)
 
-    console.log(f"Loading solution (key: {solution_key})")
-    solution = Solution.load(config=config, solution_key=solution_key)
+    console.log(f"Writing config file: {output_file_path}")
+    save_config(config, output_file_path)
 
-    console.log("Displaying solution")
-    solution.print(console)
+
+@app.command()
+def send_emails(
+    config_file_path: Annotated[Path, typer.Argument(help="Path to the config file.")],
+    solution_key: Annotated[
+        str,
+        typer.Argument(
+            help="The key under which the solution is stored in the config file."
+        ),
+    ],
+    subject_file_path: Annotated[
+        Path, typer.Option("--subject", help="Path to the email subject template.")
+    ],
+    sender: Annotated[
+        str, typer.Option(help="From address, e.g. 'Santa <santa@example.com>'.")
+    ],
+    smtp_host: Annotated[str, typer.Option(help="SMTP server host.")],
+    text_template: Annotated[
+        Optional[Path], typer.Option(help="Path to the plain text message template.")
+    ] = None,
+    html_template: Annotated[
+        Optional[Path], typer.Option(help="Path to the HTML message template.")
+    ] = None,
+    reply_to: Annotated[Optional[str], typer.Option(help="Reply-To address.")] = None,
+    event_name: Annotated[
+        Optional[str], typer.Option(help="Event name, for the templates.")
+    ] = None,
+    event_date: Annotated[
+        Optional[datetime],
+        typer.Option(formats=["%Y-%m-%d"], help="Event date, for the templates."),
+    ] = None,
+    template_value: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            help="Extra template value as key=value (e.g. limit=£20), can be repeated."
+        ),
+    ] = None,
+    gifter: Annotated[
+        Optional[list[str]],
+        typer.Option(help="Only email this gifter, can be repeated."),
+    ] = None,
+    smtp_port: Annotated[int, typer.Option(help="SMTP server port.")] = 587,
+    smtp_username: Annotated[
+        Optional[str], typer.Option(help="SMTP username, if it needs a login.")
+    ] = None,
+    smtp_password: Annotated[
+        Optional[str],
+        typer.Option(
+            envvar="SECRET_SANTA_PP_SMTP_PASSWORD",
+            help="SMTP password, prompted for if there's a username and it's unset.",
+        ),
+    ] = None,
+    tls: Annotated[
+        TlsChoice,
+        typer.Option(
+            help="'starttls' upgrades a plain connection, 'ssl' connects with TLS."
+        ),
+    ] = TlsChoice.STARTTLS,
+    connections: Annotated[
+        int, typer.Option(min=1, help="Number of SMTP connections to send over.")
+    ] = 4,
+    rate: Annotated[
+        Optional[float],
+        typer.Option(
+            min=0, help="Maximum emails per second, e.g. the provider's sending limit."
+        ),
+    ] = None,
+    burst: Annotated[
+        int, typer.Option(min=1, help="Emails that can be sent at once under --rate.")
+    ] = 1,
+    max_attempts: Annotated[
+        int,
+        typer.Option(
+            min=1, help="Attempts per email, retrying dropped sessions and 4xx errors."
+        ),
+    ] = 4,
+    backoff: Annotated[
+        float,
+        typer.Option(
+            min=0, help="Seconds before the first retry, doubled for every retry."
+        ),
+    ] = 1.0,
+) -> None:
+    """Email every gifter their recipients for an existing solution."""
+    if rate is not None and rate <= 0:
+        msg = "Must be greater than 0."
+        raise typer.BadParameter(msg, param_hint="--rate")
+
+    console.log(f"Loading solution (key: {solution_key}): {config_file_path}")
+    config, solution = load_config_and_solution(config_file_path, solution_key)
+
+    template_data: dict[str, str] = {}
+    for value in template_value or []:
+        key, sep, value_text = value.partition("=")
+        if sep == "":
+            msg = f"Invalid template value: {value}."
+            raise typer.BadParameter(msg, param_hint="--template-value")
+        template_data[key] = value_text
+
+    console.log("Building emails")
+    manager = EmailMessageManager(
+        TemplateManager(event_name, None if event_date is None else event_date.date()),
+        subject_file_path.read_text().strip(),
+        html_template,
+        text_template,
+        [*RECIPIENT_TEMPLATE_KEYS, *template_data],
+    )
+    messages = build_messages(
+        manager, config, solution, sender, reply_to, gifter, template_data
+    )
+
+    confirmation = typer.confirm(
+        f"Would you like to send {len(messages)} emails via {smtp_host}?", default=False
+    )
+    if confirmation is False:
+        return
+
+    if smtp_username is not None and smtp_password is None:
+        smtp_password = typer.prompt("SMTP password", hide_input=True)
+
+    settings = SmtpSettings(
+        host=smtp_host,
+        port=smtp_port,
+        username=smtp_username,
+        password=smtp_password,
+        tls=tls.value,
+    )
+    rate_limiter = None if rate is None else TokenBucket(rate, burst)
+
+    console.log(f"Sending emails ({connections} connections)")
+    n_failed = 0
+    with SmtpPool(settings, connections) as pool:
+        for result in send_messages(
+            messages, pool, rate_limiter, max_attempts, backoff
+        ):
+            if result.error is not None:
+                n_failed += 1
+                console.log(f"Failed to email {result.to}: {result.error}")
+
+    console.log(f"Sent {len(messages) - n_failed} emails ({n_failed} failed)")
+    if n_failed > 0:
+        raise typer.Exit(code=1)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,25 @@
 from __future__ import annotations
 
-from typing import Literal
+from contextlib import suppress
+from typing import TYPE_CHECKING, Literal
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, PrivateAttr
 
 from secret_santa_pp.wrapper import DiGraph
 
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+
 type ComparatorType = Literal[
     "one-way contains", "two-way contains", "either contains", "equality"
 ]
 type LimitType = Literal["exclude", "low-probability", "medium-probability"]
 
+# Weight of an edge that does not meet any constraint, and the penalty added on top of
+# it for each non-exclusion constraint that the edge meets.
+BASE_WEIGHT = 1
+LIMIT_PENALTIES: dict[LimitType, int] = {"low-probability": 4, "medium-probability": 2}
+
 
 class Person(BaseModel):
     name: str
@@ -22,10 +31,45 @@ class Config(BaseModel):
     people: list[Person]
     constraints: list[Constraint]
 
+    # Indexes of the people, built on first use. They assume that people and their
+    # relationships only change through `update_from_graph`, which keeps them current.
+    _name_index: dict[str, int] | None = PrivateAttr(default=None)
+    _value_indexes: dict[str, dict[str, list[int]]] = PrivateAttr(default_factory=dict)
+
+    def get_person_id(self, name: str) -> int:
+        """Get the index of a person in `people`."""
+        if self._name_index is None:
+            self._name_index = {person.name: i for i, person in enumerate(self.people)}
+
+        if (person_id := self._name_index.get(name)) is None:
+            msg = f"Person not found: {name}."
+            raise LookupError(msg)
+
+        return person_id
+
+    def get_person(self, name: str) -> Person:
+        return self.people[self.get_person_id(name)]
+
+    def get_people(self, person_ids: Iterable[int]) -> list[Person]:
+        """Get people by index, in the order of the config."""
+        return [self.people[person_id] for person_id in sorted(set(person_ids))]
+
+    def find_people(self, key: str, value: str) -> list[int]:
+        """Get the indexes of the people whose relationship `key` contains `value`."""
+        if (value_index := self._value_indexes.get(key)) is None:
+            value_index = self._value_indexes[key] = {}
+            for i, person in enumerate(self.people):
+                for relationship_value in person.relationships.get(key, []):
+                    value_index.setdefault(relationship_value, []).append(i)
+
+        return value_index.get(value, [])
+
     def update_from_graph(self, graph: DiGraph[str], key: str) -> None:
-        for person in self.people:
-            if person.name in graph.nodes:
-                person.relationships[key] = list(graph[person.name])
+        for name in graph.nodes:
+            with suppress(LookupError):
+                self.get_person(name).relationships[key] = list(graph[name])
+
+        self._value_indexes.pop(key, None)
 
     def load_graph(self, key: str) -> DiGraph[str]:
         return DiGraph(
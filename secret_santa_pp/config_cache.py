@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from contextlib import suppress
+from functools import cache
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+from typing import TYPE_CHECKING
+
+from secret_santa_pp.config import Config
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable
+
+CACHE_DIR_ENV = "SECRET_SANTA_PP_CACHE_DIR"
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def get_cache_dir() -> Path:
+    if (cache_dir := os.environ.get(CACHE_DIR_ENV)) is not None:
+        return Path(cache_dir)
+
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+    base_dir = Path(xdg_cache_home) if xdg_cache_home else Path.home() / ".cache"
+    return base_dir / "secret-santa-pp"
+
+
+@cache
+def get_schema_version() -> str:
+    """Hash of the config schema, so that cached configs go stale when it changes."""
+    schema = json.dumps(Config.model_json_schema(), sort_keys=True)
+    return hashlib.sha256(schema.encode()).hexdigest()
+
+
+def load_cached_config(
+    path: Path, load: Callable[[Path], Config], cache_dir: Path | None = None
+) -> Config:
+    """Load a config, reusing the validated config from last time if it's unchanged.
+
+    The validated config is pickled into the cache dir (one entry per config file)
+    along with a hash of the file's contents and of the schema, and only reused if both
+    still match. Anything going wrong with the cache just falls back to `load`.
+    """
+    cache_dir = get_cache_dir() if cache_dir is None else cache_dir
+    cache_path = cache_dir / (
+        hashlib.sha256(str(path.resolve()).encode()).hexdigest() + ".pickle"
+    )
+    key = _get_cache_key(path)
+
+    # a missing, corrupt or outdated cache entry is just a cache miss
+    with suppress(Exception), cache_path.open("rb") as fp:
+        cached_key, config = pickle.load(fp)  # noqa: S301 (written by load_cached_config)
+        if cached_key == key and isinstance(config, Config):
+            return config
+
+    config = load(path)
+
+    # write to a temporary file first so that concurrent runs never read half a file
+    with suppress(OSError):
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_path.open("wb") as fp:
+            pickle.dump((key, config), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(cache_path)
+
+    return config
+
+
+def _get_cache_key(path: Path) -> str:
+    digest = hashlib.sha256(get_schema_version().encode())
+    with path.open("rb") as fp:
+        while chunk := fp.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
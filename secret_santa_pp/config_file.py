@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from secret_santa_pp.config import Config, Constraint, Person
+from secret_santa_pp.config_cache import load_cached_config
+from secret_santa_pp.solution import Solution
+from secret_santa_pp.store import SQLITE_SUFFIXES, ConfigStore
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from secret_santa_pp.wrapper import DiGraph
+
+# People files in JSON Lines format: a header line with the constraints, then one
+# person per line. SQLite files are a `ConfigStore`, and anything else is a single
+# JSON config document.
+JSONL_SUFFIXES = {".jsonl", ".ndjson"}
+
+
+class ConfigHeader(BaseModel):
+    # strict, so that a people file without a header doesn't lose its first person
+    model_config = ConfigDict(extra="forbid")
+
+    constraints: list[Constraint]
+
+
+def load_config(path: Path, cache: bool = True) -> Config:
+    """Load a config file, see `load_cached_config` for the cache of JSON configs."""
+    if path.suffix in SQLITE_SUFFIXES:
+        with ConfigStore(path) as store:
+            return store.load_config()
+
+    if cache:
+        return load_cached_config(path, _load_config_file)
+
+    return _load_config_file(path)
+
+
+def save_config(config: Config, path: Path) -> None:
+    if path.suffix in SQLITE_SUFFIXES:
+        with ConfigStore(path, create=True) as store:
+            store.save_config(config)
+        return
+
+    with path.open(mode="w+") as fp:
+        if path.suffix not in JSONL_SUFFIXES:
+            fp.write(config.model_dump_json(indent=2))
+            return
+
+        fp.write(ConfigHeader(constraints=config.constraints).model_dump_json() + "\n")
+        for person in config.people:
+            fp.write(person.model_dump_json() + "\n")
+
+
+def load_solution(path: Path, solution_key: str) -> Solution:
+    """Load a stored solution, with an indexed query for SQLite files.
+
+    For commands that don't need the config itself, since the config of other files
+    is loaded in full.
+    """
+    if path.suffix not in SQLITE_SUFFIXES:
+        return Solution.load(load_config(path), solution_key)
+
+    with ConfigStore(path) as store:
+        return Solution.from_stored_graph(store.load_graph(solution_key), solution_key)
+
+
+def load_config_and_solution(
+    path: Path, solution_key: str, names: Iterable[str] = ()
+) -> tuple[Config, Solution]:
+    """Load a stored solution and the config of its participants and `names`.
+
+    SQLite files are queried for the solution, then for just those people. Other files
+    are loaded in full.
+    """
+    if path.suffix not in SQLITE_SUFFIXES:
+        config = load_config(path)
+        return config, Solution.load(config, solution_key)
+
+    with ConfigStore(path) as store:
+        solution = Solution.from_stored_graph(
+            store.load_graph(solution_key), solution_key
+        )
+        return store.load_config([*solution.graph.nodes, *names]), solution
+
+
+def save_solution(
+    path: Path,
+    config: Config,
+    graph: DiGraph[str],
+    solution_key: str,
+    removed: list[str] | None = None,
+) -> None:
+    """Store a solution under a key, and drop the key from the removed people.
+
+    SQLite files only have the solution's rows rewritten, other files are rewritten
+    in full from the updated config.
+    """
+    config.update_from_graph(graph, solution_key)
+    for person in config.people:
+        if removed is not None and person.name in removed:
+            person.relationships.pop(solution_key, None)
+
+    if path.suffix not in SQLITE_SUFFIXES:
+        save_config(config, path)
+        return
+
+    with ConfigStore(path) as store:
+        store.save_graph(graph, solution_key, removed or [])
+
+
+def load_people_lines(lines: Iterable[str]) -> Config:
+    """Load a config from JSON Lines, validating one line at a time.
+
+    The first non-empty line is the header with the constraints and every other
+    non-empty line is a person. Invalid lines don't stop the load, they're all reported
+    together (with line numbers) in a single ValueError at the end.
+    """
+    header: ConfigHeader | None = None
+    people: list[Person] = []
+    errors: list[str] = []
+
+    for line_number, line in enumerate(lines, start=1):
+        if len(line.strip()) == 0:
+            continue
+
+        try:
+            if header is None:
+                header = ConfigHeader.model_validate_json(line)
+            else:
+                people.append(Person.model_validate_json(line))
+        except ValidationError as e:
+            errors.extend(
+                f"line {line_number}: {_format_location(error['loc'])}{error['msg']}"
+                for error in e.errors()
+            )
+            # a broken header still counts as the header, so people aren't misread
+            header = header or ConfigHeader(constraints=[])
+
+    if len(errors) > 0:
+        msg = "Invalid people file:\n" + "\n".join(errors)
+        raise ValueError(msg)
+
+    return Config(
+        people=people, constraints=[] if header is None else header.constraints
+    )
+
+
+def _load_config_file(path: Path) -> Config:
+    if path.suffix in JSONL_SUFFIXES:
+        with path.open() as fp:
+            return load_people_lines(fp)
+
+    with path.open() as fp:
+        return Config.model_validate_json(fp.read())
+
+
+def _format_location(location: tuple[int | str, ...]) -> str:
+    if len(location) == 0:
+        return ""
+
+    return ".".join(str(part) for part in location) + ": "
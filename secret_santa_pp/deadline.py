@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterator
+    from multiprocessing.synchronize import Event
+    from types import FrameType
+
+
+class Deadline:
+    """Time budget shared by everything that runs as part of one solve.
+
+    Solvers poll `expired()` and, once it's true, stop improving and return the best
+    valid result they have. The deadline also expires early on Ctrl-C (see
+    `stop_on_interrupt`), and the optional event lets the parent process expire it in
+    worker processes too.
+    """
+
+    def __init__(
+        self, time_limit: float | None, stop_event: Event | None = None
+    ) -> None:
+        self.end = None if time_limit is None else time.monotonic() + time_limit
+        self.stop_event = stop_event
+        self.interrupted = False
+
+    def expired(self) -> bool:
+        return (
+            self.interrupted
+            or (self.end is not None and time.monotonic() >= self.end)
+            or (self.stop_event is not None and self.stop_event.is_set())
+        )
+
+    def interrupt(self) -> None:
+        self.interrupted = True
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    @contextmanager
+    def stop_on_interrupt(self) -> Iterator[None]:
+        """Expire the deadline on the first Ctrl-C instead of raising.
+
+        A second Ctrl-C raises KeyboardInterrupt as usual. Signal handlers can only be
+        set from the main thread, elsewhere this does nothing.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        def handler(_signum: int, _frame: FrameType | None) -> None:
+            if self.interrupted:
+                raise KeyboardInterrupt
+
+            self.interrupt()
+
+        previous_handler = signal.signal(signal.SIGINT, handler)
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
@@ -1,7 +1,41 @@
+from collections import ChainMap
+from collections.abc import Iterable
 from datetime import date
 from pathlib import Path
+import re
+from string import Formatter
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+
+# Separates the key of a placeholder from its attribute or index, e.g. `{key[0]}`.
+PLACEHOLDER_KEY_END = re.compile(r"[.\[]")
+
+
+class CompiledTemplate(BaseModel):
+    """A template parsed once, with the common values already filled in.
+
+    `literals` surround `fields`, which are the placeholders left to fill per
+    recipient, as `(key, None)` for a plain `{key}` or `(key, piece)` where `piece` is
+    the placeholder's own format string (for conversions, format specs and indexing).
+    """
+
+    literals: list[str]
+    fields: list[tuple[str, str | None]]
+    # the template keys needed to render it
+    keys: set[str]
+    defaults: dict[str, str]
+
+    def render(self, template_data: dict[str, str]) -> str:
+        parts = [self.literals[0]]
+        for (key, piece), literal in zip(self.fields, self.literals[1:], strict=True):
+            parts.append(
+                format(template_data[key])
+                if piece is None
+                else piece.format_map(ChainMap(template_data, self.defaults))
+            )
+            parts.append(literal)
+
+        return "".join(parts)
 
 
 class TemplateManager(BaseModel):
@@ -44,12 +78,91 @@ class TemplateManager(BaseModel):
         combined_template_data = self.common_template_data | template_data
         return text.format(**combined_template_data)
 
+    def compile(
+        self, text: str, template_keys: Iterable[str], name: str = "message"
+    ) -> CompiledTemplate:
+        """Parse a template, filling in the common values that aren't in template_keys.
+
+        Raises a LookupError for a placeholder that's neither, so a template that can't
+        be filled fails before anything is rendered.
+        """
+        template_keys = set(template_keys)
+        literals = [""]
+        fields: list[tuple[str, str | None]] = []
+        used_keys: set[str] = set()
+
+        for literal, field_name, format_spec, conversion in Formatter().parse(text):
+            literals[-1] += literal
+            if field_name is None:
+                continue
+
+            # placeholders can be nested in the format spec, e.g. `{key:>{width}}`
+            keys = [
+                PLACEHOLDER_KEY_END.split(nested_name, maxsplit=1)[0]
+                for nested_name in [
+                    field_name,
+                    *(
+                        nested[1]
+                        for nested in Formatter().parse(format_spec or "")
+                        if nested[1] is not None
+                    ),
+                ]
+            ]
+            for key in keys:
+                if key not in template_keys and key not in self.common_template_data:
+                    msg = (
+                        f"Template placeholder not found: {key} (in the {name}"
+                        " template)."
+                    )
+                    raise LookupError(msg)
+
+            piece = "{" + field_name
+            piece += "" if conversion is None else f"!{conversion}"
+            piece += "" if format_spec == "" else f":{format_spec}"
+            piece += "}"
+
+            if template_keys.isdisjoint(keys):
+                literals[-1] += piece.format_map(self.common_template_data)
+                continue
+
+            fields.append(
+                (keys[0], None)
+                if field_name == keys[0] and conversion is None and format_spec == ""
+                else (keys[0], piece)
+            )
+            used_keys.update(template_keys.intersection(keys))
+            literals.append("")
+
+        return CompiledTemplate(
+            literals=literals,
+            fields=fields,
+            keys=used_keys,
+            defaults=self.common_template_data,
+        )
+
+
+class RenderedEmail(BaseModel):
+    subject: str
+    html: str | None
+    text: str | None
+
 
 class EmailMessageManager(BaseModel):
+    """Email templates, compiled once so that rendering each email is just a join.
+
+    `template_keys` are the values given per recipient, which take precedence over the
+    common template data. Every other placeholder must be common template data.
+    """
+
     subject: str
     message_html: str | None
     message_text: str | None
     template_manager: TemplateManager
+    template_keys: set[str] = set()
+
+    _subject_template: CompiledTemplate = PrivateAttr()
+    _html_template: CompiledTemplate | None = PrivateAttr()
+    _text_template: CompiledTemplate | None = PrivateAttr()
 
     def __init__(
         self,
@@ -57,6 +170,7 @@ class EmailMessageManager(BaseModel):
         subject: str,
         html_template: Path | None,
         text_template: Path | None,
+        template_keys: Iterable[str] = (),
     ) -> None:
         message_html = None
         if html_template is not None:
@@ -77,21 +191,64 @@ class EmailMessageManager(BaseModel):
             subject=subject,
             message_html=message_html,
             message_text=message_text,
+            template_keys=set(template_keys),
+        )
+
+        self._subject_template = template_manager.compile(
+            subject, self.template_keys, "subject"
+        )
+        self._html_template = (
+            None
+            if message_html is None
+            else template_manager.compile(message_html, self.template_keys, "HTML")
+        )
+        self._text_template = (
+            None
+            if message_text is None
+            else template_manager.compile(message_text, self.template_keys, "text")
         )
 
     def get_subject(self, template_data: dict[str, str]) -> str:
-        return self.template_manager.populate(template_data, self.subject)
+        return self._subject_template.render(template_data)
 
     def get_message_html(self, template_data: dict[str, str]) -> str | None:
         return (
             None
-            if self.message_html is None
-            else self.template_manager.populate(template_data, self.message_html)
+            if self._html_template is None
+            else self._html_template.render(template_data)
         )
 
     def get_message_text(self, template_data: dict[str, str]) -> str | None:
         return (
             None
-            if self.message_text is None
-            else self.template_manager.populate(template_data, self.message_text)
+            if self._text_template is None
+            else self._text_template.render(template_data)
         )
+
+    def render_batch(
+        self, template_data: Iterable[dict[str, str]]
+    ) -> list[RenderedEmail]:
+        """Render every recipient's email, checking all their values first.
+
+        So a recipient that's missing a value fails the batch before anything is
+        rendered, rather than halfway through sending.
+        """
+        template_data = list(template_data)
+        keys = self._subject_template.keys
+        for template in (self._html_template, self._text_template):
+            if template is not None:
+                keys = keys | template.keys
+
+        for data in template_data:
+            if len(missing_keys := keys.difference(data)) > 0:
+                msg = f"Template value not found: {', '.join(sorted(missing_keys))}."
+                raise LookupError(msg)
+
+        return [
+            RenderedEmail(
+                subject=self.get_subject(data),
+                html=self.get_message_html(data),
+                text=self.get_message_text(data),
+            )
+            for data in template_data
+        ]
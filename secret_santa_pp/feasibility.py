@@ -0,0 +1,331 @@
+from __future__ import annotations
+
+from typing import Any, cast
+
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel
+from scipy.sparse import (  # pyright: ignore [reportMissingTypeStubs]
+    coo_array,
+    csr_array,
+)
+from scipy.sparse.csgraph import (  # pyright: ignore [reportMissingTypeStubs]
+    breadth_first_order,  # pyright: ignore [reportUnknownVariableType]
+    connected_components,  # pyright: ignore [reportUnknownVariableType]
+    maximum_flow,  # pyright: ignore [reportUnknownVariableType]
+)
+
+from secret_santa_pp.config import Config
+from secret_santa_pp.people import CompactPeople
+from secret_santa_pp.relationship_index import RelationshipIndex
+from secret_santa_pp.weights import WeightMatrix
+
+# Number of people named in a single problem before the rest are summarised.
+MAX_REPORTED_PEOPLE = 10
+
+
+class FeasibilityProblem(BaseModel):
+    message: str
+    people: list[str]
+    constraints: list[str]
+
+    def __str__(self) -> str:
+        text = self.message
+        if len(self.people) > 0:
+            text += f": {', '.join(self.people[:MAX_REPORTED_PEOPLE])}"
+        if len(self.people) > MAX_REPORTED_PEOPLE:
+            text += f" and {len(self.people) - MAX_REPORTED_PEOPLE} more"
+
+        if len(self.constraints) > 0:
+            text += f" (excluded by: {', '.join(self.constraints)})"
+
+        return text
+
+
+class FeasibilityReport(BaseModel):
+    n_recipients: int
+    # only worked out if n_recipients is the problem
+    max_n_recipients: int | None
+    problems: list[FeasibilityProblem]
+
+    @property
+    def feasible(self) -> bool:
+        return len(self.problems) == 0
+
+    def __str__(self) -> str:
+        if self.feasible:
+            return f"Feasible with {self.n_recipients} recipients"
+
+        lines = [f"Infeasible with {self.n_recipients} recipients"]
+        if self.max_n_recipients is not None:
+            lines[0] += f", at most {self.max_n_recipients} recipients are possible"
+
+        lines.extend(f"- {problem}" for problem in self.problems)
+        return "\n".join(lines)
+
+
+def check_feasibility(
+    weight_matrix: WeightMatrix,
+    n_recipients: int,
+    single_cycle: bool,
+    config: Config | None = None,
+    people: CompactPeople | None = None,
+) -> FeasibilityReport:
+    """Check that everyone can give to and receive from `n_recipients` people.
+
+    The checks only look at which edges are allowed, from cheapest to most expensive:
+    the number of people each person can give to/receive from, whether everyone can
+    be part of a single gifting cycle (only if `single_cycle`), and Hall's condition
+    for the whole group (as a max flow). Passing them doesn't guarantee that a single
+    cycle solution exists, but failing any of them means that no solution exists.
+
+    If the config is given, the exclusion constraints responsible for each problem
+    are named too. They're looked up in the people that the weight matrix was built
+    from, if given, otherwise the config's participants are interned again, but only
+    if there's a problem to explain.
+    """
+    if len(weight_matrix.names) == 0:
+        # the degree checks below need at least one person
+        return FeasibilityReport(
+            n_recipients=n_recipients,
+            max_n_recipients=None,
+            problems=[
+                FeasibilityProblem(message="No participants", people=[], constraints=[])
+            ],
+        )
+
+    checker = _FeasibilityChecker(weight_matrix, config, people)
+    max_n_recipients = None
+
+    problems = checker.get_degree_problems(n_recipients)
+    if single_cycle and len(problems) == 0:
+        # this doesn't depend on n_recipients, unlike the other checks
+        problems = checker.get_connectivity_problems()
+        if len(problems) > 0:
+            return FeasibilityReport(
+                n_recipients=n_recipients, max_n_recipients=None, problems=problems
+            )
+
+    if len(problems) == 0:
+        problems = checker.get_hall_problems(n_recipients)
+
+    if len(problems) > 0:
+        max_n_recipients = checker.get_max_n_recipients(n_recipients - 1)
+
+    return FeasibilityReport(
+        n_recipients=n_recipients, max_n_recipients=max_n_recipients, problems=problems
+    )
+
+
+def has_regular_assignment(allowed: NDArray[np.bool_], n_recipients: int) -> bool:
+    """Check if everyone can give to and receive from exactly n_recipients people."""
+    return len(_get_hall_violators(allowed, n_recipients)[0]) == 0
+
+
+class _FeasibilityChecker:
+    def __init__(
+        self,
+        weight_matrix: WeightMatrix,
+        config: Config | None,
+        people: CompactPeople | None,
+    ) -> None:
+        self.names = weight_matrix.names
+        self.allowed = weight_matrix.allowed
+        self.out_degree = self.allowed.sum(axis=1)
+        self.in_degree = self.allowed.sum(axis=0)
+        self.config = config
+        self.people = people
+        # built on first use, since feasible solutions have nothing to explain
+        self._index: RelationshipIndex | None = None
+
+    def get_degree_problems(self, n_recipients: int) -> list[FeasibilityProblem]:
+        problems: list[FeasibilityProblem] = []
+
+        for degree, action, axis in [
+            (self.out_degree, "give to", 0),
+            (self.in_degree, "receive from", 1),
+        ]:
+            for i in cast(list[int], np.flatnonzero(degree < n_recipients).tolist()):
+                people = np.zeros(len(self.names), dtype=np.bool_)
+                people[i] = True
+                src, dst = (people, ~people) if axis == 0 else (~people, people)
+
+                problems.append(
+                    FeasibilityProblem(
+                        message=f"Can only {action} {degree[i]} other people",
+                        people=[self.names[i]],
+                        constraints=self._get_responsible_constraints(src, dst),
+                    )
+                )
+
+        return problems
+
+    def get_connectivity_problems(self) -> list[FeasibilityProblem]:
+        # if out_degree(a) + in_degree(b) > n then a gives to b or to someone who
+        # gives to b, so the graph is strongly connected without checking
+        n_people = len(self.names)
+        if self.out_degree.min() + self.in_degree.min() > n_people:
+            return []
+
+        n_components, labels = cast(
+            tuple[int, NDArray[np.int32]],
+            connected_components(
+                csr_array(self.allowed), directed=True, connection="strong"
+            ),
+        )
+        if n_components == 1:
+            return []
+
+        # name everyone outside of the largest component
+        largest = np.bincount(labels).argmax()
+        people = labels != largest
+        return [
+            FeasibilityProblem(
+                message=(
+                    "These people can't be part of a single gifting cycle with"
+                    " everyone else"
+                ),
+                people=self._get_names(people),
+                constraints=self._get_responsible_constraints(people, ~people),
+            )
+        ]
+
+    def get_hall_problems(self, n_recipients: int) -> list[FeasibilityProblem]:
+        if self._is_dense_enough(n_recipients):
+            return []
+
+        gifters, recipients = _get_hall_violators(self.allowed, n_recipients)
+        if len(gifters) == 0:
+            return []
+
+        # the gifters can only give to the recipients (with too few exceptions), so
+        # name whichever side is smaller
+        gifter_mask = np.zeros(len(self.names), dtype=np.bool_)
+        gifter_mask[gifters] = True
+        recipient_mask = np.zeros(len(self.names), dtype=np.bool_)
+        recipient_mask[recipients] = True
+        constraints = self._get_responsible_constraints(gifter_mask, ~recipient_mask)
+
+        if len(gifters) <= len(self.names) - len(recipients):
+            return [
+                FeasibilityProblem(
+                    message=(
+                        f"These {len(gifters)} people can only give to"
+                        f" {len(recipients)} people between them"
+                    ),
+                    people=self._get_names(gifter_mask),
+                    constraints=constraints,
+                )
+            ]
+
+        return [
+            FeasibilityProblem(
+                message=(
+                    f"These {len(self.names) - len(recipients)} people can only"
+                    f" receive from {len(self.names) - len(gifters)} people between"
+                    " them"
+                ),
+                people=self._get_names(~recipient_mask),
+                constraints=constraints,
+            )
+        ]
+
+    def get_max_n_recipients(self, upper_bound: int) -> int:
+        # binary search for the largest n_recipients that passes the checks
+        low = 0
+        high = min(upper_bound, int(self.out_degree.min()), int(self.in_degree.min()))
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self._is_dense_enough(mid) or has_regular_assignment(self.allowed, mid):
+                low = mid
+            else:
+                high = mid - 1
+
+        return low
+
+    def _is_dense_enough(self, n_recipients: int) -> bool:
+        # With min degree d (on both sides) any gifters S and recipients T with
+        # |S| + |T| > n have at least (|S| + |T| - n) * n_recipients edges between
+        # them if d >= n / 2 + n_recipients, which is enough for Hall's condition
+        min_degree = min(int(self.out_degree.min()), int(self.in_degree.min()))
+        return 2 * min_degree >= len(self.names) + 2 * n_recipients
+
+    def _get_names(self, people: NDArray[np.bool_]) -> list[str]:
+        return [self.names[i] for i in cast(list[int], np.flatnonzero(people).tolist())]
+
+    def _get_responsible_constraints(
+        self, src: NDArray[np.bool_], dst: NDArray[np.bool_]
+    ) -> list[str]:
+        # exclusion constraints ordered by how many src -> dst edges they exclude
+        if self.config is None:
+            return []
+
+        counts: dict[str, int] = {}
+        for constraint in self.config.constraints:
+            if constraint.limit != "exclude":
+                continue
+
+            src_pairs, dst_pairs = self._get_index(self.config).get_pairs(constraint)
+            count = int((src[src_pairs] & dst[dst_pairs]).sum())
+            if count > 0:
+                name = f"{constraint.relationship_key} ({constraint.comparator})"
+                counts[name] = counts.get(name, 0) + count
+
+        return sorted(counts, key=lambda name: -counts[name])
+
+    def _get_index(self, config: Config) -> RelationshipIndex:
+        if self._index is None:
+            self._index = (
+                RelationshipIndex.from_config(config, self.names)
+                if self.people is None
+                else RelationshipIndex.from_people(self.people)
+            )
+
+        return self._index
+
+
+def _get_hall_violators(
+    allowed: NDArray[np.bool_], n_recipients: int
+) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+    """Return gifters that can't give to n_recipients people each between them.
+
+    This is a max flow from a source, through every gifter (capacity n_recipients)
+    and allowed edge (capacity 1), to every recipient and a sink (capacity
+    n_recipients). If the flow isn't n * n_recipients, the gifters on the source side
+    of the min cut only have allowed edges to the returned recipients, plus fewer
+    than needed to anyone else. Both are empty if everyone can be assigned.
+    """
+    n_people = len(allowed)
+    source, sink = 2 * n_people, 2 * n_people + 1
+    people = np.arange(n_people)
+    src, dst = np.nonzero(allowed)
+
+    # nodes: gifters are 0..n-1, recipients are n..2n-1, then the source and sink
+    tails = np.concatenate([np.full(n_people, source), src, n_people + people])
+    heads = np.concatenate([people, n_people + dst, np.full(n_people, sink)])
+    capacities = np.concatenate(
+        [
+            np.full(n_people, n_recipients, dtype=np.int32),
+            np.ones(len(src), dtype=np.int32),
+            np.full(n_people, n_recipients, dtype=np.int32),
+        ]
+    )
+    network = csr_array(
+        coo_array((capacities, (tails, heads)), shape=(2 * n_people + 2,) * 2)
+    )
+
+    result: Any = maximum_flow(network, source, sink)
+    if result.flow_value == n_people * n_recipients:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    # the source side of the min cut is everything reachable in the residual network
+    residual = csr_array(network - result.flow)
+    residual.eliminate_zeros()
+    reachable = cast(
+        NDArray[np.int32],
+        breadth_first_order(residual, source, directed=True, return_predecessors=False),
+    )
+
+    gifters = np.sort(reachable[reachable < n_people]).astype(np.intp)
+    recipients = reachable[(reachable >= n_people) & (reachable < 2 * n_people)]
+    return gifters, np.sort(recipients - n_people).astype(np.intp)
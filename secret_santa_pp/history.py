@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from secret_santa_pp.config import LIMIT_PENALTIES, Config
+
+if TYPE_CHECKING:  # pragma: no cover
+    from scipy.sparse import coo_array  # pyright: ignore [reportMissingTypeStubs]
+
+# Penalty for giving to last year's recipient, which halves for every year before that
+# (rounded down, so pairings from long enough ago aren't penalised at all).
+HISTORY_PENALTY = LIMIT_PENALTIES["low-probability"]
+HISTORY_DECAY = 0.5
+
+
+def find_history_keys(config: Config) -> list[str]:
+    """Return the relationship keys that look like stored solutions, sorted.
+
+    That's any key that only ever lists people in the config and isn't used by a
+    constraint (past years used as constraints are already penalised). Solutions are
+    usually stored under the year, so the sorted keys go from oldest to most recent.
+    """
+    names = {person.name for person in config.people}
+    constraint_keys = {constraint.relationship_key for constraint in config.constraints}
+
+    keys: dict[str, bool] = {}
+    for person in config.people:
+        for key, relationship in person.relationships.items():
+            if key not in constraint_keys and len(relationship) > 0:
+                keys[key] = keys.get(key, True) and all(
+                    name in names for name in relationship
+                )
+
+    return sorted(key for key, is_solution in keys.items() if is_solution)
+
+
+def get_history_penalties(
+    config: Config,
+    names: list[str],
+    history_keys: list[str],
+    penalty: int = HISTORY_PENALTY,
+    decay: float = HISTORY_DECAY,
+) -> coo_array:
+    """Build the penalties for repeating past pairings as one sparse matrix.
+
+    `history_keys` go from oldest to most recent. The penalty for the most recent key
+    is `penalty`, and it's multiplied by `decay` for every key before that. Pairings
+    that were repeated over several years get the sum of their penalties.
+    """
+    # imported here so that loading the CLI doesn't import scipy
+    from scipy.sparse import coo_array  # pyright: ignore [reportMissingTypeStubs]
+
+    name_index = {name: i for i, name in enumerate(names)}
+    n_keys = len(history_keys)
+    key_penalties = {
+        key: int(penalty * decay ** (n_keys - 1 - i))
+        for i, key in enumerate(history_keys)
+    }
+
+    src: list[int] = []
+    dst: list[int] = []
+    data: list[int] = []
+    for person in config.people:
+        if (i := name_index.get(person.name)) is None:
+            continue
+
+        for key, key_penalty in key_penalties.items():
+            if key_penalty == 0:
+                continue
+
+            for recipient in person.relationships.get(key, []):
+                if (j := name_index.get(recipient)) is not None and j != i:
+                    src.append(i)
+                    dst.append(j)
+                    data.append(key_penalty)
+
+    penalties = coo_array(
+        (
+            np.array(data, dtype=np.int32),
+            (np.array(src, dtype=np.intp), np.array(dst, dtype=np.intp)),
+        ),
+        shape=(len(names), len(names)),
+    )
+    penalties.sum_duplicates()
+    return penalties
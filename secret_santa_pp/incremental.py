@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.optimize import (  # pyright: ignore [reportMissingTypeStubs]
+    linear_sum_assignment,  # pyright: ignore [reportUnknownVariableType]
+)
+
+from secret_santa_pp.config import BASE_WEIGHT
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterator
+
+    from secret_santa_pp.wrapper import DiGraph
+
+    # Weight of the edge from one person to another, or None if it's excluded.
+    type EdgeWeightGetter = Callable[[str, str], int | None]
+
+# Cost of pairing up a gifter and a recipient that can't be paired, when matching the
+# gifters and recipients of someone that dropped out.
+UNMATCHED_COST = 1_000_000
+
+
+def patch_solution(
+    graph: DiGraph[str],
+    removed: list[str],
+    added: list[str],
+    get_weight: EdgeWeightGetter,
+    seed: int | None = None,
+) -> list[str]:
+    """Remove and add people to a solution in place, changing as few edges as possible.
+
+    The gifters of someone that drops out take over their recipients where the
+    constraints allow, otherwise one of the two is moved elsewhere in the solution.
+    People that join are inserted between a gifter and their recipient, once per
+    recipient round. With one recipient each, a single gifting cycle stays a single
+    cycle.
+
+    Apart from listing the nodes once, only the people involved and a few candidate
+    edges are looked at, so the cost is proportional to the number of changes rather
+    than to the number of people.
+
+    Returns the gifters whose recipients changed (including the added people), in the
+    order that they were first changed.
+    """
+    n_recipients = len(graph.succ[next(iter(graph.nodes))])
+    patcher = _SolutionPatcher(graph, get_weight, np.random.default_rng(seed))
+
+    for name in removed:
+        if name not in graph:
+            msg = f"Participant not found: {name}."
+            raise LookupError(msg)
+
+        patcher.remove_person(name)
+
+    for name in added:
+        if name in graph:
+            msg = f"Participant already in the solution: {name}."
+            raise LookupError(msg)
+
+        patcher.add_person(name, n_recipients)
+
+    return patcher.get_changed_gifters()
+
+
+class _SolutionPatcher:
+    def __init__(
+        self,
+        graph: DiGraph[str],
+        get_weight: EdgeWeightGetter,
+        rng: np.random.Generator,
+    ) -> None:
+        self.graph = graph
+        self.get_weight = get_weight
+        self.rng = rng
+        # nodes in no particular order, for sampling, with their positions
+        self.nodes = list(graph.nodes)
+        self.node_positions = {node: i for i, node in enumerate(self.nodes)}
+        # recipients of every changed gifter before they were first changed
+        self.original_recipients: dict[str, set[str]] = {}
+
+    def get_changed_gifters(self) -> list[str]:
+        return [
+            name
+            for name, recipients in self.original_recipients.items()
+            if name in self.graph and set(self.graph.successors(name)) != recipients
+        ]
+
+    def can_give(self, src: str, dst: str) -> int | None:
+        # weight of a new edge, or None if it's excluded or already used
+        if src == dst or self.graph.has_edge(src, dst):
+            return None
+
+        return self.get_weight(src, dst)
+
+    def remove_person(self, name: str) -> None:
+        gifters = list(self.graph.predecessors(name))
+        recipients = list(self.graph.successors(name))
+        for gifter in gifters:
+            self._record(gifter)
+        self.graph.remove_node(name)
+        # swap with the last node, so that removing doesn't shift the others
+        last = self.nodes.pop()
+        if last != name:
+            position = self.node_positions[name]
+            self.nodes[position] = last
+            self.node_positions[last] = position
+        del self.node_positions[name]
+
+        # the gifters take over the recipients if they can, with the cheapest pairing
+        cost = np.array(
+            [
+                [
+                    UNMATCHED_COST
+                    if (weight := self.can_give(src, dst)) is None
+                    else weight
+                    for dst in recipients
+                ]
+                for src in gifters
+            ]
+        )
+        rows, cols = cast(
+            tuple[NDArray[np.intp], NDArray[np.intp]], linear_sum_assignment(cost)
+        )
+        for i, j in zip(
+            cast(list[int], rows.tolist()), cast(list[int], cols.tolist()), strict=True
+        ):
+            gifter, recipient = gifters[i], recipients[j]
+            if cost[i, j] < UNMATCHED_COST:
+                self._add_edge(gifter, recipient)
+            elif not (
+                # someone that gave to the person that they also received from
+                self._insert(gifter)
+                if gifter == recipient
+                else self._move_recipient(gifter, recipient)
+                or self._move_gifter(gifter, recipient)
+            ):
+                msg = (
+                    f"Invalid solution: no allowed edges to replace {name} between"
+                    f" {gifter} and {recipient}"
+                )
+                raise RuntimeError(msg)
+
+    def add_person(self, name: str, n_recipients: int) -> None:
+        self.graph.add_node(name)  # pyright: ignore [reportUnknownMemberType]
+        self.node_positions[name] = len(self.nodes)
+        self.nodes.append(name)
+        for _ in range(n_recipients):
+            if not self._insert(name):
+                msg = f"Invalid solution: no allowed edges to add {name}"
+                raise RuntimeError(msg)
+
+    def _move_recipient(self, gifter: str, recipient: str) -> bool:
+        # recipient -> next becomes gifter -> next, and the recipient is inserted
+        # somewhere else instead
+        self._record(recipient)
+        for next_ in list(self.graph.successors(recipient)):
+            self.graph.remove_edge(recipient, next_)
+            if self.can_give(gifter, next_) is not None and self._insert(recipient):
+                self._add_edge(gifter, next_)
+                return True
+
+            self.graph.add_edge(recipient, next_)  # pyright: ignore [reportUnknownMemberType]
+
+        return False
+
+    def _move_gifter(self, gifter: str, recipient: str) -> bool:
+        # prev -> gifter becomes prev -> recipient, and the gifter is inserted
+        # somewhere else instead
+        for prev in list(self.graph.predecessors(gifter)):
+            self._record(prev)
+            self.graph.remove_edge(prev, gifter)
+            if self.can_give(prev, recipient) is not None and self._insert(gifter):
+                self._add_edge(prev, recipient)
+                return True
+
+            self.graph.add_edge(prev, gifter)  # pyright: ignore [reportUnknownMemberType]
+
+        return False
+
+    def _insert(self, name: str) -> bool:
+        # src -> dst becomes src -> name -> dst for the cheapest src -> dst, trying
+        # edges in a random order and stopping at the first that adds no penalty
+        best_edge: tuple[str, str] | None = None
+        best_cost = 0
+
+        for src, dst in self._iter_random_edges():
+            if (src_weight := self.can_give(src, name)) is None or (
+                dst_weight := self.can_give(name, dst)
+            ) is None:
+                continue
+
+            cost = src_weight + dst_weight - (self.get_weight(src, dst) or 0)
+            if best_edge is None or cost < best_cost:
+                best_edge, best_cost = (src, dst), cost
+                if cost <= BASE_WEIGHT:
+                    break
+
+        if best_edge is None:
+            return False
+
+        src, dst = best_edge
+        self._record(src)
+        self.graph.remove_edge(src, dst)
+        self._add_edge(src, name)
+        self._add_edge(name, dst)
+        return True
+
+    def _iter_random_edges(self) -> Iterator[tuple[str, str]]:
+        # lazy Fisher-Yates shuffle, so that only the nodes that are tried are drawn,
+        # with the swaps in a dict rather than in a copy of the nodes
+        n_nodes = len(self.nodes)
+        swapped: dict[int, int] = {}
+        for i in range(n_nodes):
+            j = int(self.rng.integers(i, n_nodes))
+            node = self.nodes[swapped.get(j, j)]
+            swapped[j] = swapped.get(i, i)
+            for dst in list(self.graph.successors(node)):
+                yield node, dst
+
+    def _record(self, name: str) -> None:
+        if name not in self.original_recipients:
+            self.original_recipients[name] = (
+                set(self.graph.successors(name)) if name in self.graph else set()
+            )
+
+    def _add_edge(self, src: str, dst: str) -> None:
+        self._record(src)
+        self.graph.add_edge(src, dst)  # pyright: ignore [reportUnknownMemberType]
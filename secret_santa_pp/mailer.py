@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
+import queue
+import smtplib
+import ssl
+import threading
+import time
+from typing import TYPE_CHECKING, Literal, Self
+
+from pydantic import BaseModel
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterable, Iterator
+    from types import TracebackType
+
+    from secret_santa_pp.config import Config
+    from secret_santa_pp.email_message_manager import EmailMessageManager
+    from secret_santa_pp.solution import Solution
+
+type TlsMode = Literal["none", "starttls", "ssl"]
+
+# Template values that build_messages gives for each gifter.
+RECIPIENT_TEMPLATE_KEYS = ("gifter", "recipients")
+# Reply code of a server that's closing the session.
+SMTP_CLOSING = 421
+
+
+class SmtpSettings(BaseModel):
+    host: str
+    port: int
+    username: str | None = None
+    password: str | None = None
+    tls: TlsMode = "starttls"
+    timeout: float = 30.0
+
+    def connect(self) -> smtplib.SMTP:
+        context = None if self.tls == "none" else ssl.create_default_context()
+        smtp = (
+            smtplib.SMTP_SSL(
+                self.host, self.port, timeout=self.timeout, context=context
+            )
+            if self.tls == "ssl"
+            else smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        )
+
+        try:
+            if self.tls == "starttls":
+                smtp.starttls(context=context)
+            if self.username is not None:
+                smtp.login(self.username, self.password or "")
+        except OSError:
+            smtp.close()
+            raise
+
+        return smtp
+
+
+class TokenBucket:
+    """Thread-safe rate limiter, allowing bursts of `burst` and `rate` per second.
+
+    Each call reserves a token, possibly one that's only available in the future, and
+    sleeps until then outside the lock, so waiting threads don't block each other.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                float(self.burst), self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+
+        if wait > 0:
+            self._sleep(wait)
+
+
+class SmtpPool:
+    """Up to `size` SMTP sessions, opened when first needed and reused after that.
+
+    A session that fails with anything but an SMTP error response (e.g. the server
+    dropped it) is closed, and the next user of its slot opens a new one.
+    """
+
+    def __init__(self, settings: SmtpSettings, size: int) -> None:
+        self.settings = settings
+        self.size = size
+        self.n_connects = 0
+        self._lock = threading.Lock()
+        self._sessions: queue.LifoQueue[smtplib.SMTP | None] = queue.LifoQueue()
+        for _ in range(size):
+            self._sessions.put(None)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            if (smtp := self._sessions.get()) is not None:
+                _quit(smtp)
+
+        for _ in range(self.size):
+            self._sessions.put(None)
+
+    @contextmanager
+    def session(self) -> Iterator[smtplib.SMTP]:
+        smtp = self._sessions.get()
+        try:
+            if smtp is None:
+                smtp = self.settings.connect()
+                with self._lock:
+                    self.n_connects += 1
+            yield smtp
+        except OSError as e:
+            if smtp is not None and not _is_session_usable(e):
+                smtp.close()
+                smtp = None
+            raise
+        finally:
+            self._sessions.put(smtp)
+
+
+class DeliveryResult(BaseModel):
+    to: str
+    attempts: int
+    error: str | None = None
+
+
+def _quit(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.quit()
+    except OSError:
+        smtp.close()
+
+
+def _is_session_usable(error: OSError) -> bool:
+    """Check whether the server answered, without closing the session (421)."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code != SMTP_CLOSING
+
+    return isinstance(error, smtplib.SMTPRecipientsRefused)
+
+
+def is_transient(error: OSError) -> bool:
+    """Check whether sending might succeed when retried, i.e. it's not a 5xx reply."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code < 500  # noqa: PLR2004
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(
+            code < 500  # noqa: PLR2004
+            for code, _ in error.recipients.values()
+        )
+
+    return True
+
+
+def format_names(names: list[str]) -> str:
+    """Join names like "a, b and c"."""
+    if len(names) <= 1:
+        return "".join(names)
+
+    return f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+def build_messages(
+    manager: EmailMessageManager,
+    config: Config,
+    solution: Solution,
+    sender: str,
+    reply_to: str | None = None,
+    gifters: list[str] | None = None,
+    template_data: dict[str, str] | None = None,
+) -> list[EmailMessage]:
+    """Build each gifter's email, filling `{gifter}` and `{recipients}` in templates.
+
+    The manager needs RECIPIENT_TEMPLATE_KEYS and the keys of `template_data` as its
+    template keys.
+    """
+    pairings = list(solution.iter_pairings(gifters))
+    emails = manager.render_batch(
+        (template_data or {})
+        | {"gifter": gifter, "recipients": format_names(recipients)}
+        for gifter, recipients in pairings
+    )
+    messages: list[EmailMessage] = []
+
+    for (gifter, _), email in zip(pairings, emails, strict=True):
+        message = EmailMessage()
+        message["Subject"] = email.subject
+        message["From"] = sender
+        message["To"] = formataddr((gifter, str(config.get_person(gifter).email)))
+        if reply_to is not None:
+            message["Reply-To"] = reply_to
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid()
+
+        if email.text is not None:
+            message.set_content(email.text)
+        if email.html is not None:
+            if email.text is None:
+                message.set_content(email.html, subtype="html")
+            else:
+                message.add_alternative(email.html, subtype="html")
+
+        messages.append(message)
+
+    return messages
+
+
+def send_message(
+    message: EmailMessage,
+    pool: SmtpPool,
+    rate_limiter: TokenBucket | None = None,
+    max_attempts: int = 4,
+    backoff: float = 1.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> DeliveryResult:
+    """Send a message, retrying transient failures with exponential backoff."""
+    attempt = 0
+    while True:
+        attempt += 1
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        try:
+            with pool.session() as smtp:
+                smtp.send_message(message)
+        except OSError as e:
+            if attempt >= max_attempts or not is_transient(e):
+                return DeliveryResult(to=message["To"], attempts=attempt, error=str(e))
+
+            sleep(backoff * 2 ** (attempt - 1))
+        else:
+            return DeliveryResult(to=message["To"], attempts=attempt)
+
+
+def send_messages(
+    messages: Iterable[EmailMessage],
+    pool: SmtpPool,
+    rate_limiter: TokenBucket | None = None,
+    max_attempts: int = 4,
+    backoff: float = 1.0,
+) -> Iterator[DeliveryResult]:
+    """Send messages concurrently over the pool's sessions, yielding results in order.
+
+    A message that keeps failing gets a result with its error instead of stopping the
+    others.
+    """
+
+    def send(message: EmailMessage) -> DeliveryResult:
+        return send_message(message, pool, rate_limiter, max_attempts, backoff)
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        yield from executor.map(send, messages)
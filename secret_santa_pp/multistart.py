@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+import signal
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from secret_santa_pp.deadline import Deadline
+from secret_santa_pp.tsp import get_tsp_solver, solve_cycles
+
+if TYPE_CHECKING:  # pragma: no cover
+    from numpy.typing import NDArray
+
+    from secret_santa_pp.relationship_index import PairArrays
+    from secret_santa_pp.weights import WeightMatrix
+
+# Weights, allowed edges and deadline of the problem being solved, set once in each
+# worker process so that they aren't pickled again for every start.
+_worker_state: tuple[NDArray[np.int32], NDArray[np.bool_], Deadline] | None = None
+
+
+def solve_cycles_multistart(
+    weight_matrix: WeightMatrix,
+    n_recipients: int,
+    solver: str,
+    seed: int | None,
+    restarts: int = 1,
+    workers: int = 1,
+    time_limit: float | None = None,
+) -> list[PairArrays]:
+    """Run independently seeded solver starts, optionally across a process pool.
+
+    Once the time limit is reached, or on Ctrl-C, running starts return the best
+    solution they have and the starts that haven't begun yet are skipped (apart from
+    the first one, so there's always something to return).
+
+    Returns the solutions of the starts that succeeded, in start order.
+    """
+    get_tsp_solver(solver)  # fail fast on unknown solvers, before starting workers
+    starts = list(enumerate(np.random.SeedSequence(seed).spawn(restarts)))
+
+    if workers <= 1 or restarts <= 1:
+        deadline = Deadline(time_limit)
+        with deadline.stop_on_interrupt():
+            results = [
+                _run_start(
+                    weight_matrix.weights,
+                    weight_matrix.allowed,
+                    deadline,
+                    n_recipients,
+                    solver,
+                    start,
+                )
+                for start in starts
+            ]
+    else:
+        context = get_context()
+        deadline = Deadline(time_limit, context.Event())
+        with (
+            deadline.stop_on_interrupt(),
+            ProcessPoolExecutor(
+                max_workers=min(workers, restarts),
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(weight_matrix.weights, weight_matrix.allowed, deadline),
+            ) as executor,
+        ):
+            results = list(
+                executor.map(partial(_run_worker_start, n_recipients, solver), starts)
+            )
+
+    return [edges for edges in results if edges is not None]
+
+
+def _init_worker(
+    weights: NDArray[np.int32], allowed: NDArray[np.bool_], deadline: Deadline
+) -> None:
+    global _worker_state  # noqa: PLW0603
+    _worker_state = (weights, allowed, deadline)
+
+    # Ctrl-C is handled by the parent, which expires the shared deadline
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_worker_start(
+    n_recipients: int, solver: str, start: tuple[int, np.random.SeedSequence]
+) -> PairArrays | None:
+    if _worker_state is None:  # pragma: no cover
+        msg = "Worker process has not been initialised"
+        raise RuntimeError(msg)
+
+    return _run_start(*_worker_state, n_recipients, solver, start)
+
+
+def _run_start(
+    weights: NDArray[np.int32],
+    allowed: NDArray[np.bool_],
+    deadline: Deadline,
+    n_recipients: int,
+    solver: str,
+    start: tuple[int, np.random.SeedSequence],
+) -> PairArrays | None:
+    index, seed = start
+    if index > 0 and deadline.expired():
+        return None
+
+    try:
+        return solve_cycles(weights, allowed, n_recipients, solver, seed, deadline)
+    except RuntimeError:
+        return None
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from secret_santa_pp.config import BASE_WEIGHT, LIMIT_PENALTIES
+
+if TYPE_CHECKING:  # pragma: no cover
+    from numpy.typing import NDArray
+
+    from secret_santa_pp.config import Config, Constraint
+
+_EMPTY: frozenset[int] = frozenset()
+
+
+class CompactPeople:
+    """Participants interned to integers, built once from the config for solving.
+
+    People are referred to by their position in `names`. Relationship values are
+    interned to ids in `values`, where the first `len(names)` ids are the participants
+    themselves, so value `i` is also person `i`. For every relationship key:
+
+    - `relationships[key][i]` is the set of value ids in person `i`'s relationship
+      (equal sets are shared between people).
+    - `groups[key][i]` is the id of person `i`'s complete, ordered relationship list,
+      which is what the equality comparator compares, or -1 if it's empty. The ids
+      are stored in an int array, and `group_values[key]` maps them to value ids.
+    """
+
+    __slots__ = (
+        "group_values",
+        "groups",
+        "name_index",
+        "names",
+        "relationships",
+        "value_index",
+        "values",
+    )
+
+    def __init__(
+        self,
+        names: list[str],
+        values: list[str],
+        relationships: dict[str, list[frozenset[int]]],
+        groups: dict[str, array[int]],
+        group_values: dict[str, list[tuple[int, ...]]],
+    ) -> None:
+        self.names = names
+        self.name_index = {name: i for i, name in enumerate(names)}
+        self.values = values
+        self.value_index = {value: i for i, value in enumerate(values)}
+        self.relationships = relationships
+        self.groups = groups
+        self.group_values = group_values
+
+    @classmethod
+    def from_config(
+        cls, config: Config, participants: list[str] | None
+    ) -> CompactPeople:
+        participant_set = None if participants is None else set(participants)
+        people = [
+            person
+            for person in config.people
+            if participant_set is None or person.name in participant_set
+        ]
+
+        names = [person.name for person in people]
+        value_index = {name: i for i, name in enumerate(names)}
+        relationships: dict[str, list[frozenset[int]]] = {}
+        groups: dict[str, array[int]] = {}
+        group_index: dict[str, dict[tuple[int, ...], int]] = {}
+        # so that people with the same relationship share one set
+        interned_sets: dict[frozenset[int], frozenset[int]] = {}
+
+        for i, person in enumerate(people):
+            for key, relationship in person.relationships.items():
+                if len(relationship) == 0:
+                    continue
+
+                if key not in relationships:
+                    relationships[key] = [_EMPTY] * len(people)
+                    groups[key] = array("i", [-1]) * len(people)
+                    group_index[key] = {}
+
+                ids = tuple(
+                    value_index.setdefault(value, len(value_index))
+                    for value in relationship
+                )
+                value_set = frozenset(ids)
+                relationships[key][i] = interned_sets.setdefault(value_set, value_set)
+                groups[key][i] = group_index[key].setdefault(ids, len(group_index[key]))
+
+        return cls(
+            names=names,
+            values=list(value_index),
+            relationships=relationships,
+            groups=groups,
+            group_values={key: list(index) for key, index in group_index.items()},
+        )
+
+    def meet_criterion(self, constraint: Constraint, src: int, dst: int) -> bool:
+        """Check `Constraint.meet_criterion` for person ids."""
+        relationships = self.relationships.get(constraint.relationship_key)
+        if relationships is None or len(src_relationship := relationships[src]) == 0:
+            return False
+
+        if constraint.comparator == "equality":
+            groups = self.groups[constraint.relationship_key]
+            return groups[src] == groups[dst]
+
+        meet_criterion = dst in src_relationship
+
+        if constraint.comparator == "one-way contains":
+            return meet_criterion
+
+        opposite_contains = src in relationships[dst]
+
+        if constraint.comparator == "either contains":
+            meet_criterion |= opposite_contains
+        elif constraint.comparator == "two-way contains":
+            meet_criterion &= opposite_contains
+
+        return meet_criterion
+
+    def get_edge_weight(
+        self, constraints: list[Constraint], src: int, dst: int
+    ) -> int | None:
+        """Get the weight like `get_edge_weight` in `solution`, for person ids."""
+        weight = BASE_WEIGHT
+
+        for constraint in constraints:
+            if self.meet_criterion(constraint, src, dst):
+                if constraint.limit == "exclude":
+                    return None
+
+                weight += LIMIT_PENALTIES[constraint.limit]
+
+        return weight
+
+    def get_groups(self, key: str) -> list[NDArray[np.intp]]:
+        """Return the people with the same relationship list under a key, by group."""
+        if key not in self.groups:
+            return []
+
+        groups = np.frombuffer(self.groups[key], dtype=np.int32)
+
+        order = np.argsort(groups, kind="stable")
+        split = np.flatnonzero(np.diff(groups[order])) + 1
+        return [group for group in np.split(order, split) if groups[group[0]] >= 0]
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from contextlib import suppress
+import hashlib
+import io
+import math
+import os
+from typing import TYPE_CHECKING
+
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from networkx import draw_networkx  # pyright: ignore [reportUnknownVariableType]
+import numpy as np
+from numpy.typing import NDArray  # noqa: TC002 (needed at runtime by pydantic)
+from pydantic import BaseModel, ConfigDict
+
+from secret_santa_pp.config_cache import get_cache_dir
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pathlib import Path
+
+    from matplotlib.axes import Axes
+
+    from secret_santa_pp.wrapper import DiGraph
+
+EXPORT_SUFFIXES = {".png", ".svg", ".html"}
+# Graphs with more people than this are drawn without labels or arrow heads, which
+# would only overlap each other.
+LABEL_LIMIT = 100
+# Distance between neighbouring people on a ring, and between rings.
+NODE_SPACING = 1.0
+RING_MARGIN = 2.0
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>{title}</title></head>
+<body>
+{svg}
+</body>
+</html>
+"""
+
+
+class GraphLayout(BaseModel):
+    """Positions of the people in a solution graph, `positions[i]` is `names[i]`'s."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    names: list[str]
+    positions: NDArray[np.float64]
+
+    @classmethod
+    def from_graph(cls, graph: DiGraph[str]) -> GraphLayout:
+        """Lay out every ring of the solution as its own circle.
+
+        Rings are placed in rows, largest first, and each one is just big enough for
+        its people to be NODE_SPACING apart, so the layout is linear in the size of the
+        graph however big it gets.
+        """
+        rings = sorted(get_rings(graph), key=len, reverse=True)
+        radii = [
+            max(len(ring) * NODE_SPACING / (2 * math.pi), NODE_SPACING)
+            for ring in rings
+        ]
+        row_width = max(
+            2 * radii[0] if len(radii) > 0 else 0,
+            math.sqrt(sum((2 * radius + RING_MARGIN) ** 2 for radius in radii)),
+        )
+
+        positions: list[NDArray[np.float64]] = []
+        x, y, row_height = 0.0, 0.0, 0.0
+        for ring, radius in zip(rings, radii, strict=True):
+            if x > 0 and x + 2 * radius > row_width:
+                x, y, row_height = 0.0, y - row_height, 0.0
+
+            angles = np.linspace(0, 2 * math.pi, len(ring), endpoint=False)
+            positions.append(
+                np.column_stack(
+                    [
+                        x + radius + radius * np.cos(angles),
+                        y - radius + radius * np.sin(angles),
+                    ]
+                )
+            )
+            x += 2 * radius + RING_MARGIN
+            row_height = max(row_height, 2 * radius + RING_MARGIN)
+
+        return cls(
+            names=[name for ring in rings for name in ring],
+            positions=(
+                np.concatenate(positions) if len(positions) > 0 else np.empty((0, 2))
+            ),
+        )
+
+    def get_pos(self) -> dict[str, NDArray[np.float64]]:
+        return dict(zip(self.names, self.positions, strict=True))
+
+
+def get_rings(graph: DiGraph[str]) -> list[list[str]]:
+    """Split the graph into rings by following each person's first unvisited recipient.
+
+    With one recipient per gifter these are exactly the gifting cycles, otherwise each
+    ring follows one of the recipient rounds for as long as it can.
+    """
+    visited: set[str] = set()
+    rings: list[list[str]] = []
+
+    for start in graph.nodes:
+        if start in visited:
+            continue
+
+        ring = [start]
+        visited.add(start)
+        node: str | None = start
+        while (
+            node := next((s for s in graph.successors(node) if s not in visited), None)
+        ) is not None:
+            ring.append(node)
+            visited.add(node)
+
+        rings.append(ring)
+
+    return rings
+
+
+def get_layout(graph: DiGraph[str], cache_key: str | None = None) -> GraphLayout:
+    """Get the layout of a graph, cached under `cache_key` if it's given.
+
+    The cache entry is only reused while the graph's edges are the same, so a solution
+    that was updated under the same key gets a new layout.
+    """
+    if cache_key is None:
+        return GraphLayout.from_graph(graph)
+
+    cache_path = get_cache_dir() / (
+        "layout-" + hashlib.sha256(cache_key.encode()).hexdigest() + ".npz"
+    )
+    edges_hash = hashlib.sha256(
+        "\n".join(f"{src}\t{dst}" for src, dst in graph.edges).encode()
+    ).hexdigest()
+
+    # a missing, corrupt or outdated cache entry is just a cache miss
+    with suppress(Exception), np.load(cache_path, allow_pickle=False) as cached:
+        if str(cached["edges_hash"]) == edges_hash:
+            return GraphLayout(
+                names=[str(name) for name in cached["names"]],
+                positions=cached["positions"],
+            )
+
+    layout = GraphLayout.from_graph(graph)
+
+    with suppress(OSError):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp.npz")
+        np.savez(
+            tmp_path,
+            names=np.array(layout.names, dtype=np.str_),
+            positions=layout.positions,
+            edges_hash=np.array(edges_hash),
+        )
+        tmp_path.replace(cache_path)
+
+    return layout
+
+
+def draw_graph(graph: DiGraph[str], layout: GraphLayout, ax: Axes) -> None:
+    ax.set_axis_off()
+    ax.set_aspect("equal")
+
+    if len(layout.names) <= LABEL_LIMIT:
+        draw_networkx(graph, layout.get_pos(), ax=ax, node_size=1000, font_size=16)
+        return
+
+    # one collection for all the edges, since drawing them one by one doesn't scale
+    index = {name: i for i, name in enumerate(layout.names)}
+    edges = np.array(
+        [(index[src], index[dst]) for src, dst in graph.edges], dtype=np.intp
+    ).reshape(-1, 2)
+    ax.add_collection(  # pyright: ignore [reportUnknownMemberType]
+        LineCollection(  # pyright: ignore [reportArgumentType]
+            list(layout.positions[edges]), colors="grey", linewidths=0.3, alpha=0.5
+        )
+    )
+    ax.scatter(  # pyright: ignore [reportUnknownMemberType]
+        layout.positions[:, 0], layout.positions[:, 1], s=4, zorder=2
+    )
+    ax.autoscale_view()
+
+
+def export_graph(graph: DiGraph[str], layout: GraphLayout, path: Path) -> None:
+    """Draw the graph to a PNG, SVG or HTML file, without needing a display."""
+    if path.suffix not in EXPORT_SUFFIXES:
+        msg = f"Unsupported file type: {path.suffix}."
+        raise ValueError(msg)
+
+    # scale the figure with the graph, so that big graphs stay legible when zoomed
+    size = min(max(8.0, math.sqrt(len(layout.names)) / 4), 40.0)
+    figure = Figure(figsize=(size, size))
+    draw_graph(
+        graph,
+        layout,
+        figure.add_subplot(),  # pyright: ignore [reportUnknownMemberType]
+    )
+
+    if path.suffix != ".html":
+        figure.savefig(str(path))  # pyright: ignore [reportUnknownMemberType]
+        return
+
+    # the SVG is embedded inline, without its XML declaration
+    buffer = io.StringIO()
+    figure.savefig(buffer, format="svg")  # pyright: ignore [reportUnknownMemberType]
+    svg = buffer.getvalue()
+    path.write_text(HTML_TEMPLATE.format(title=path.stem, svg=svg[svg.index("<svg") :]))
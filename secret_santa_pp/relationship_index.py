@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import cast
+
+import numpy as np
+from numpy.typing import NDArray
+from pydantic import BaseModel
+
+from secret_santa_pp.config import Config, Constraint
+from secret_santa_pp.people import CompactPeople
+
+type PairArrays = tuple[NDArray[np.intp], NDArray[np.intp]]
+
+
+class RelationshipIndex(BaseModel):
+    """Inverted index of the participants' relationships.
+
+    People are referred to by their position in `names`. For every relationship key,
+    `members` maps each value to the people whose relationship list contains it, and
+    `groups` maps each complete (ordered) relationship list to the people that have
+    exactly that list. Empty relationship lists are not indexed.
+    """
+
+    names: list[str]
+    name_index: dict[str, int]
+    members: dict[str, dict[str, list[int]]]
+    groups: dict[str, dict[tuple[str, ...], list[int]]]
+
+    @classmethod
+    def from_config(
+        cls, config: Config, participants: list[str] | None
+    ) -> RelationshipIndex:
+        return cls.from_people(CompactPeople.from_config(config, participants))
+
+    @classmethod
+    def from_people(cls, people: CompactPeople) -> RelationshipIndex:
+        members: dict[str, dict[str, list[int]]] = {}
+        groups: dict[str, dict[tuple[str, ...], list[int]]] = {}
+
+        for key, relationships in people.relationships.items():
+            value_map: defaultdict[str, list[int]] = defaultdict(list)
+            for i, relationship in enumerate(relationships):
+                for value in relationship:
+                    value_map[people.values[value]].append(i)
+            members[key] = dict(value_map)
+
+            # every group has at least one person, so the groups line up by id
+            groups[key] = {
+                tuple(people.values[value] for value in ids): cast(
+                    list[int], group.tolist()
+                )
+                for ids, group in zip(
+                    people.group_values[key], people.get_groups(key), strict=True
+                )
+            }
+
+        return cls(
+            names=people.names,
+            name_index=people.name_index,
+            members=members,
+            groups=groups,
+        )
+
+    def get_pairs(self, constraint: Constraint) -> PairArrays:
+        """Return the (src, dst) index pairs that meet the constraint's criterion.
+
+        Self-pairs are never returned since nobody can be their own recipient anyway.
+
+        Only the relationship entries under the constraint's key are visited, so the
+        cost is proportional to the number of matching pairs rather than to the square
+        of the number of participants.
+        """
+        if constraint.comparator == "equality":
+            return self._get_equality_pairs(constraint.relationship_key)
+
+        contains = self._get_contains_pairs(constraint.relationship_key)
+
+        if constraint.comparator == "one-way contains":
+            pairs = contains
+        elif constraint.comparator == "two-way contains":
+            pairs = {(src, dst) for src, dst in contains if (dst, src) in contains}
+        else:
+            # either contains, the reverse direction only counts if the gifter has a
+            # relationship under this key (see Constraint.meet_criterion)
+            has_relationship = {
+                i
+                for group in self.groups.get(constraint.relationship_key, {}).values()
+                for i in group
+            }
+            pairs = contains | {
+                (dst, src) for src, dst in contains if dst in has_relationship
+            }
+
+        return _to_arrays(pairs)
+
+    def _get_contains_pairs(self, key: str) -> set[tuple[int, int]]:
+        return {
+            (src, dst)
+            for value, srcs in self.members.get(key, {}).items()
+            if (dst := self.name_index.get(value)) is not None
+            for src in srcs
+            if src != dst
+        }
+
+    def _get_equality_pairs(self, key: str) -> PairArrays:
+        src_chunks: list[NDArray[np.intp]] = []
+        dst_chunks: list[NDArray[np.intp]] = []
+
+        for group in self.groups.get(key, {}).values():
+            if len(group) < 2:  # noqa: PLR2004
+                continue
+
+            indices = np.asarray(group, dtype=np.intp)
+            src, dst = np.meshgrid(indices, indices, indexing="ij")
+            not_self = src != dst
+            src_chunks.append(src[not_self])
+            dst_chunks.append(dst[not_self])
+
+        if len(src_chunks) == 0:
+            return _to_arrays(set())
+
+        return np.concatenate(src_chunks), np.concatenate(dst_chunks)
+
+
+def _to_arrays(pairs: set[tuple[int, int]]) -> PairArrays:
+    if len(pairs) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    src, dst = zip(*pairs, strict=True)
+    return np.asarray(src, dtype=np.intp), np.asarray(dst, dtype=np.intp)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+import numpy as np
+from pydantic import BaseModel
+
+from secret_santa_pp.config import (
+    BASE_WEIGHT,
+    LIMIT_PENALTIES,
+    ComparatorType,
+    Config,
+    LimitType,
+)
+from secret_santa_pp.relationship_index import RelationshipIndex
+from secret_santa_pp.weights import WeightMatrix
+
+if TYPE_CHECKING:  # pragma: no cover
+    from numpy.typing import NDArray
+
+    from secret_santa_pp.wrapper import DiGraph
+
+
+class ConstraintHits(BaseModel):
+    relationship_key: str
+    comparator: ComparatorType
+    limit: LimitType
+    # number of pairings in the solution that meet the constraint's criterion
+    count: int
+
+
+class SolutionScore(BaseModel):
+    n_people: int
+    n_pairings: int
+    total_weight: int
+    # total weight above BASE_WEIGHT per pairing, i.e. from constraints
+    total_penalty: int
+    # number of pairings that meet at least one constraint with each limit
+    limit_counts: dict[LimitType, int]
+    constraint_hits: list[ConstraintHits]
+    # lowest total penalty of any assignment with the same number of recipients,
+    # which can't be beaten by any solution (None if it wasn't worked out)
+    lower_bound: int | None
+
+    def __str__(self) -> str:
+        lines = [
+            f"People: {self.n_people}",
+            f"Pairings: {self.n_pairings}",
+            f"Total weight: {self.total_weight}",
+            f"Total penalty: {self.total_penalty}",
+        ]
+        if self.lower_bound is not None:
+            lines.append(f"Lower bound: {self.lower_bound}")
+
+        lines.extend(
+            f"{'Excluded' if limit == 'exclude' else limit.capitalize()} pairings:"
+            f" {count}"
+            for limit, count in self.limit_counts.items()
+        )
+        lines.append("Constraint hits:")
+        lines.extend(
+            f"- {hits.relationship_key} ({hits.comparator}, {hits.limit}): {hits.count}"
+            for hits in self.constraint_hits
+        )
+        return "\n".join(lines)
+
+
+def score_solution(
+    graph: DiGraph[str], config: Config, lower_bound: bool = True
+) -> SolutionScore:
+    """Score a solution against the config's constraints.
+
+    The pairings of the solution are matched against the pairs that meet each
+    constraint with a single vectorised lookup per constraint, so the dense weight
+    matrix is only built for the lower bound, which solves an assignment problem.
+    """
+    index = RelationshipIndex.from_config(config, list(graph.nodes))
+    if missing := [name for name in graph.nodes if name not in index.name_index]:
+        msg = (
+            f"Person not found: {', '.join(missing)}. Everyone in the solution needs"
+            " to be in the config to score it."
+        )
+        raise LookupError(msg)
+
+    n_people = len(index.names)
+    edges = cast(list[tuple[str, str]], list(graph.edges))
+    edge_codes = np.array(
+        [
+            index.name_index[src] * n_people + index.name_index[dst]
+            for src, dst in edges
+        ],
+        dtype=np.int64,
+    )
+
+    limits: list[LimitType] = ["exclude", *LIMIT_PENALTIES]
+    limit_hits: dict[LimitType, NDArray[np.bool_]] = {
+        limit: np.zeros(len(edges), dtype=np.bool_) for limit in limits
+    }
+    constraint_hits: list[ConstraintHits] = []
+    total_penalty = 0
+
+    for constraint in config.constraints:
+        src, dst = index.get_pairs(constraint)
+        hits = np.isin(edge_codes, src.astype(np.int64) * n_people + dst)
+        count = int(hits.sum())
+
+        constraint_hits.append(
+            ConstraintHits(
+                relationship_key=constraint.relationship_key,
+                comparator=constraint.comparator,
+                limit=constraint.limit,
+                count=count,
+            )
+        )
+        limit_hits[constraint.limit] |= hits
+        if constraint.limit != "exclude":
+            total_penalty += count * LIMIT_PENALTIES[constraint.limit]
+
+    return SolutionScore(
+        n_people=n_people,
+        n_pairings=len(edges),
+        total_weight=len(edges) * BASE_WEIGHT + total_penalty,
+        total_penalty=total_penalty,
+        limit_counts={limit: int(hits.sum()) for limit, hits in limit_hits.items()},
+        constraint_hits=constraint_hits,
+        lower_bound=(
+            _get_lower_bound(config, index.names, len(edges) // max(n_people, 1))
+            if lower_bound
+            else None
+        ),
+    )
+
+
+def _get_lower_bound(config: Config, names: list[str], n_recipients: int) -> int | None:
+    # scipy is only needed (and imported) for the lower bound
+    from secret_santa_pp.assignment import solve_assignment
+
+    weight_matrix = WeightMatrix.from_config(config, names)
+    try:
+        edges = solve_assignment(weight_matrix, n_recipients)
+    except RuntimeError:
+        return None
+
+    return weight_matrix.get_total_weight(edges) - len(edges[0]) * BASE_WEIGHT
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, NoReturn
+
+if TYPE_CHECKING:  # pragma: no cover
+    from secret_santa_pp.config import Config
+
+KEYWORDS = {"all", "and", "or", "except"}
+TOKEN_PATTERN = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|([()=])|([^\s()="]+))')
+
+
+class _Parser:
+    """Recursive descent parser that evaluates a selection to a set of person ids.
+
+    Grammar, where `and` binds tighter than `or` and `except`:
+
+        expression := conjunction (("or" | "except") conjunction)*
+        conjunction := term ("and" term)*
+        term := "all" | word "=" word | word | "(" expression ")"
+    """
+
+    def __init__(self, config: Config, selection: str) -> None:
+        self.config = config
+        self.selection = selection
+        # (text, is keyword or symbol, position)
+        self.tokens: list[tuple[str, bool, int]] = []
+        self.position = 0
+
+        selection = selection.rstrip()
+        i = 0
+        while i < len(selection):
+            if (match := TOKEN_PATTERN.match(selection, i)) is None:
+                self.fail("unexpected '\"'", selection.index('"', i))
+
+            quoted, symbol, word = match.groups()
+            start = match.start(match.lastindex or 0)
+            if quoted is not None:
+                self.tokens.append((re.sub(r"\\(.)", r"\1", quoted), False, start))
+            elif symbol is not None:
+                self.tokens.append((symbol, True, start))
+            elif word is not None:
+                self.tokens.append((word, word in KEYWORDS, start))
+            i = match.end()
+
+    def fail(self, problem: str, position: int | None = None) -> NoReturn:
+        if position is None:
+            position = (
+                self.tokens[self.position][2]
+                if self.position < len(self.tokens)
+                else len(self.selection)
+            )
+
+        msg = f"Invalid selection: {problem} at position {position}."
+        raise ValueError(msg)
+
+    def peek(self) -> tuple[str, bool] | None:
+        if self.position >= len(self.tokens):
+            return None
+
+        text, is_keyword, _ = self.tokens[self.position]
+        return text, is_keyword
+
+    def take(self, keyword: str) -> bool:
+        if self.peek() != (keyword, True):
+            return False
+
+        self.position += 1
+        return True
+
+    def parse(self) -> set[int]:
+        person_ids = self.parse_expression()
+        if self.position < len(self.tokens):
+            self.fail(f"unexpected '{self.tokens[self.position][0]}'")
+
+        return person_ids
+
+    def parse_expression(self) -> set[int]:
+        person_ids = self.parse_conjunction()
+        while True:
+            if self.take("or"):
+                person_ids |= self.parse_conjunction()
+            elif self.take("except"):
+                person_ids -= self.parse_conjunction()
+            else:
+                return person_ids
+
+    def parse_conjunction(self) -> set[int]:
+        person_ids = self.parse_term()
+        while self.take("and"):
+            person_ids &= self.parse_term()
+
+        return person_ids
+
+    def parse_term(self) -> set[int]:
+        if self.take("all"):
+            return set(range(len(self.config.people)))
+
+        if self.take("("):
+            person_ids = self.parse_expression()
+            if not self.take(")"):
+                self.fail("expected ')'")
+            return person_ids
+
+        if (token := self.peek()) is None or token[1] is True:
+            self.fail("expected a name or relationship")
+
+        self.position += 1
+        if not self.take("="):
+            return {self.config.get_person_id(token[0])}
+
+        if (value := self.peek()) is None or value[1] is True:
+            self.fail("expected a relationship value")
+
+        self.position += 1
+        return set(self.config.find_people(token[0], value[0]))
+
+
+def select_participants(config: Config, selection: str) -> list[str]:
+    """Get the names of the people matching a selection, in the order of the config.
+
+    A selection combines terms with `and`, `or`, `except` and parentheses, where a term
+    is `all`, a person's name, or `key=value` for everyone whose relationship `key`
+    contains `value`. Names and values with spaces or reserved words are quoted, e.g.
+    `office=London and team=Sales except "Jane Doe"`. Terms are resolved with the
+    config's indexes, so selecting from a large config doesn't scan it.
+    """
+    person_ids = _Parser(config, selection).parse()
+    return [person.name for person in config.get_people(person_ids)]
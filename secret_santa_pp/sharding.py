@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from functools import partial
+from multiprocessing import get_context
+import signal
+from typing import TYPE_CHECKING, cast
+
+import numpy as np
+
+from secret_santa_pp.deadline import Deadline
+from secret_santa_pp.tsp import get_tsp_solver, solve_cycles
+
+if TYPE_CHECKING:  # pragma: no cover
+    from numpy.typing import NDArray
+
+    from secret_santa_pp.relationship_index import PairArrays
+    from secret_santa_pp.weights import LazyWeights, WeightMatrix
+
+    # anything that can build the weights of a shard and weigh the edges between shards
+    type ShardWeights = WeightMatrix | LazyWeights
+
+    # weights and allowed edges of one shard (by position in the shard), and its seed
+    type ShardProblem = tuple[
+        NDArray[np.int32], NDArray[np.bool_], np.random.SeedSequence
+    ]
+
+# Number of places the first shard's cycle is broken at before giving up on stitching
+# the shard cycles of a round together.
+MAX_STITCH_ATTEMPTS = 100
+
+# Deadline of the solve, set once in each worker process.
+_worker_deadline: Deadline | None = None
+
+
+def get_shards(
+    n_people: int,
+    shard_size: int,
+    n_recipients: int,
+    seed: int | None,
+    groups: list[list[int]] | None = None,
+) -> list[NDArray[np.intp]]:
+    """Split everyone into shards of at least `shard_size` people.
+
+    Shards are random unless groups of people (e.g. everyone in the same office) are
+    given, in which case people in the same group are kept in the same shard as far as
+    the shard sizes allow. People that aren't in any group are shared out last.
+
+    Every shard needs more than `2 * n_recipients` people to fit `n_recipients`
+    edge-disjoint cycles, so a smaller `shard_size` raises a ValueError.
+    """
+    if shard_size <= 2 * n_recipients:
+        msg = (
+            f"Shard size too small: {shard_size}, shards need more than"
+            f" {2 * n_recipients} people for {n_recipients} recipients."
+        )
+        raise ValueError(msg)
+
+    if groups is None:
+        order = np.random.default_rng(seed).permutation(n_people)
+    else:
+        grouped = np.zeros(n_people, dtype=np.bool_)
+        for group in groups:
+            grouped[group] = True
+
+        order = np.concatenate(
+            [
+                *(np.asarray(group, dtype=np.intp) for group in groups),
+                np.flatnonzero(~grouped),
+            ]
+        )
+
+    return np.array_split(order, max(n_people // shard_size, 1))
+
+
+def solve_cycles_sharded(
+    weights: ShardWeights,
+    n_recipients: int,
+    solver: str,
+    seed: int | None,
+    shards: list[NDArray[np.intp]],
+    restarts: int = 1,
+    workers: int = 1,
+    time_limit: float | None = None,
+    submatrices: list[WeightMatrix] | None = None,
+) -> PairArrays:
+    """Find `n_recipients` edge-disjoint cycles through every person, shard by shard.
+
+    Each shard's cycles are solved independently (optionally across a process pool),
+    keeping the best of `restarts` starts, which only needs the shard's part of the
+    weight matrix (`submatrices`, if they've already been built). Each round's shard
+    cycles are then stitched into a single cycle through everyone, which only needs
+    the weights of the edges tried as seams.
+    """
+    get_tsp_solver(solver)  # fail fast on unknown solvers, before starting workers
+    if submatrices is None:
+        submatrices = [weights.get_submatrix(shard) for shard in shards]
+
+    seeds = np.random.SeedSequence(seed).spawn(len(shards) + 1)
+    problems: list[ShardProblem] = [
+        (submatrix.weights, submatrix.allowed, shard_seed)
+        for submatrix, shard_seed in zip(submatrices, seeds, strict=False)
+    ]
+
+    if workers <= 1 or len(shards) <= 1:
+        deadline = Deadline(time_limit)
+        with deadline.stop_on_interrupt():
+            tours = [
+                _solve_shard(n_recipients, solver, restarts, deadline, problem)
+                for problem in problems
+            ]
+    else:
+        context = get_context()
+        deadline = Deadline(time_limit, context.Event())
+        with (
+            deadline.stop_on_interrupt(),
+            ProcessPoolExecutor(
+                max_workers=min(workers, len(shards)),
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(deadline,),
+            ) as executor,
+        ):
+            tours = list(
+                executor.map(
+                    partial(_run_worker_shard, n_recipients, solver, restarts), problems
+                )
+            )
+
+    # each shard's tours are rows of positions in the shard, one row per round
+    stitcher = _Stitcher(weights, np.random.default_rng(seeds[-1]))
+    rounds = [
+        stitcher.stitch(
+            [
+                shard[shard_tours[i]]
+                for shard, shard_tours in zip(shards, tours, strict=True)
+            ]
+        )
+        for i in range(n_recipients)
+    ]
+    return np.concatenate(rounds), np.concatenate(
+        [np.roll(tour, -1) for tour in rounds]
+    )
+
+
+def _init_worker(deadline: Deadline) -> None:
+    global _worker_deadline  # noqa: PLW0603
+    _worker_deadline = deadline
+
+    # Ctrl-C is handled by the parent, which expires the shared deadline
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_worker_shard(
+    n_recipients: int, solver: str, restarts: int, problem: ShardProblem
+) -> NDArray[np.intp]:
+    if _worker_deadline is None:  # pragma: no cover
+        msg = "Worker process has not been initialised"
+        raise RuntimeError(msg)
+
+    return _solve_shard(n_recipients, solver, restarts, _worker_deadline, problem)
+
+
+def _solve_shard(
+    n_recipients: int,
+    solver: str,
+    restarts: int,
+    deadline: Deadline,
+    problem: ShardProblem,
+) -> NDArray[np.intp]:
+    weights, allowed, seed = problem
+    best: NDArray[np.intp] | None = None
+    best_weight = 0
+
+    for i, start_seed in enumerate(seed.spawn(restarts)):
+        if i > 0 and deadline.expired():
+            break
+
+        with suppress(RuntimeError):
+            src, dst = solve_cycles(
+                weights, allowed, n_recipients, solver, start_seed, deadline
+            )
+            weight = int(weights[src, dst].sum())
+            if best is None or weight < best_weight:
+                best, best_weight = src, weight
+
+    if best is None:
+        msg = "Invalid solution: no cycle found using only allowed edges"
+        raise RuntimeError(msg)
+
+    return best.reshape(n_recipients, -1)
+
+
+class _Stitcher:
+    """Joins the shard cycles of each round into a single cycle through everyone.
+
+    Each shard's cycle is broken after one of its people, who then gives to the person
+    after the break in the next shard's cycle instead. These seam edges go between
+    shards, so they're the only edges that rounds could share and are checked against
+    the seams of earlier rounds as well as the allowed edges. Only the edges next to
+    the candidate breaks are weighed, so the full weight matrix is never needed.
+    """
+
+    def __init__(self, weights: ShardWeights, rng: np.random.Generator) -> None:
+        self.weights = weights
+        self.n_people = len(weights.names)
+        self.rng = rng
+        self.used_seams = np.empty(0, dtype=np.int64)
+
+    def stitch(self, cycles: list[NDArray[np.intp]]) -> NDArray[np.intp]:
+        if len(cycles) == 1:
+            return cycles[0]
+
+        # shuffle the shards so that every round has different seams
+        cycles = [cycles[i] for i in self.rng.permutation(len(cycles))]
+
+        positions = self.rng.permutation(len(cycles[0]))[:MAX_STITCH_ATTEMPTS]
+        for position in cast(list[int], positions.tolist()):
+            if (result := self._stitch_from(cycles, position)) is not None:
+                tour, seams = result
+                self.used_seams = np.concatenate([self.used_seams, seams])
+                return tour
+
+        msg = "Invalid solution: no allowed edges to stitch the shard cycles together"
+        raise RuntimeError(msg)
+
+    def _stitch_from(
+        self, cycles: list[NDArray[np.intp]], position: int
+    ) -> tuple[NDArray[np.intp], NDArray[np.int64]] | None:
+        # break the first cycle after `position`, then greedily pick the cheapest
+        # break in each of the other cycles that has an available seam
+        first_head = int(cycles[0][(position + 1) % len(cycles[0])])
+        tail = int(cycles[0][position])
+        pieces = [np.roll(cycles[0], -(position + 1))]
+        seams = [(tail, first_head)]  # placeholder for the seam closing the cycle
+
+        for i, cycle in enumerate(cycles[1:], start=1):
+            heads = np.roll(cycle, -1)
+            seam_weights, valid = self._get_seams(np.full_like(heads, tail), heads)
+            cost = (
+                seam_weights.astype(np.int64) - self.weights.get_edges(cycle, heads)[0]
+            )
+            if i == len(cycles) - 1:
+                closing_weights, closing_valid = self._get_seams(
+                    cycle, np.full_like(cycle, first_head)
+                )
+                valid &= closing_valid
+                cost += closing_weights
+
+            candidates = np.flatnonzero(valid)
+            if len(candidates) == 0:
+                return None
+
+            j = int(candidates[cost[candidates].argmin()])
+            seams.append((tail, int(heads[j])))
+            pieces.append(np.roll(cycle, -(j + 1)))
+            tail = int(cycle[j])
+
+        seams[0] = (tail, first_head)
+        src, dst = np.array(seams, dtype=np.int64).T
+        return np.concatenate(pieces), src * self.n_people + dst
+
+    def _get_seams(
+        self, src: NDArray[np.intp], dst: NDArray[np.intp]
+    ) -> tuple[NDArray[np.int32], NDArray[np.bool_]]:
+        # weights of the seam edges, and whether they're allowed and not used yet
+        weights, allowed = self.weights.get_edges(src, dst)
+        codes = src.astype(np.int64) * self.n_people + dst
+        return weights, allowed & ~np.isin(codes, self.used_seams)
@@ -1,29 +1,52 @@
 from __future__ import annotations
 
-from copy import deepcopy
-from itertools import pairwise
-from typing import TYPE_CHECKING, Any, cast
-
-from matplotlib import pyplot as plt
-from networkx import (
-    approximation,
-    draw,  # pyright: ignore [reportUnknownVariableType]
-    draw_networkx_labels,  # pyright: ignore [reportUnknownVariableType]
-    shell_layout,  # pyright: ignore [reportUnknownVariableType]
-)
+from contextlib import nullcontext, suppress
+import csv
+from itertools import islice
+from typing import TYPE_CHECKING, Literal, TextIO, cast
+
 from pydantic import BaseModel, ConfigDict
 
-from secret_santa_pp.config import Config, Constraint, Person
+from secret_santa_pp.config import (
+    BASE_WEIGHT,
+    LIMIT_PENALTIES,
+    Config,
+    Constraint,
+    Person,
+)
+from secret_santa_pp.history import get_history_penalties
+from secret_santa_pp.multistart import solve_cycles_multistart
+from secret_santa_pp.people import CompactPeople
+from secret_santa_pp.scoring import SolutionScore, score_solution
+from secret_santa_pp.sharding import get_shards, solve_cycles_sharded
+from secret_santa_pp.tsp import DEFAULT_TSP_SOLVER, check_n_recipients
+from secret_santa_pp.weights import LazyWeights, WeightMatrix
 from secret_santa_pp.wrapper import DiGraph
 
 if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterator
+    from pathlib import Path
+
     from rich.console import Console
 
+    from secret_santa_pp.feasibility import FeasibilityReport
+
+# The solver backends that need scipy and the plotting that needs matplotlib are
+# imported by the methods that use them, so that commands which only load and print a
+# solution start quickly (see tests/test_import_time.py).
+
+# cycle: each recipient round is a single Hamiltonian cycle (approximate, via TSP)
+# assignment: any cycle structure is allowed (exact, via an assignment problem)
+type SolutionMode = Literal["cycle", "assignment"]
+
+# Lines printed per console.print call, since rich is slow with one call per gifter.
+PRINT_BATCH_SIZE = 1000
+
 
 def get_edge_weight(
     constraints: list[Constraint], src_person: Person, dst_person: Person
 ) -> int | None:
-    weight = 1
+    weight = BASE_WEIGHT
 
     if len(src_person.relationships) > 0:
         for constraint in constraints:
@@ -31,93 +54,318 @@ def get_edge_weight(
                 if constraint.limit == "exclude":
                     return None
 
-                if constraint.limit == "low-probability":
-                    weight += 4
-                elif constraint.limit == "medium-probability":
-                    weight += 2
+                weight += LIMIT_PENALTIES[constraint.limit]
 
     return weight
 
 
-def tsp_solver(graph: DiGraph[str], weight: str) -> list[str]:
-    return cast(
-        list[str],
-        approximation.simulated_annealing_tsp(  # pyright: ignore [reportUnknownMemberType]
-            graph, "greedy", weight=weight, max_iterations=100, N_inner=1000
-        ),
-    )
-
-
 class Solution(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
     graph: DiGraph[str]
+    weight_matrix: WeightMatrix | None = None
+    # participants interned to ids, which solving uses instead of names
+    people: CompactPeople | None = None
 
     @classmethod
     def generate(
-        cls, config: Config, participants: list[str] | None, n_recipients: int
+        cls,
+        config: Config,
+        participants: list[str] | None,
+        n_recipients: int,
+        mode: SolutionMode = "cycle",
+        solver: str = DEFAULT_TSP_SOLVER,
+        seed: int | None = None,
+        restarts: int = 1,
+        workers: int = 1,
+        time_limit: float | None = None,
+        shard_size: int | None = None,
+        shard_key: str | None = None,
+        history_keys: list[str] | None = None,
     ) -> Solution:
+        check_n_recipients(n_recipients)
         solution = cls(graph=DiGraph())
-        solution.init_graph(config, participants)
-        solution.generate_solution(n_recipients)
+        if mode == "cycle" and shard_size is not None:
+            solution.generate_sharded_solution(
+                config,
+                participants,
+                n_recipients,
+                shard_size,
+                shard_key=shard_key,
+                solver=solver,
+                seed=seed,
+                restarts=restarts,
+                workers=workers,
+                time_limit=time_limit,
+                history_keys=history_keys,
+            )
+            return solution
+
+        solution.init_weight_matrix(config, participants, history_keys)
+
+        # fail fast, with an explanation, instead of after a full solve
+        report = solution.check_feasibility(n_recipients, mode, config)
+        if not report.feasible:
+            raise RuntimeError(str(report))
+
+        if mode == "assignment":
+            solution.generate_assignment(n_recipients)
+        else:
+            solution.generate_solution(
+                n_recipients,
+                solver=solver,
+                seed=seed,
+                restarts=restarts,
+                workers=workers,
+                time_limit=time_limit,
+            )
+
         return solution
 
     @classmethod
     def load(cls, config: Config, solution_key: str) -> Solution:
-        graph = config.load_graph(solution_key)
+        return cls.from_stored_graph(config.load_graph(solution_key), solution_key)
+
+    @classmethod
+    def from_stored_graph(cls, graph: DiGraph[str], solution_key: str) -> Solution:
         if len(graph.edges) == 0:
             msg = f"Solution key not found: {solution_key}."
             raise LookupError(msg)
 
         return cls(graph=graph)
 
+    def init_weight_matrix(
+        self,
+        config: Config,
+        participants: list[str] | None,
+        history_keys: list[str] | None = None,
+    ) -> None:
+        self.people = CompactPeople.from_config(config, participants)
+        self.weight_matrix = WeightMatrix.from_people(self.people, config.constraints)
+        if history_keys:
+            self.weight_matrix.add_penalties(
+                get_history_penalties(config, self.weight_matrix.names, history_keys)
+            )
+
     def init_graph(self, config: Config, participants: list[str] | None) -> None:
-        people = [
-            person
-            for person in config.people
-            if participants is None or person.name in participants
-        ]
-        n_people = len(people)
-        for i in range(n_people):
-            person1 = people[i]
-
-            for j in range(i + 1, n_people):
-                person2 = people[j]
-
-                if (
-                    weight := get_edge_weight(config.constraints, person1, person2)
-                ) is not None:
-                    self.graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
-                        person1.name, person2.name, weight=weight
-                    )
-
-                if (
-                    weight := get_edge_weight(config.constraints, person2, person1)
-                ) is not None:
-                    self.graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
-                        person2.name, person1.name, weight=weight
-                    )
-
-    def generate_solution(self, n_recipients: int) -> None:
-        final_graph: DiGraph[str] = DiGraph()
-        init_graph = deepcopy(self.graph)
-        for _ in range(n_recipients):
-            tsp_path: list[str] = cast(
-                list[str],
-                approximation.traveling_salesman_problem(  # pyright: ignore [reportUnknownMemberType]
-                    deepcopy(init_graph), cycle=True, method=tsp_solver
-                ),
+        self.init_weight_matrix(config, participants)
+        self.graph = self._get_weight_matrix().to_graph()
+
+    def check_feasibility(
+        self, n_recipients: int, mode: SolutionMode, config: Config | None = None
+    ) -> FeasibilityReport:
+        from secret_santa_pp.feasibility import check_feasibility
+
+        return check_feasibility(
+            self._get_weight_matrix(),
+            n_recipients,
+            single_cycle=mode == "cycle",
+            config=config,
+            people=self.people,
+        )
+
+    def score(self, config: Config, lower_bound: bool = True) -> SolutionScore:
+        return score_solution(self.graph, config, lower_bound=lower_bound)
+
+    def generate_solution(
+        self,
+        n_recipients: int,
+        solver: str = DEFAULT_TSP_SOLVER,
+        seed: int | None = None,
+        restarts: int = 1,
+        workers: int = 1,
+        time_limit: float | None = None,
+    ) -> None:
+        weight_matrix = self._get_weight_matrix()
+        candidates = solve_cycles_multistart(
+            weight_matrix, n_recipients, solver, seed, restarts, workers, time_limit
+        )
+
+        # keep the lowest weight start that gives a valid solution
+        for edges in sorted(candidates, key=weight_matrix.get_total_weight):
+            self.graph = weight_matrix.to_graph(edges)
+            with suppress(RuntimeError):
+                self._verify_solution(n_recipients)
+                return
+
+        msg = "Invalid solution: no cycle found using only allowed edges"
+        raise RuntimeError(msg)
+
+    def generate_sharded_solution(
+        self,
+        config: Config,
+        participants: list[str] | None,
+        n_recipients: int,
+        shard_size: int,
+        shard_key: str | None = None,
+        solver: str = DEFAULT_TSP_SOLVER,
+        seed: int | None = None,
+        restarts: int = 1,
+        workers: int = 1,
+        time_limit: float | None = None,
+        history_keys: list[str] | None = None,
+    ) -> None:
+        """Solve the cycles shard by shard, see `solve_cycles_sharded`.
+
+        Only each shard's part of the weight matrix is built (and checked for
+        feasibility), so memory grows with the shard size rather than with the square
+        of the number of participants. People with the same relationship list under
+        `shard_key` are kept in the same shard as far as possible.
+        """
+        from secret_santa_pp.feasibility import check_feasibility
+
+        weights = LazyWeights(config, participants, history_keys)
+        groups = (
+            None
+            if shard_key is None
+            else [
+                cast(list[int], group.tolist())
+                for group in weights.people.get_groups(shard_key)
+            ]
+        )
+        shards = get_shards(len(weights.names), shard_size, n_recipients, seed, groups)
+
+        # fail fast, with an explanation, instead of after solving the other shards
+        submatrices = [weights.get_submatrix(shard) for shard in shards]
+        for i, submatrix in enumerate(submatrices):
+            report = check_feasibility(
+                submatrix, n_recipients, single_cycle=True, config=config
             )
+            if not report.feasible:
+                msg = f"Shard {i + 1} of {len(shards)}: {report}"
+                raise RuntimeError(msg)
 
-            for src, dst in pairwise(tsp_path):
-                final_graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
-                    src, dst, weight=self.graph[src][dst]["weight"]
+        edges = solve_cycles_sharded(
+            weights,
+            n_recipients,
+            solver,
+            seed,
+            shards,
+            restarts,
+            workers,
+            time_limit,
+            submatrices,
+        )
+        self.graph = weights.to_graph(edges)
+        self._verify_solution(n_recipients)
+
+    def add_rounds(
+        self,
+        config: Config,
+        n_rounds: int,
+        mode: SolutionMode = "cycle",
+        solver: str = DEFAULT_TSP_SOLVER,
+        seed: int | None = None,
+        restarts: int = 1,
+        workers: int = 1,
+        time_limit: float | None = None,
+    ) -> None:
+        """Add recipient rounds to the solution without changing the existing ones.
+
+        Only the new rounds are solved, with the existing edges excluded so that nobody
+        gets the same recipient twice.
+        """
+        n_recipients = len(self.graph.succ[next(iter(self.graph.nodes))])
+
+        # the weight matrix only has the people in the config, so anyone else would be
+        # left out of the new rounds
+        names = {person.name for person in config.people}
+        if missing := [name for name in self.graph.nodes if name not in names]:
+            msg = (
+                f"Person not found: {', '.join(missing)}. Everyone in the solution"
+                " needs to be in the config to add rounds."
+            )
+            raise LookupError(msg)
+
+        weight_matrix = WeightMatrix.from_config(config, list(self.graph.nodes))
+        weight_matrix.exclude_edges(self.graph)
+        extension = Solution(graph=DiGraph(), weight_matrix=weight_matrix)
+
+        report = extension.check_feasibility(n_rounds, mode, config)
+        if not report.feasible:
+            raise RuntimeError(str(report))
+
+        if mode == "assignment":
+            extension.generate_assignment(n_rounds)
+        else:
+            extension.generate_solution(
+                n_rounds,
+                solver=solver,
+                seed=seed,
+                restarts=restarts,
+                workers=workers,
+                time_limit=time_limit,
+            )
+
+        self.graph.add_edges_from(  # pyright: ignore [reportUnknownMemberType]
+            extension.graph.edges(data=True)  # pyright: ignore [reportUnknownMemberType, reportUnknownArgumentType]
+        )
+        self.weight_matrix = None
+        self.people = None
+        self._verify_solution(n_recipients + n_rounds)
+
+    def update_participants(
+        self,
+        config: Config,
+        removed: list[str],
+        added: list[str],
+        seed: int | None = None,
+    ) -> list[str]:
+        """Patch the solution for people that dropped out or joined.
+
+        Returns the gifters whose recipients changed, see `patch_solution`.
+        """
+        for name in removed:
+            if name not in self.graph:
+                continue
+
+            try:
+                config.get_person_id(name)
+            except LookupError as e:
+                # their recipients were stored in the config with them, so they're lost
+                msg = (
+                    f"Person not found: {name}. People that dropped out need to stay in"
+                    " the config until the solution is updated."
                 )
-                init_graph.remove_edge(src, dst)
+                raise LookupError(msg) from e
+
+        for name in added:
+            config.get_person_id(name)
 
-        self.graph = final_graph
+        from secret_santa_pp.incremental import patch_solution
+
+        n_recipients = len(self.graph.succ[next(iter(self.graph.nodes))])
+        changed_gifters = patch_solution(
+            self.graph,
+            removed,
+            added,
+            # only the people involved in the changed edges are looked up
+            lambda src, dst: get_edge_weight(
+                config.constraints, config.get_person(src), config.get_person(dst)
+            ),
+            seed,
+        )
+        self.weight_matrix = None
+        self.people = None
+        self._verify_solution(n_recipients)
+
+        return changed_gifters
+
+    def generate_assignment(self, n_recipients: int) -> None:
+        from secret_santa_pp.assignment import solve_assignment
+
+        weight_matrix = self._get_weight_matrix()
+        self.graph = weight_matrix.to_graph(
+            solve_assignment(weight_matrix, n_recipients)
+        )
         self._verify_solution(n_recipients)
 
+    def _get_weight_matrix(self) -> WeightMatrix:
+        if self.weight_matrix is None:
+            self.weight_matrix = WeightMatrix.from_graph(self.graph)
+
+        return self.weight_matrix
+
     def _verify_solution(self, n_recipients: int) -> None:
         if len(self.graph.nodes) == 0:
             msg = "Invalid solution: empty graph"
@@ -131,13 +379,55 @@ class Solution(BaseModel):
                 msg = f"Invalid solution: {self.graph.edges}"
                 raise RuntimeError(msg)
 
-    def visualise(self) -> None:
-        pos: Any = shell_layout(self.graph)
-        draw(self.graph, pos, node_size=1000, font_size=16)
-        draw_networkx_labels(self.graph, pos)
+    def visualise(self, layout_key: str | None = None) -> None:
+        from matplotlib import pyplot as plt
+
+        from secret_santa_pp.plotting import draw_graph, get_layout
+
+        _, ax = plt.subplots()  # pyright: ignore [reportUnknownMemberType]
+        draw_graph(self.graph, get_layout(self.graph, layout_key), ax)
         plt.show()  # pyright: ignore [reportUnknownMemberType]
 
-    def print(self, console: Console) -> None:
-        for s in self.graph:
-            edges = list(self.graph[s])
-            console.print(f"{s}: {', '.join(edges)}")
+    def export(self, path: Path, layout_key: str | None = None) -> None:
+        """Draw the solution to a PNG, SVG or HTML file, see `export_graph`."""
+        from secret_santa_pp.plotting import export_graph, get_layout
+
+        export_graph(self.graph, get_layout(self.graph, layout_key), path)
+
+    def iter_pairings(
+        self, gifters: list[str] | None = None
+    ) -> Iterator[tuple[str, list[str]]]:
+        """Yield each gifter (all of them, or just `gifters`) with their recipients."""
+        if gifters is not None:
+            for gifter in gifters:
+                if gifter not in self.graph:
+                    msg = f"Gifter not found: {gifter}."
+                    raise LookupError(msg)
+
+        for gifter in self.graph if gifters is None else gifters:
+            yield gifter, list(self.graph.succ[gifter])
+
+    def print(
+        self, console: Console, gifters: list[str] | None = None, pager: bool = False
+    ) -> None:
+        lines = (
+            f"{gifter}: {', '.join(recipients)}"
+            for gifter, recipients in self.iter_pairings(gifters)
+        )
+
+        with console.pager() if pager else nullcontext():
+            while batch := list(islice(lines, PRINT_BATCH_SIZE)):
+                console.print("\n".join(batch), markup=False, highlight=False)
+
+    def write_delimited(
+        self, fp: TextIO, delimiter: str, gifters: list[str] | None = None
+    ) -> None:
+        """Write one row per gifter (gifter, then recipients) as e.g. CSV or TSV."""
+        n_recipients = len(self.graph.succ[next(iter(self.graph.nodes))])
+        writer = csv.writer(fp, delimiter=delimiter, lineterminator="\n")
+        writer.writerow(
+            ["gifter", *(f"recipient_{i + 1}" for i in range(n_recipients))]
+        )
+        writer.writerows(
+            [gifter, *recipients] for gifter, recipients in self.iter_pairings(gifters)
+        )
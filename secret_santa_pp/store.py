@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+from collections import defaultdict
+import sqlite3
+from typing import TYPE_CHECKING, Any, Self, cast
+
+from secret_santa_pp.config import Config
+from secret_santa_pp.wrapper import DiGraph
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Iterable
+    from pathlib import Path
+    from types import TracebackType
+
+SQLITE_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+# Relationships (including stored solutions) are one row per value, so loading or
+# storing a single key only touches that key's rows via the (key, person_id) index.
+# Empty relationship lists aren't stored since they never meet a constraint.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS people (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    person_id INTEGER NOT NULL REFERENCES people (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    UNIQUE (person_id, key, position)
+);
+CREATE INDEX IF NOT EXISTS relationships_key ON relationships (key, person_id);
+CREATE TABLE IF NOT EXISTS constraints (
+    position INTEGER PRIMARY KEY,
+    relationship_key TEXT NOT NULL,
+    comparator TEXT NOT NULL,
+    limit_type TEXT NOT NULL
+);
+"""
+
+
+class ConfigStore:
+    """Config and solutions stored in a local SQLite database.
+
+    Every write is a single transaction, so an interrupted write leaves the previous
+    config in place instead of a half-written file. Only `create` makes a new database,
+    so that a mistyped path isn't silently read as an empty config.
+    """
+
+    def __init__(self, path: Path, create: bool = False) -> None:
+        if not create and not path.is_file():
+            msg = f"Config file not found: {path}."
+            raise FileNotFoundError(msg)
+
+        # mode=rw fails rather than creating the file if it's gone in the meantime
+        self.connection = (
+            sqlite3.connect(path)
+            if create
+            else sqlite3.connect(f"{path.absolute().as_uri()}?mode=rw", uri=True)
+        )
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def load_config(self, names: Iterable[str] | None = None) -> Config:
+        """Load the config, or only the people in `names` (skipping unknown names).
+
+        Loading a few people (e.g. a solution's participants) only reads their rows,
+        via the people's name index and the relationships' person_id index.
+        """
+        relationships_query = (
+            "SELECT person_id, key, value FROM relationships ORDER BY person_id, rowid"
+        )
+        people_query = "SELECT id, name, email FROM people ORDER BY id"
+        if names is not None:
+            # a temporary table, since SQLite limits the number of query parameters
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS selected (name TEXT PRIMARY KEY)"
+            )
+            self.connection.execute("DELETE FROM temp.selected")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO temp.selected (name) VALUES (?)",
+                ((name,) for name in names),
+            )
+            relationships_query = (
+                "SELECT relationships.person_id, relationships.key, relationships.value"
+                " FROM relationships JOIN people ON people.id = relationships.person_id"
+                " WHERE people.name IN (SELECT name FROM temp.selected)"
+                " ORDER BY relationships.person_id, relationships.rowid"
+            )
+            people_query = (
+                "SELECT id, name, email FROM people"
+                " WHERE name IN (SELECT name FROM temp.selected) ORDER BY id"
+            )
+
+        relationships: defaultdict[int, dict[str, list[str]]] = defaultdict(dict)
+        for person_id, key, value in self.connection.execute(relationships_query):
+            relationships[person_id].setdefault(key, []).append(value)
+
+        people = [
+            {"name": name, "email": email, "relationships": relationships[person_id]}
+            for person_id, name, email in self.connection.execute(people_query)
+        ]
+        constraints = [
+            {"relationship_key": key, "comparator": comparator, "limit": limit}
+            for key, comparator, limit in self.connection.execute(
+                "SELECT relationship_key, comparator, limit_type FROM constraints"
+                " ORDER BY position"
+            )
+        ]
+
+        return Config.model_validate({"people": people, "constraints": constraints})
+
+    def save_config(self, config: Config) -> None:
+        """Replace everything in the store with the config."""
+        with self.connection:
+            self.connection.execute("DELETE FROM relationships")
+            self.connection.execute("DELETE FROM people")
+            self.connection.execute("DELETE FROM constraints")
+
+            self.connection.executemany(
+                "INSERT INTO people (id, name, email) VALUES (?, ?, ?)",
+                (
+                    (person_id, person.name, person.email)
+                    for person_id, person in enumerate(config.people)
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO relationships (person_id, key, position, value)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    (person_id, key, position, value)
+                    for person_id, person in enumerate(config.people)
+                    for key, relationship in person.relationships.items()
+                    for position, value in enumerate(relationship)
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO constraints"
+                " (position, relationship_key, comparator, limit_type)"
+                " VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        position,
+                        constraint.relationship_key,
+                        constraint.comparator,
+                        constraint.limit,
+                    )
+                    for position, constraint in enumerate(config.constraints)
+                ),
+            )
+
+    def load_graph(self, key: str) -> DiGraph[str]:
+        """Load the solution stored under a key, see `Config.load_graph`."""
+        rows = cast(
+            list[tuple[str, str]],
+            self.connection.execute(
+                "SELECT people.name, relationships.value FROM relationships"
+                " JOIN people ON people.id = relationships.person_id"
+                " WHERE relationships.key = ?"
+                " ORDER BY relationships.person_id, relationships.position",
+                (key,),
+            ).fetchall(),
+        )
+        return DiGraph(rows)
+
+    def save_graph(
+        self, graph: DiGraph[str], key: str, removed: Iterable[str] = ()
+    ) -> None:
+        """Store a solution under a key, see `Config.update_from_graph`.
+
+        Only the key's rows for the people in the graph (and the people in `removed`,
+        who lose the key altogether) are replaced.
+        """
+        names = [*graph.nodes, *removed]
+        edges: list[tuple[Any, ...]] = [
+            (key, position, recipient, src)
+            for src in graph.nodes
+            for position, recipient in enumerate(graph[src])
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM relationships WHERE key = ?"
+                " AND person_id = (SELECT id FROM people WHERE name = ?)",
+                ((key, name) for name in names),
+            )
+            self.connection.executemany(
+                "INSERT INTO relationships (person_id, key, position, value)"
+                " SELECT id, ?, ?, ? FROM people WHERE name = ?",
+                edges,
+            )
@@ -0,0 +1,608 @@
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, cast
+
+import numpy as np
+
+from secret_santa_pp.deadline import Deadline
+
+if TYPE_CHECKING:  # pragma: no cover
+    from collections.abc import Callable, Iterable
+
+    from numpy.typing import NDArray
+
+    from secret_santa_pp.relationship_index import PairArrays
+
+    # Finds a cycle through every person (by index) using only the edges that are
+    # still available, returning the best cycle found so far once the deadline
+    # expires. The cycle is returned without repeating the first node at the end.
+    type TSPSolver = Callable[[ResidualGraph, np.random.Generator, Deadline], list[int]]
+
+DEFAULT_TSP_SOLVER = "local-search"
+
+# Cost of using an edge that isn't available. It is large enough that the local
+# search always prefers getting rid of these over any other improvement.
+UNAVAILABLE_COST = 1_000_000_000
+
+# Number of cheapest successors/predecessors considered for each node by the local
+# search moves.
+N_NEIGHBOURS = 8
+
+# Number of rows of the weight matrix processed at once when finding the neighbour
+# lists, which bounds the temporary memory to O(chunk size * n) instead of O(n^2).
+NEIGHBOUR_CHUNK_SIZE = 1024
+
+# Longest segment moved by the or-opt move.
+MAX_OR_OPT_SEGMENT = 3
+
+# Number of times a recipient round is solved before giving up, if the solver's cycle
+# uses unavailable edges that can't be repaired.
+MAX_ROUND_ATTEMPTS = 2
+
+# The annealing schedule is scaled to the number of people: each temperature step
+# makes this many moves per person (within the bounds below), and annealing stops
+# once the best cycle hasn't improved for ANNEALING_PATIENCE steps in a row.
+ANNEALING_MOVES_PER_NODE = 10
+ANNEALING_MIN_MOVES = 100
+ANNEALING_MAX_MOVES = 100_000
+ANNEALING_PATIENCE = 10
+ANNEALING_START_TEMP = 100
+ANNEALING_ALPHA = 0.01
+# Number of annealing moves between checks of the deadline.
+ANNEALING_DEADLINE_INTERVAL = 100
+
+TSP_SOLVERS: dict[str, TSPSolver] = {}
+
+
+def register_tsp_solver(name: str) -> Callable[[TSPSolver], TSPSolver]:
+    def decorator(solver: TSPSolver) -> TSPSolver:
+        TSP_SOLVERS[name] = solver
+        return solver
+
+    return decorator
+
+
+def get_tsp_solver(name: str) -> TSPSolver:
+    if (solver := TSP_SOLVERS.get(name)) is None:
+        msg = f"TSP solver not found: {name}."
+        raise LookupError(msg)
+
+    return solver
+
+
+class ResidualGraph:
+    """Edge weights shared by every recipient round and the edges still available.
+
+    An edge is available if it's allowed and hasn't been used by a previous round.
+    Rounds only clear entries of the `available` mask, so nothing proportional to
+    n^2 is allocated per round.
+    """
+
+    def __init__(self, weights: NDArray[np.int32], allowed: NDArray[np.bool_]) -> None:
+        self.weights = weights
+        self.available = allowed.copy()
+
+    def use_edges(self, src: NDArray[np.intp], dst: NDArray[np.intp]) -> None:
+        self.available[src, dst] = False
+
+
+def check_n_recipients(n_recipients: int) -> None:
+    if n_recipients < 1:
+        msg = f"Invalid number of recipients: {n_recipients}, must be at least 1."
+        raise ValueError(msg)
+
+
+def solve_cycles(
+    weights: NDArray[np.int32],
+    allowed: NDArray[np.bool_],
+    n_recipients: int,
+    solver: str,
+    seed: int | np.random.SeedSequence | None,
+    deadline: Deadline,
+) -> PairArrays:
+    """Find `n_recipients` edge-disjoint cycles through every person.
+
+    Once the deadline expires, the remaining rounds skip any improvement so that a
+    complete solution is still returned.
+    """
+    check_n_recipients(n_recipients)
+    tsp_solver = get_tsp_solver(solver)
+    rng = np.random.default_rng(seed)
+
+    residual = ResidualGraph(weights, allowed)
+    src_rounds: list[NDArray[np.intp]] = []
+    dst_rounds: list[NDArray[np.intp]] = []
+
+    for _ in range(n_recipients):
+        src = _solve_round(tsp_solver, residual, rng, deadline)
+        dst = np.roll(src, -1)
+
+        residual.use_edges(src, dst)
+        src_rounds.append(src)
+        dst_rounds.append(dst)
+
+    return np.concatenate(src_rounds), np.concatenate(dst_rounds)
+
+
+def _solve_round(
+    tsp_solver: TSPSolver,
+    residual: ResidualGraph,
+    rng: np.random.Generator,
+    deadline: Deadline,
+) -> NDArray[np.intp]:
+    for _ in range(MAX_ROUND_ATTEMPTS):
+        tour = np.asarray(tsp_solver(residual, rng, deadline), dtype=np.intp)
+        if residual.available[tour, np.roll(tour, -1)].all():
+            return tour
+
+        # invalid cycles usually only have a few unavailable edges, which are much
+        # quicker to swap out than solving the round again
+        if (
+            repaired := repair_tour(tour, residual.weights, residual.available)
+        ) is not None:
+            return repaired
+
+    msg = "Invalid solution: no cycle found using only allowed edges"
+    raise RuntimeError(msg)
+
+
+def repair_tour(
+    tour: NDArray[np.intp], weights: NDArray[np.int32], available: NDArray[np.bool_]
+) -> NDArray[np.intp] | None:
+    """Remove the unavailable edges from a tour with targeted moves.
+
+    For each unavailable edge, one of its nodes is either moved to the cheapest place
+    in the tour where both of its new edges are available, or swapped with another
+    node. Every move only adds available edges, so each one removes at least one
+    unavailable edge. Returns None if there's an unavailable edge that can't be
+    removed this way.
+    """
+    while len(bad := np.flatnonzero(~available[tour, np.roll(tour, -1)])) > 0:
+        n_nodes = len(tour)
+        for position in cast(list[int], bad.tolist()):
+            # try the nodes at both ends of the edge
+            positions = [position, (position + 1) % n_nodes]
+            repaired = next(
+                (
+                    result
+                    for move in (_relocate_node, _swap_node)
+                    for k in positions
+                    if (result := move(tour, k, weights, available)) is not None
+                ),
+                None,
+            )
+            if repaired is not None:
+                tour = repaired
+                break
+        else:
+            return None
+
+    return tour
+
+
+def _relocate_node(
+    tour: NDArray[np.intp],
+    k: int,
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+) -> NDArray[np.intp] | None:
+    # prev node next -> prev next, and src dst -> src node dst
+    n_nodes = len(tour)
+    node, prev, next_ = tour[k], tour[k - 1], tour[(k + 1) % n_nodes]
+    if n_nodes < 3 or not available[prev, next_]:  # noqa: PLR2004
+        return None
+
+    rest = np.delete(tour, k)
+    src, dst = rest, np.roll(rest, -1)
+    valid = available[src, node] & available[node, dst]
+    valid[(k - 1) % (n_nodes - 1)] = False  # prev -> next, where the node came from
+    if not valid.any():
+        return None
+
+    cost = weights[src, node].astype(np.int64) + weights[node, dst] - weights[src, dst]
+    candidates = np.flatnonzero(valid)
+    j = int(candidates[cost[candidates].argmin()])
+    return np.insert(rest, j + 1, node)
+
+
+def _swap_node(
+    tour: NDArray[np.intp],
+    k: int,
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+) -> NDArray[np.intp] | None:
+    # prev node next ... before other after -> prev other next ... before node after
+    n_nodes = len(tour)
+    before, after = np.roll(tour, 1), np.roll(tour, -1)
+    node, prev, next_ = tour[k], before[k], after[k]
+
+    # only swap with nodes that aren't next to this one
+    offset = (np.arange(n_nodes) - k) % n_nodes
+    valid = (
+        (offset >= 2)  # noqa: PLR2004
+        & (offset <= n_nodes - 2)
+        & available[prev, tour]
+        & available[tour, next_]
+        & available[before, node]
+        & available[node, after]
+    )
+    if not valid.any():
+        return None
+
+    cost = (
+        weights[prev, tour].astype(np.int64)
+        + weights[tour, next_]
+        + weights[before, node]
+        + weights[node, after]
+        - weights[before, tour]
+        - weights[tour, after]
+    )
+    candidates = np.flatnonzero(valid)
+    m = int(candidates[cost[candidates].argmin()])
+
+    tour = tour.copy()
+    tour[k], tour[m] = tour[m], tour[k]
+    return tour
+
+
+@register_tsp_solver("annealing")
+def solve_annealing(
+    residual: ResidualGraph, rng: np.random.Generator, deadline: Deadline
+) -> list[int]:
+    """Build a nearest neighbour tour and improve it with simulated annealing."""
+    weights, available = residual.weights, residual.available
+    tour = get_nearest_neighbour_tour(weights, available, rng)
+    return cast(
+        list[int], anneal_tour(tour, weights, available, rng, deadline).tolist()
+    )
+
+
+@register_tsp_solver("nearest-neighbour")
+def solve_nearest_neighbour(
+    residual: ResidualGraph,
+    rng: np.random.Generator,
+    deadline: Deadline,  # noqa: ARG001
+) -> list[int]:
+    """Build a nearest neighbour tour without any local search."""
+    tour = get_nearest_neighbour_tour(residual.weights, residual.available, rng)
+    return cast(list[int], tour.tolist())
+
+
+@register_tsp_solver("local-search")
+def solve_local_search(
+    residual: ResidualGraph, rng: np.random.Generator, deadline: Deadline
+) -> list[int]:
+    """Build a nearest neighbour tour and improve it with or-opt/or-3opt moves."""
+    weights, available = residual.weights, residual.available
+    tour = get_nearest_neighbour_tour(weights, available, rng)
+    return cast(
+        list[int], improve_tour(tour, weights, available, rng, deadline).tolist()
+    )
+
+
+def get_nearest_neighbour_tour(
+    weights: NDArray[np.int32], available: NDArray[np.bool_], rng: np.random.Generator
+) -> NDArray[np.intp]:
+    n_nodes = len(weights)
+    tour = np.empty(n_nodes, dtype=np.intp)
+    unvisited = np.ones(n_nodes, dtype=np.bool_)
+
+    # nodes that have already been visited can't be picked again at any cost
+    visited_cost = np.iinfo(np.int64).max
+
+    node = int(rng.integers(n_nodes)) if n_nodes > 0 else 0
+    for i in range(n_nodes):
+        tour[i] = node
+        unvisited[node] = False
+        if i == n_nodes - 1:
+            break
+
+        cost = np.where(available[node], weights[node], UNAVAILABLE_COST).astype(
+            np.int64
+        )
+        cost[~unvisited] = visited_cost
+
+        # break ties randomly, most edges share the same base weight
+        candidates = np.flatnonzero(cost == cost.min())
+        node = int(candidates[rng.integers(len(candidates))])
+
+    return tour
+
+
+def anneal_tour(
+    tour: NDArray[np.intp],
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+    rng: np.random.Generator,
+    deadline: Deadline | None = None,
+) -> NDArray[np.intp]:
+    """Swap random pairs of nodes with simulated annealing, until converged or expired.
+
+    The same moves and cooling as networkx's simulated annealing, but on the weight
+    matrix itself (unavailable edges cost UNAVAILABLE_COST) rather than on a metric
+    closure, which took longer to build than the annealing and ignored the deadline.
+    Annealing stops once the best tour hasn't improved for ANNEALING_PATIENCE steps.
+    """
+    n_nodes = len(tour)
+    if n_nodes < 3:  # noqa: PLR2004
+        return tour
+
+    annealing = _Annealing(tour, weights, available, rng, deadline or Deadline(None))
+    n_steps_without_improvement = 0
+    while n_steps_without_improvement < ANNEALING_PATIENCE:
+        if not annealing.run_step():
+            break
+
+        n_steps_without_improvement = (
+            0 if annealing.update_best() else n_steps_without_improvement + 1
+        )
+
+    annealing.update_best()
+    return np.array(annealing.best_tour, dtype=np.intp)
+
+
+def improve_tour(
+    tour: NDArray[np.intp],
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+    rng: np.random.Generator,
+    deadline: Deadline | None = None,
+) -> NDArray[np.intp]:
+    """Apply improving moves until the tour is locally optimal or out of time.
+
+    Only moves that keep the direction of travel of every segment are used (or-opt
+    and the segment exchange variant of 3-opt) since reversing a segment changes its
+    cost when the weights are asymmetric.
+    """
+    n_nodes = len(tour)
+    if n_nodes < 4:  # noqa: PLR2004
+        return tour
+
+    search = _LocalSearch(tour, weights, available, rng, deadline or Deadline(None))
+    while search.run_pass():
+        pass
+
+    return search.tour
+
+
+def get_neighbour_lists(
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+    n_neighbours: int,
+    rng: np.random.Generator,
+) -> tuple[NDArray[np.intp], NDArray[np.intp]]:
+    """Return the cheapest successors and predecessors of every node."""
+    n_neighbours = min(n_neighbours, len(weights) - 1)
+    successors = _get_cheapest_per_row(weights, available, n_neighbours, rng)
+    predecessors = _get_cheapest_per_row(weights.T, available.T, n_neighbours, rng)
+    return successors, predecessors
+
+
+def _get_cheapest_per_row(
+    weights: NDArray[np.int32],
+    available: NDArray[np.bool_],
+    n_neighbours: int,
+    rng: np.random.Generator,
+) -> NDArray[np.intp]:
+    n_nodes = len(weights)
+    cheapest = np.empty((n_nodes, n_neighbours), dtype=np.intp)
+
+    for start in range(0, n_nodes, NEIGHBOUR_CHUNK_SIZE):
+        stop = min(start + NEIGHBOUR_CHUNK_SIZE, n_nodes)
+        rows = np.arange(start, stop)
+
+        # random noise below 1 breaks ties between the integer weights
+        cost = np.where(
+            available[start:stop], weights[start:stop], UNAVAILABLE_COST
+        ) + rng.random((stop - start, n_nodes), dtype=np.float32)
+        cost[rows - start, rows] = np.inf
+
+        cheapest[start:stop] = np.argpartition(cost, n_neighbours - 1, axis=1)[
+            :, :n_neighbours
+        ]
+
+    return cheapest
+
+
+class _LocalSearch:
+    def __init__(
+        self,
+        tour: NDArray[np.intp],
+        weights: NDArray[np.int32],
+        available: NDArray[np.bool_],
+        rng: np.random.Generator,
+        deadline: Deadline,
+    ) -> None:
+        self.tour = tour.copy()
+        self.position = np.empty_like(tour)
+        self.position[tour] = np.arange(len(tour))
+        self.weights = weights
+        self.available = available
+        self.rng = rng
+        self.deadline = deadline
+        self.successors, self.predecessors = get_neighbour_lists(
+            weights, available, N_NEIGHBOURS, rng
+        )
+
+    def cost(self, src: int, dst: int) -> int:
+        if not self.available[src, dst]:
+            return UNAVAILABLE_COST
+
+        return int(self.weights[src, dst])
+
+    def next(self, node: int, steps: int = 1) -> int:
+        return int(self.tour[(self.position[node] + steps) % len(self.tour)])
+
+    def offset(self, src: int, dst: int) -> int:
+        # number of steps forward from src to dst
+        return int((self.position[dst] - self.position[src]) % len(self.tour))
+
+    def run_pass(self) -> bool:
+        improved = False
+        for node in cast(list[int], self.rng.permutation(self.tour).tolist()):
+            # every move keeps the tour valid, so it's safe to stop at any point
+            if self.deadline.expired():
+                return False
+
+            improved |= self._try_or_opt(node)
+            improved |= self._try_or_3opt(node)
+
+        return improved
+
+    def _try_or_opt(self, start: int) -> bool:
+        # move the segment start..end so that it sits between c and d instead
+        n_nodes = len(self.tour)
+        prev = self.next(start, -1)
+
+        for length in range(1, min(MAX_OR_OPT_SEGMENT, n_nodes - 3) + 1):
+            end = self.next(start, length - 1)
+            after = self.next(end)
+            removal_gain = (
+                self.cost(prev, start) + self.cost(end, after) - self.cost(prev, after)
+            )
+            if removal_gain <= 0:
+                continue
+
+            candidates = [
+                *((int(c), self.next(int(c))) for c in self.predecessors[start]),
+                *((self.next(int(d), -1), int(d)) for d in self.successors[end]),
+            ]
+            for c, d in candidates:
+                if c == prev or self.offset(start, c) < length:
+                    continue
+
+                gain = (
+                    removal_gain
+                    + self.cost(c, d)
+                    - self.cost(c, start)
+                    - self.cost(end, d)
+                )
+                if gain > 0:
+                    # prev [start..end] [after..c] d -> prev [after..c] [start..end] d
+                    self._exchange_segments(prev, length + 1, self.offset(prev, c))
+                    return True
+
+        return False
+
+    def _try_or_3opt(self, a: int) -> bool:
+        # a [a'..b] [c'..c] d -> a [c'..c] [a'..b] d
+        a_next = self.next(a)
+        removed_gain = self.cost(a, a_next)
+
+        for c_start in cast(list[int], self.successors[a].tolist()):
+            c_start_offset = self.offset(a, c_start)
+            if c_start_offset < 2:  # noqa: PLR2004
+                continue
+
+            b = self.next(c_start, -1)
+            partial_gain = removed_gain + self.cost(b, c_start) - self.cost(a, c_start)
+            if partial_gain <= 0:
+                continue
+
+            for c in cast(list[int], self.predecessors[a_next].tolist()):
+                c_offset = self.offset(a, c)
+                if c_offset < c_start_offset:
+                    continue
+
+                d = self.next(c)
+                gain = (
+                    partial_gain
+                    + self.cost(c, d)
+                    - self.cost(c, a_next)
+                    - self.cost(b, d)
+                )
+                if gain > 0:
+                    self._exchange_segments(a, c_start_offset, c_offset)
+                    return True
+
+        return False
+
+    def _exchange_segments(self, a: int, c_start_offset: int, c_offset: int) -> None:
+        # with the tour rotated so that a is first, swap the segments
+        # [1, c_start_offset) and [c_start_offset, c_offset]
+        rotated = np.roll(self.tour, -int(self.position[a]))
+        self.tour = np.concatenate(
+            [
+                rotated[:1],
+                rotated[c_start_offset : c_offset + 1],
+                rotated[1:c_start_offset],
+                rotated[c_offset + 1 :],
+            ]
+        )
+        self.position[self.tour] = np.arange(len(self.tour))
+
+
+class _Annealing:
+    def __init__(
+        self,
+        tour: NDArray[np.intp],
+        weights: NDArray[np.int32],
+        available: NDArray[np.bool_],
+        rng: np.random.Generator,
+        deadline: Deadline,
+    ) -> None:
+        self.tour = cast(list[int], tour.tolist())
+        self.weights = weights
+        self.available = available
+        self.rng = rng
+        self.deadline = deadline
+        self.temp = float(ANNEALING_START_TEMP)
+        self.n_moves = min(
+            max(ANNEALING_MOVES_PER_NODE * len(self.tour), ANNEALING_MIN_MOVES),
+            ANNEALING_MAX_MOVES,
+        )
+        self.tour_cost = self.edges_cost(range(len(self.tour)))
+        self.best_tour = self.tour.copy()
+        self.best_cost = self.tour_cost
+
+    def cost(self, src: int, dst: int) -> int:
+        if not self.available[src, dst]:
+            return UNAVAILABLE_COST
+
+        return int(self.weights[src, dst])
+
+    def edges_cost(self, positions: Iterable[int]) -> int:
+        # cost of the edges leaving the given positions of the tour
+        n_nodes = len(self.tour)
+        return sum(
+            self.cost(self.tour[k], self.tour[(k + 1) % n_nodes]) for k in positions
+        )
+
+    def run_step(self) -> bool:
+        n_nodes = len(self.tour)
+        pairs = cast(
+            list[list[int]], self.rng.integers(n_nodes, size=(self.n_moves, 2)).tolist()
+        )
+        thresholds = cast(list[float], self.rng.random(self.n_moves).tolist())
+
+        for move, ((i, j), threshold) in enumerate(zip(pairs, thresholds, strict=True)):
+            # every move keeps the tour valid, so it's safe to stop at any point
+            if move % ANNEALING_DEADLINE_INTERVAL == 0 and self.deadline.expired():
+                return False
+
+            if i != j:
+                self._try_swap(i, j, threshold)
+
+        self.temp -= self.temp * ANNEALING_ALPHA
+        return True
+
+    def update_best(self) -> bool:
+        if self.tour_cost >= self.best_cost:
+            return False
+
+        self.best_tour = self.tour.copy()
+        self.best_cost = self.tour_cost
+        return True
+
+    def _try_swap(self, i: int, j: int, threshold: float) -> None:
+        n_nodes = len(self.tour)
+        changed = {(i - 1) % n_nodes, i, (j - 1) % n_nodes, j}
+        old_cost = self.edges_cost(changed)
+        self.tour[i], self.tour[j] = self.tour[j], self.tour[i]
+        delta = self.edges_cost(changed) - old_cost
+
+        if delta <= 0 or threshold < math.exp(-delta / self.temp):
+            self.tour_cost += delta
+        else:
+            self.tour[i], self.tour[j] = self.tour[j], self.tour[i]
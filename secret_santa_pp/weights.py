@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, cast
+
+import numpy as np
+from numpy.typing import NDArray  # noqa: TC002 (needed at runtime by pydantic)
+from pydantic import BaseModel, ConfigDict
+
+from secret_santa_pp.config import BASE_WEIGHT, LIMIT_PENALTIES, Config, Constraint
+from secret_santa_pp.history import get_history_penalties
+from secret_santa_pp.people import CompactPeople
+from secret_santa_pp.relationship_index import PairArrays, RelationshipIndex
+from secret_santa_pp.wrapper import DiGraph
+
+if TYPE_CHECKING:  # pragma: no cover
+    from scipy.sparse import coo_array  # pyright: ignore [reportMissingTypeStubs]
+
+
+class WeightMatrix(BaseModel):
+    """Dense edge weights between every ordered pair of participants.
+
+    `weights[i, j]` is the weight of the edge from `names[i]` to `names[j]` and is only
+    meaningful where `allowed[i, j]` is true, i.e. the edge isn't a self-loop and isn't
+    excluded by a constraint.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    names: list[str]
+    weights: NDArray[np.int32]
+    allowed: NDArray[np.bool_]
+
+    @classmethod
+    def from_config(
+        cls, config: Config, participants: list[str] | None
+    ) -> WeightMatrix:
+        return cls.from_people(
+            CompactPeople.from_config(config, participants), config.constraints
+        )
+
+    @classmethod
+    def from_people(
+        cls, people: CompactPeople, constraints: list[Constraint]
+    ) -> WeightMatrix:
+        index = RelationshipIndex.from_people(people)
+        n_people = len(people.names)
+
+        # every edge starts off with the default weight, constraints then only touch
+        # the pairs that they actually affect
+        weights = np.full((n_people, n_people), BASE_WEIGHT, dtype=np.int32)
+        allowed = ~np.eye(n_people, dtype=np.bool_)
+
+        for constraint in constraints:
+            src, dst = index.get_pairs(constraint)
+
+            if constraint.limit == "exclude":
+                allowed[src, dst] = False
+            else:
+                weights[src, dst] += LIMIT_PENALTIES[constraint.limit]
+
+        return cls(names=people.names, weights=weights, allowed=allowed)
+
+    @classmethod
+    def from_graph(cls, graph: DiGraph[str]) -> WeightMatrix:
+        names = list(graph.nodes)
+        name_index = {name: i for i, name in enumerate(names)}
+        n_people = len(names)
+
+        weights = np.full((n_people, n_people), BASE_WEIGHT, dtype=np.int32)
+        allowed = np.zeros((n_people, n_people), dtype=np.bool_)
+        for src, dst, weight in cast(
+            list[tuple[str, str, int]],
+            graph.edges.data("weight", default=BASE_WEIGHT),  # pyright: ignore [reportUnknownMemberType]
+        ):
+            allowed[name_index[src], name_index[dst]] = True
+            weights[name_index[src], name_index[dst]] = weight
+
+        return cls(names=names, weights=weights, allowed=allowed)
+
+    def add_penalties(self, penalties: coo_array) -> None:
+        """Add sparse penalties (e.g. for past pairings) to the weights."""
+        self.weights[penalties.row, penalties.col] += penalties.data  # pyright: ignore [reportUnknownMemberType]
+
+    def exclude_edges(self, graph: DiGraph[str]) -> None:
+        """Disallow the edges of a graph, e.g. the rounds of an existing solution."""
+        name_index = {name: i for i, name in enumerate(self.names)}
+        for src, dst in cast(list[tuple[str, str]], graph.edges):
+            if src in name_index and dst in name_index:
+                self.allowed[name_index[src], name_index[dst]] = False
+
+    def get_submatrix(self, indices: NDArray[np.intp]) -> WeightMatrix:
+        """Return the weights between the people at `indices`, in that order."""
+        return WeightMatrix(
+            names=[self.names[i] for i in cast(list[int], indices.tolist())],
+            weights=self.weights[np.ix_(indices, indices)],
+            allowed=self.allowed[np.ix_(indices, indices)],
+        )
+
+    def get_edges(
+        self, src: NDArray[np.intp], dst: NDArray[np.intp]
+    ) -> tuple[NDArray[np.int32], NDArray[np.bool_]]:
+        """Return the weights of the (src, dst) edges and whether they're allowed."""
+        return self.weights[src, dst], self.allowed[src, dst]
+
+    def get_total_weight(self, edges: PairArrays) -> int:
+        return int(self.weights[edges].sum())
+
+    def to_graph(self, edges: PairArrays | None = None) -> DiGraph[str]:
+        """Convert the given (src, dst) edges, or all allowed edges, to a graph."""
+        src, dst = np.nonzero(self.allowed) if edges is None else edges
+        return _to_graph(self.names, src, dst, self.weights[src, dst])
+
+
+class LazyWeights:
+    """Edge weights between participants, worked out when needed instead of stored.
+
+    For sharded solves, which need the dense weights within each shard (built from
+    just the shard's people by `get_submatrix`) and the weights of a few edges between
+    shards (worked out one by one by `get_edges`), but never a full n x n matrix.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        participants: list[str] | None,
+        history_keys: list[str] | None = None,
+    ) -> None:
+        self.config = config
+        self.people = CompactPeople.from_config(config, participants)
+        self.history_keys = history_keys or []
+
+        self.history: dict[tuple[int, int], int] = {}
+        if len(self.history_keys) > 0:
+            penalties = get_history_penalties(config, self.names, self.history_keys)
+            self.history = dict(
+                zip(
+                    zip(
+                        cast(list[int], penalties.row.tolist()),  # pyright: ignore [reportUnknownMemberType]
+                        cast(list[int], penalties.col.tolist()),  # pyright: ignore [reportUnknownMemberType]
+                        strict=True,
+                    ),
+                    cast(list[int], penalties.data.tolist()),  # pyright: ignore [reportUnknownMemberType]
+                    strict=True,
+                )
+            )
+
+    @property
+    def names(self) -> list[str]:
+        return self.people.names
+
+    def get_submatrix(self, indices: NDArray[np.intp]) -> WeightMatrix:
+        """Build the weights between the people at `indices`, in that order."""
+        # the config's order, which the shard's people are interned in
+        order = np.argsort(indices, kind="stable")
+        names = [self.names[i] for i in cast(list[int], indices[order].tolist())]
+
+        weight_matrix = WeightMatrix.from_config(self.config, names)
+        if len(self.history_keys) > 0:
+            weight_matrix.add_penalties(
+                get_history_penalties(self.config, names, self.history_keys)
+            )
+
+        return weight_matrix.get_submatrix(np.argsort(order))
+
+    def get_edges(
+        self, src: NDArray[np.intp], dst: NDArray[np.intp]
+    ) -> tuple[NDArray[np.int32], NDArray[np.bool_]]:
+        """Return the weights of the (src, dst) edges and whether they're allowed."""
+        weights = np.full(len(src), BASE_WEIGHT, dtype=np.int32)
+        allowed = np.ones(len(src), dtype=np.bool_)
+
+        for k, (i, j) in enumerate(
+            zip(
+                cast(list[int], src.tolist()),
+                cast(list[int], dst.tolist()),
+                strict=True,
+            )
+        ):
+            weight = (
+                None
+                if i == j
+                else self.people.get_edge_weight(self.config.constraints, i, j)
+            )
+            if weight is None:
+                allowed[k] = False
+            else:
+                weights[k] = weight + self.history.get((i, j), 0)
+
+        return weights, allowed
+
+    def get_total_weight(self, edges: PairArrays) -> int:
+        return int(self.get_edges(*edges)[0].sum())
+
+    def to_graph(self, edges: PairArrays) -> DiGraph[str]:
+        """Convert the given (src, dst) edges to a graph."""
+        return _to_graph(self.names, *edges, self.get_edges(*edges)[0])
+
+
+def _to_graph(
+    names: list[str],
+    src: NDArray[np.intp],
+    dst: NDArray[np.intp],
+    weights: NDArray[np.int32],
+) -> DiGraph[str]:
+    graph: DiGraph[str] = DiGraph()
+    graph.add_weighted_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        zip(
+            [names[i] for i in cast(list[int], src.tolist())],
+            [names[j] for j in cast(list[int], dst.tolist())],
+            cast(list[int], weights.tolist()),
+            strict=True,
+        )
+    )
+    return graph
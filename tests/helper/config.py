@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from dataclasses import field
+import random
 from typing import Generic, TypeVar
 
 from pydantic import BaseModel, EmailStr
@@ -8,6 +9,14 @@ from secret_santa_pp.config import ComparatorType, Config, Constraint, LimitType
 
 T = TypeVar("T")
 
+COMPARATORS: list[ComparatorType] = [
+    "one-way contains",
+    "two-way contains",
+    "either contains",
+    "equality",
+]
+LIMITS: list[LimitType] = ["exclude", "low-probability", "medium-probability"]
+
 
 class Mock(ABC, BaseModel, Generic[T]):
     model: T | None = None
@@ -79,3 +88,32 @@ class MockConfig(Mock[Config]):
             self.constraints, other.constraints, strict=True
         ):
             constraint.assert_equivalent(other_constraint)
+
+
+def random_mock_config(seed: int, n_people: int) -> MockConfig:
+    rng = random.Random(seed)  # noqa: S311
+    names = [f"person-{i}" for i in range(n_people)]
+    keys = ["key-0", "key-1", "key-2"]
+
+    # draw relationship values from a small pool so that equality matches happen
+    value_pool = [rng.sample(names, k) for k in (1, 1, 2, 2, 3)]
+
+    people = [
+        MockPerson(
+            name=name,
+            relationships={
+                key: rng.choice([[], *value_pool, rng.sample(names, 2)])
+                for key in rng.sample(keys, rng.randint(0, len(keys)))
+            },
+        )
+        for name in names
+    ]
+    constraints = [
+        MockConstraint(
+            relationship_key=rng.choice(keys),
+            comparator=rng.choice(COMPARATORS),
+            limit=rng.choice(LIMITS),
+        )
+        for _ in range(rng.randint(1, 4))
+    ]
+    return MockConfig(people=people, constraints=constraints)
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from email import message_from_bytes
+from email.message import Message
+import socketserver
+import threading
+import time
+from typing import TYPE_CHECKING, ClassVar, Self, cast
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server that records the messages it receives.
+
+    `data_replies` are replied to the next DATA commands instead of accepting the
+    message (e.g. 451 for a transient failure), and with `drop_after` each session is
+    dropped without a reply after that many messages. `reply_delay` simulates the
+    latency of a real server, in seconds per message.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after: int | None = None, reply_delay: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.drop_after = drop_after
+        self.reply_delay = reply_delay
+        self.data_replies: list[str] = []
+        self.messages: list[Message] = []
+        self.n_sessions = 0
+        self.max_concurrent_sessions = 0
+        self.lock = threading.Lock()
+        self._n_open_sessions = 0
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def open_session(self) -> None:
+        with self.lock:
+            self.n_sessions += 1
+            self._n_open_sessions += 1
+            self.max_concurrent_sessions = max(
+                self.max_concurrent_sessions, self._n_open_sessions
+            )
+
+    def close_session(self) -> None:
+        with self.lock:
+            self._n_open_sessions -= 1
+
+    def receive(self, data: bytes) -> str:
+        """Record a message, or pop the next of `data_replies`, and return the reply."""
+        with self.lock:
+            if len(self.data_replies) > 0:
+                return self.data_replies.pop(0)
+
+            self.messages.append(message_from_bytes(data))
+            return "250 OK"
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    REPLIES: ClassVar[dict[str, str]] = {
+        "EHLO": "250 localhost",
+        "HELO": "250 localhost",
+        "MAIL": "250 OK",
+        "RCPT": "250 OK",
+        "RSET": "250 OK",
+        "NOOP": "250 OK",
+    }
+
+    @property
+    def stand_in(self) -> SmtpStandIn:
+        return cast("SmtpStandIn", self.server)
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.stand_in.open_session()
+        try:
+            self.reply("220 localhost")
+            n_messages = 0
+            while line := self.rfile.readline():
+                command = line.decode().strip().split(" ")[0].upper()
+                if command == "QUIT":
+                    self.reply("221 Bye")
+                    return
+
+                if command != "DATA":
+                    self.reply(self.REPLIES.get(command, "502 Not implemented"))
+                    continue
+
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = b"".join(iter(self.read_data_line, b".\r\n"))
+                if (
+                    self.stand_in.drop_after is not None
+                    and n_messages >= self.stand_in.drop_after
+                ):
+                    return
+
+                time.sleep(self.stand_in.reply_delay)
+                self.reply(self.stand_in.receive(data))
+                n_messages += 1
+        finally:
+            self.stand_in.close_session()
+
+    def read_data_line(self) -> bytes:
+        if (line := self.rfile.readline()) == b"":
+            return b".\r\n"
+
+        return line[1:] if line.startswith(b"..") else line
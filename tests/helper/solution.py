@@ -0,0 +1,57 @@
+from typing import cast
+
+import numpy as np
+from numpy.typing import NDArray
+
+from secret_santa_pp.relationship_index import PairArrays
+from secret_santa_pp.weights import WeightMatrix
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import random_mock_config
+
+
+def get_weight_matrix(
+    allowed: NDArray[np.bool_], seed: int | None = None
+) -> WeightMatrix:
+    """People named by their index, with random weights if seeded, otherwise ones."""
+    n_people = len(allowed)
+    weights = (
+        np.ones((n_people, n_people), dtype=np.int32)
+        if seed is None
+        else np.random.default_rng(seed).integers(
+            1, 10, size=(n_people, n_people), dtype=np.int32
+        )
+    )
+    return WeightMatrix(
+        names=[str(i) for i in range(n_people)], weights=weights, allowed=allowed
+    )
+
+
+def get_random_weight_matrix(seed: int, n_people: int) -> WeightMatrix:
+    config = random_mock_config(seed, n_people).get_model()
+    return WeightMatrix.from_config(config, None)
+
+
+def assert_valid_solution(
+    edges: PairArrays, allowed: NDArray[np.bool_], n_recipients: int
+) -> None:
+    src, dst = edges
+    n_people = len(allowed)
+
+    assert allowed[src, dst].all()
+    assert len(np.unique(src * n_people + dst)) == len(src)
+    assert np.bincount(src, minlength=n_people).tolist() == [n_recipients] * n_people
+    assert np.bincount(dst, minlength=n_people).tolist() == [n_recipients] * n_people
+
+    # every round is a single cycle through everyone
+    for tour, next_people in zip(
+        np.split(src, n_recipients), np.split(dst, n_recipients), strict=True
+    ):
+        assert (np.sort(tour) == np.arange(n_people)).all()
+        assert (next_people == np.roll(tour, -1)).all()
+
+
+def assert_valid_graph(graph: DiGraph[str], n_recipients: int) -> None:
+    for node in graph.nodes:
+        assert cast(int, graph.in_degree(node)) == n_recipients
+        assert cast(int, graph.out_degree(node)) == n_recipients
@@ -0,0 +1,97 @@
+from itertools import permutations
+from typing import cast
+
+from networkx import min_cost_flow_cost  # pyright: ignore [reportUnknownVariableType]
+import numpy as np
+from numpy.typing import NDArray
+import pytest
+
+from secret_santa_pp.assignment import solve_assignment
+from secret_santa_pp.weights import WeightMatrix
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import random_mock_config
+
+
+def brute_force_cost(weight_matrix: WeightMatrix) -> int | None:
+    n_people = len(weight_matrix.names)
+    costs = [
+        sum(int(weight_matrix.weights[i, j]) for i, j in enumerate(permutation))
+        for permutation in permutations(range(n_people))
+        if all(weight_matrix.allowed[i, j] for i, j in enumerate(permutation))
+    ]
+    return min(costs, default=None)
+
+
+def min_cost_flow_reference(weight_matrix: WeightMatrix, n_recipients: int) -> int:
+    # b-matching as a min cost flow: gifters supply, recipients demand, unit capacities
+    n_people = len(weight_matrix.names)
+    graph: DiGraph[str] = DiGraph()
+    for i in range(n_people):
+        graph.add_node(  # pyright: ignore [reportUnknownMemberType]
+            f"src-{i}", demand=-n_recipients
+        )
+        graph.add_node(  # pyright: ignore [reportUnknownMemberType]
+            f"dst-{i}", demand=n_recipients
+        )
+
+    for i, j in zip(*np.nonzero(weight_matrix.allowed), strict=True):
+        graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
+            f"src-{i}", f"dst-{j}", capacity=1, weight=int(weight_matrix.weights[i, j])
+        )
+
+    return cast(int, min_cost_flow_cost(graph))
+
+
+def assert_regular(
+    weight_matrix: WeightMatrix,
+    edges: tuple[NDArray[np.intp], NDArray[np.intp]],
+    n_recipients: int,
+) -> None:
+    src, dst = edges
+    n_people = len(weight_matrix.names)
+
+    assert weight_matrix.allowed[src, dst].all()
+    assert len(np.unique(src * n_people + dst)) == len(src)
+    assert np.bincount(src, minlength=n_people).tolist() == [n_recipients] * n_people
+    assert np.bincount(dst, minlength=n_people).tolist() == [n_recipients] * n_people
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_solve_assignment_single_recipient_is_optimal(seed: int):
+    config = random_mock_config(seed, 7).get_model()
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    if (expected_cost := brute_force_cost(weight_matrix)) is None:
+        with pytest.raises(RuntimeError, match="no feasible assignment"):
+            solve_assignment(weight_matrix, 1)
+        return
+
+    edges = solve_assignment(weight_matrix, 1)
+
+    assert_regular(weight_matrix, edges, 1)
+    assert weight_matrix.weights[edges].sum() == expected_cost
+
+
+@pytest.mark.parametrize(("seed", "n_recipients"), [(0, 2), (1, 2), (2, 3), (3, 3)])
+def test_solve_assignment_multiple_recipients_is_optimal(seed: int, n_recipients: int):
+    config = random_mock_config(seed, 12).get_model()
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    edges = solve_assignment(weight_matrix, n_recipients)
+
+    assert_regular(weight_matrix, edges, n_recipients)
+    assert weight_matrix.weights[edges].sum() == min_cost_flow_reference(
+        weight_matrix, n_recipients
+    )
+
+
+def test_solve_assignment_multiple_recipients_infeasible():
+    weight_matrix = WeightMatrix(
+        names=["a", "b", "c"],
+        weights=np.ones((3, 3), dtype=np.int32),
+        allowed=~np.eye(3, dtype=np.bool_),
+    )
+
+    with pytest.raises(RuntimeError, match="no feasible assignment"):
+        solve_assignment(weight_matrix, 3)
@@ -0,0 +1,89 @@
+from enum import StrEnum
+from pathlib import Path
+from typing import get_args
+
+import pytest
+from pytest_mock import MockerFixture
+from typer.testing import CliRunner
+
+from secret_santa_pp.cli import (
+    OUTPUT_DELIMITERS,
+    FormatChoice,
+    ModeChoice,
+    SolverChoice,
+    TlsChoice,
+    app,
+)
+from secret_santa_pp.config_file import save_config
+from secret_santa_pp.mailer import TlsMode
+from secret_santa_pp.solution import SolutionMode
+from secret_santa_pp.tsp import TSP_SOLVERS
+
+from tests.helper.config import MockConfig, MockPerson
+
+
+@pytest.mark.parametrize(
+    ("choice", "values"),
+    [
+        (ModeChoice, list(get_args(SolutionMode.__value__))),
+        (SolverChoice, list(TSP_SOLVERS)),
+        (FormatChoice, list(OUTPUT_DELIMITERS)),
+        (TlsChoice, list(get_args(TlsMode.__value__))),
+    ],
+)
+def test_cli_choices(choice: type[StrEnum], values: list[str]):
+    assert sorted(member.value for member in choice) == sorted(values)
+
+
+@pytest.fixture
+def config_path(tmp_path: Path, mocker: MockerFixture) -> Path:
+    mocker.patch.dict("os.environ", {"SECRET_SANTA_PP_CACHE_DIR": str(tmp_path)})
+    path = tmp_path / "config.json"
+    save_config(
+        MockConfig(
+            people=[
+                MockPerson(name=name, relationships={"santa": [recipient]})
+                for name, recipient in [("a", "b"), ("b", "c"), ("c", "d"), ("d", "a")]
+            ]
+        ).get_model(),
+        path,
+    )
+    return path
+
+
+def test_cli_generate_solution_print_delimited(config_path: Path):
+    result = CliRunner(mix_stderr=False).invoke(
+        app,
+        [
+            "generate-solution",
+            str(config_path),
+            "--seed=0",
+            "--print-console",
+            "--format=csv",
+            "--gifter=a",
+        ],
+    )
+
+    assert result.exit_code == 0
+    header, row = result.stdout.splitlines()
+    assert header == "gifter,recipient_1"
+    assert row.startswith("a,")
+    assert "Generating solution" in result.stderr
+
+
+def test_cli_display_solution_console_print_delimited(config_path: Path):
+    result = CliRunner(mix_stderr=False).invoke(
+        app,
+        [
+            "display-solution-console",
+            str(config_path),
+            "santa",
+            "--format=tsv",
+            "--gifter=a",
+            "--gifter=c",
+        ],
+    )
+
+    assert result.exit_code == 0
+    assert result.stdout == "gifter\trecipient_1\na\tb\nc\td\n"
+    assert "Loading solution" in result.stderr
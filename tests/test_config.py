@@ -211,3 +211,41 @@ def test_config_load_graph():
     assert len(graph.nodes) == len(src_dst_list_map)
     for node in graph.nodes:
         assert list(graph[node]) == src_dst_list_map[node]
+
+
+def test_config_get_person():
+    config = MockConfig(
+        people=[MockPerson(name=name) for name in ["a", "b", "c"]]
+    ).get_model()
+
+    assert config.get_person_id("b") == 1
+    assert config.get_person("c") is config.people[2]
+    assert config.get_people([2, 0, 2]) == [config.people[0], config.people[2]]
+    with pytest.raises(LookupError, match="Person not found: d."):
+        config.get_person("d")
+
+
+def test_config_find_people():
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"office": ["London"]}),
+            MockPerson(name="b", relationships={"office": ["Paris", "London"]}),
+            MockPerson(name="c", relationships={"office": ["Paris"], "team": ["x"]}),
+        ]
+    ).get_model()
+
+    assert config.find_people("office", "London") == [0, 1]
+    assert config.find_people("office", "Paris") == [1, 2]
+    assert config.find_people("office", "Berlin") == []
+    assert config.find_people("other-key", "London") == []
+
+
+def test_config_update_from_graph_updates_index():
+    config = MockConfig(
+        people=[MockPerson(name=name) for name in ["a", "b", "c"]]
+    ).get_model()
+    assert config.find_people("graph-key", "b") == []
+
+    config.update_from_graph(DiGraph([("a", "b"), ("b", "c"), ("c", "a")]), "graph-key")
+
+    assert config.find_people("graph-key", "b") == [0]
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from secret_santa_pp import config_cache
+from secret_santa_pp.config import Config
+from secret_santa_pp.config_cache import get_cache_dir, load_cached_config
+from secret_santa_pp.config_file import save_config
+
+from tests.helper.config import MockConfig, MockPerson
+
+
+def write_config(path: Path, names: list[str]) -> MockConfig:
+    mock_config = MockConfig(
+        people=[MockPerson(name=name, email=f"{name}@example.com") for name in names]
+    )
+    save_config(mock_config.get_model(), path)
+    return mock_config
+
+
+def load(path: Path) -> Config:
+    return Config.model_validate_json(path.read_text())
+
+
+def test_load_cached_config_reuses_unchanged_file(
+    tmp_path: Path, mocker: MockerFixture
+):
+    path = tmp_path / "config.json"
+    mock_config = write_config(path, ["a", "b"])
+    spy = mocker.Mock(side_effect=load)
+
+    first = load_cached_config(path, spy, tmp_path / "cache")
+    second = load_cached_config(path, spy, tmp_path / "cache")
+
+    assert spy.call_count == 1
+    mock_config.assert_equivalent(first)
+    mock_config.assert_equivalent(second)
+
+
+def test_load_cached_config_reloads_changed_file(tmp_path: Path, mocker: MockerFixture):
+    path = tmp_path / "config.json"
+    write_config(path, ["a", "b"])
+    spy = mocker.Mock(side_effect=load)
+    load_cached_config(path, spy, tmp_path / "cache")
+
+    mock_config = write_config(path, ["a", "c"])
+    config = load_cached_config(path, spy, tmp_path / "cache")
+
+    assert spy.call_count == 2  # noqa: PLR2004
+    mock_config.assert_equivalent(config)
+
+
+def test_load_cached_config_reloads_on_schema_change(
+    tmp_path: Path, mocker: MockerFixture
+):
+    path = tmp_path / "config.json"
+    write_config(path, ["a", "b"])
+    spy = mocker.Mock(side_effect=load)
+    load_cached_config(path, spy, tmp_path / "cache")
+
+    mocker.patch.object(config_cache, "get_schema_version", return_value="new")
+    load_cached_config(path, spy, tmp_path / "cache")
+
+    assert spy.call_count == 2  # noqa: PLR2004
+
+
+def test_load_cached_config_ignores_corrupt_cache(
+    tmp_path: Path, mocker: MockerFixture
+):
+    path = tmp_path / "config.json"
+    mock_config = write_config(path, ["a", "b"])
+    load_cached_config(path, load, tmp_path / "cache")
+    for cache_path in (tmp_path / "cache").iterdir():
+        cache_path.write_bytes(b"not a pickle")
+    spy = mocker.Mock(side_effect=load)
+
+    config = load_cached_config(path, spy, tmp_path / "cache")
+
+    assert spy.call_count == 1
+    mock_config.assert_equivalent(config)
+
+
+def test_get_cache_dir(tmp_path: Path, mocker: MockerFixture):
+    mocker.patch.dict("os.environ", {"XDG_CACHE_HOME": str(tmp_path)}, clear=True)
+    assert get_cache_dir() == tmp_path / "secret-santa-pp"
+
+    mocker.patch.dict("os.environ", {"SECRET_SANTA_PP_CACHE_DIR": str(tmp_path)})
+    assert get_cache_dir() == tmp_path
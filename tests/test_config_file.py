@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.config_file import load_config, load_people_lines, save_config
+
+from tests.helper.config import MockConfig, MockConstraint, MockPerson
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch.dict("os.environ", {"SECRET_SANTA_PP_CACHE_DIR": str(tmp_path)})
+
+
+def get_mock_config() -> MockConfig:
+    return MockConfig(
+        people=[
+            MockPerson(name="a", email="a@example.com", relationships={"key": ["b"]}),
+            MockPerson(name="b", email="b@example.com"),
+        ],
+        constraints=[MockConstraint(relationship_key="key")],
+    )
+
+
+@pytest.mark.parametrize("suffix", [".json", ".jsonl"])
+def test_save_and_load_config(tmp_path: Path, suffix: str):
+    mock_config = get_mock_config()
+    path = tmp_path / f"config{suffix}"
+
+    save_config(mock_config.get_model(), path)
+    config = load_config(path)
+
+    mock_config.assert_equivalent(config)
+
+
+def test_save_config_jsonl(tmp_path: Path):
+    path = tmp_path / "people.jsonl"
+
+    save_config(get_mock_config().get_model(), path)
+
+    lines = path.read_text().splitlines()
+    assert list(json.loads(lines[0])) == ["constraints"]
+    assert [json.loads(line)["name"] for line in lines[1:]] == ["a", "b"]
+
+
+def test_load_people_lines():
+    lines = [
+        json.dumps(
+            {
+                "constraints": [
+                    {
+                        "relationship_key": "key",
+                        "comparator": "equality",
+                        "limit": "exclude",
+                    }
+                ]
+            }
+        ),
+        "",
+        json.dumps({"name": "a", "email": "a@example.com"}),
+        json.dumps(
+            {"name": "b", "email": "b@example.com", "relationships": {"key": ["x"]}}
+        ),
+    ]
+
+    config = load_people_lines(lines)
+
+    assert [person.name for person in config.people] == ["a", "b"]
+    assert config.people[1].relationships == {"key": ["x"]}
+    assert config.constraints[0].comparator == "equality"
+
+
+def test_load_people_lines_reports_every_invalid_line():
+    lines = [
+        json.dumps({"constraints": []}),
+        json.dumps({"name": "a", "email": "not an email"}),
+        json.dumps({"name": "b", "email": "b@example.com"}),
+        "{not json",
+        json.dumps({"email": "c@example.com"}),
+    ]
+
+    with pytest.raises(ValueError, match="Invalid people file") as exc_info:
+        load_people_lines(lines)
+
+    errors = str(exc_info.value).splitlines()[1:]
+    assert [error.split(":")[0] for error in errors] == ["line 2", "line 4", "line 5"]
+    assert errors[0].startswith("line 2: email: ")
+    assert errors[2].startswith("line 5: name: ")
+
+
+def test_load_people_lines_invalid_header():
+    lines = [
+        json.dumps({"constraints": [{"relationship_key": "key"}]}),
+        json.dumps({"name": "a", "email": "a@example.com"}),
+    ]
+
+    with pytest.raises(ValueError, match="line 1: constraints.0.comparator: "):
+        load_people_lines(lines)
+
+
+def test_load_people_lines_missing_header():
+    lines = [
+        json.dumps({"name": "a", "email": "a@example.com"}),
+        json.dumps({"name": "b", "email": "b@example.com"}),
+    ]
+
+    with pytest.raises(ValueError, match="Invalid people file") as exc_info:
+        load_people_lines(lines)
+
+    errors = str(exc_info.value).splitlines()[1:]
+    assert all(error.startswith("line 1: ") for error in errors)
+    assert "line 1: constraints: Field required" in errors
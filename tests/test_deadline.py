@@ -0,0 +1,46 @@
+import os
+import signal
+
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.deadline import Deadline
+
+
+def test_deadline_expired():
+    assert not Deadline(None).expired()
+    assert not Deadline(60).expired()
+    assert Deadline(0).expired()
+
+
+def test_deadline_interrupt():
+    deadline = Deadline(None)
+    deadline.interrupt()
+
+    assert deadline.expired()
+
+
+def test_deadline_stop_event(mocker: MockerFixture):
+    stop_event = mocker.MagicMock()
+    stop_event.is_set.return_value = False
+    deadline = Deadline(None, stop_event)
+
+    assert not deadline.expired()
+
+    deadline.interrupt()
+
+    stop_event.set.assert_called_once_with()
+
+
+def test_deadline_stop_on_interrupt():
+    deadline = Deadline(None)
+    previous_handler = signal.getsignal(signal.SIGINT)
+
+    with deadline.stop_on_interrupt():
+        os.kill(os.getpid(), signal.SIGINT)
+        assert deadline.expired()
+
+        with pytest.raises(KeyboardInterrupt):
+            os.kill(os.getpid(), signal.SIGINT)
+
+    assert signal.getsignal(signal.SIGINT) is previous_handler
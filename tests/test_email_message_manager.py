@@ -4,7 +4,12 @@ from pathlib import Path
 import pytest
 from pytest_mock import MockerFixture
 
-from secret_santa_pp.email_message_manager import EmailMessageManager, TemplateManager
+from secret_santa_pp.email_message_manager import (
+    CompiledTemplate,
+    EmailMessageManager,
+    RenderedEmail,
+    TemplateManager,
+)
 
 TODAY = date.today()
 YEAR = date.today().year
@@ -174,91 +179,159 @@ def test_email_message_manager_init(
     assert message.template_manager == template_manager
 
 
-def test_email_message_manager_get_subject(tmp_path: Path, mocker: MockerFixture):
-    mock_populate = mocker.patch(
-        "secret_santa_pp.email_message_manager.TemplateManager.populate", autospec=True
-    )
-    mock_populate.return_value = "populated email subject"
-
+def test_email_message_manager_get_subject(tmp_path: Path):
     html_path = tmp_path / "template.html"
     with html_path.open("w") as fp:
         fp.write("html template")
 
-    template_manager = TemplateManager()
-    template_data = {"tag1": "tag1data"}
-    subject = "email subject"
-
-    message = EmailMessageManager(template_manager, subject, html_path, None)
+    message = EmailMessageManager(
+        TemplateManager(), "{gifter}: santa {year}", html_path, None, ["gifter"]
+    )
 
-    assert message.get_subject(template_data) == "populated email subject"
-    mock_populate.assert_called_once_with(template_manager, template_data, subject)
+    assert message.get_subject({"gifter": "name"}) == f"name: santa {YEAR}"
 
 
 @pytest.mark.parametrize("html_exists", [True, False])
-def test_email_message_manager_get_message_html(
-    tmp_path: Path, mocker: MockerFixture, html_exists: bool
-):
-    mock_populate = mocker.patch(
-        "secret_santa_pp.email_message_manager.TemplateManager.populate", autospec=True
-    )
-    mock_populate.return_value = "populated message"
-
+def test_email_message_manager_get_message_html(tmp_path: Path, html_exists: bool):
     path = tmp_path / "template"
     with path.open("w") as fp:
-        fp.write("template message")
-
-    template_manager = TemplateManager()
-    template_data = {"tag": "tagdata"}
+        fp.write("<p>{tag} {days_to_christmas}</p>")
 
     message = EmailMessageManager(
-        template_manager,
+        TemplateManager(),
         "subject",
         path if html_exists else None,
         None if html_exists else path,
+        ["tag"],
     )
 
-    html_message = message.get_message_html(template_data)
+    html_message = message.get_message_html({"tag": "tagdata"})
 
     if html_exists:
-        assert html_message == "populated message"
-        mock_populate.assert_called_once_with(
-            template_manager, template_data, "template message"
-        )
+        assert html_message == f"<p>tagdata {DAYS_TO_CHRISTMAS} days to Christmas</p>"
     else:
         assert html_message is None
-        mock_populate.assert_not_called()
 
 
 @pytest.mark.parametrize("text_exists", [True, False])
-def test_email_message_manager_get_message_text(
-    tmp_path: Path, mocker: MockerFixture, text_exists: bool
-):
-    mock_populate = mocker.patch(
-        "secret_santa_pp.email_message_manager.TemplateManager.populate", autospec=True
-    )
-    mock_populate.return_value = "populated message"
-
+def test_email_message_manager_get_message_text(tmp_path: Path, text_exists: bool):
     path = tmp_path / "template"
     with path.open("w") as fp:
-        fp.write("template message")
-
-    template_manager = TemplateManager()
-    template_data = {"tag": "tagdata"}
+        fp.write("{tag} {days_to_christmas}")
 
     message = EmailMessageManager(
-        template_manager,
+        TemplateManager(),
         "subject",
         None if text_exists else path,
         path if text_exists else None,
+        ["tag"],
     )
 
-    text_message = message.get_message_text(template_data)
+    text_message = message.get_message_text({"tag": "tagdata"})
 
     if text_exists:
-        assert text_message == "populated message"
-        mock_populate.assert_called_once_with(
-            template_manager, template_data, "template message"
-        )
+        assert text_message == f"tagdata {DAYS_TO_CHRISTMAS} days to Christmas"
     else:
         assert text_message is None
-        mock_populate.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("template_keys", "template_data", "text"),
+    [
+        ([], {}, "{days_to_christmas} {year}"),
+        ([], {}, "{{literal}} {year:>8} {year!r} {year[0]}"),
+        (["tag"], {"tag": "tagdata"}, "{tag} {tag:>10} {tag!r} {tag[0]} {year}"),
+        (["tag"], {"tag": "tagdata"}, "{tag:>{year}.3}"),
+        (["width"], {"width": "10"}, "{year:>{width}}"),
+        (["year"], {"year": "1999"}, "{year} {days_to_christmas}"),
+        (["tag"], {"tag": 1}, "{tag} {tag:03d}"),
+    ],
+)
+def test_template_manager_compile(
+    template_keys: list[str], template_data: dict[str, str], text: str
+):
+    template_manager = TemplateManager()
+
+    template = template_manager.compile(text, template_keys)
+
+    assert template.keys == set(template_keys) & set(template_data)
+    assert template.render(template_data) == template_manager.populate(
+        template_data, text
+    )
+
+
+def test_template_manager_compile_placeholder_not_found():
+    with pytest.raises(
+        LookupError, match=r"Template placeholder not found: tag \(in the HTML"
+    ):
+        TemplateManager().compile("{year} {tag}", ["other"], "HTML")
+
+
+def test_template_manager_compile_nested_placeholder_not_found():
+    with pytest.raises(LookupError, match="Template placeholder not found: width"):
+        TemplateManager().compile("{tag:>{width}}", ["tag"])
+
+
+def test_email_message_manager_placeholder_not_found(tmp_path: Path):
+    path = tmp_path / "template.txt"
+    with path.open("w") as fp:
+        fp.write("{gifter} {limit}")
+
+    with pytest.raises(LookupError, match="Template placeholder not found: limit"):
+        EmailMessageManager(TemplateManager(), "subject", None, path, ["gifter"])
+
+
+def test_email_message_manager_render_batch(tmp_path: Path):
+    html_path = tmp_path / "template.html"
+    with html_path.open("w") as fp:
+        fp.write("<p>{gifter}</p>")
+    text_path = tmp_path / "template.txt"
+    with text_path.open("w") as fp:
+        fp.write("{gifter}")
+
+    message = EmailMessageManager(
+        TemplateManager(), "{gifter} {year}", html_path, text_path, ["gifter"]
+    )
+
+    assert message.render_batch([{"gifter": "a"}, {"gifter": "b"}]) == [
+        RenderedEmail(subject=f"a {YEAR}", html="<p>a</p>", text="a"),
+        RenderedEmail(subject=f"b {YEAR}", html="<p>b</p>", text="b"),
+    ]
+
+
+def test_email_message_manager_render_batch_twice(tmp_path: Path):
+    text_path = tmp_path / "template.txt"
+    with text_path.open("w") as fp:
+        fp.write("{recipients}")
+
+    message = EmailMessageManager(
+        TemplateManager(), "{gifter}", None, text_path, ["gifter", "recipients"]
+    )
+
+    for gifter, recipients in [("a", "b"), ("b", "a")]:
+        emails = message.render_batch([{"gifter": gifter, "recipients": recipients}])
+        assert emails == [RenderedEmail(subject=gifter, html=None, text=recipients)]
+
+    # the batch's keys are a copy, so the subject still only needs its own
+    subject_template = message._subject_template  # pyright: ignore[reportPrivateUsage]
+    assert subject_template.keys == {"gifter"}
+
+
+def test_email_message_manager_render_batch_value_not_found(
+    tmp_path: Path, mocker: MockerFixture
+):
+    text_path = tmp_path / "template.txt"
+    with text_path.open("w") as fp:
+        fp.write("{gifter} {recipients}")
+
+    message = EmailMessageManager(
+        TemplateManager(), "subject", None, text_path, ["gifter", "recipients"]
+    )
+    spy = mocker.spy(CompiledTemplate, "render")
+
+    with pytest.raises(LookupError, match="Template value not found: recipients."):
+        message.render_batch(
+            [{"gifter": "a", "recipients": "b"}, {"gifter": "b"}, {"gifter": "c"}]
+        )
+
+    spy.assert_not_called()
@@ -0,0 +1,197 @@
+from itertools import combinations
+from typing import cast
+
+from networkx import maximum_flow_value  # pyright: ignore [reportUnknownVariableType]
+import numpy as np
+from numpy.typing import NDArray
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.config import Config
+from secret_santa_pp.feasibility import check_feasibility, has_regular_assignment
+from secret_santa_pp.people import CompactPeople
+from secret_santa_pp.relationship_index import RelationshipIndex
+from secret_santa_pp.weights import WeightMatrix
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import MockConfig, MockConstraint, MockPerson
+from tests.helper.solution import get_weight_matrix
+
+
+def get_config(n_people: int, relationships: dict[int, dict[str, list[str]]]) -> Config:
+    return MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships=relationships.get(i, {}))
+            for i in range(n_people)
+        ],
+        constraints=[
+            MockConstraint(relationship_key="avoid", comparator="one-way contains"),
+            MockConstraint(relationship_key="family", comparator="equality"),
+            MockConstraint(
+                relationship_key="office",
+                comparator="equality",
+                limit="medium-probability",
+            ),
+        ],
+    ).get_model()
+
+
+def max_flow_reference(allowed: NDArray[np.bool_], n_recipients: int) -> bool:
+    graph: DiGraph[str] = DiGraph()
+    for i in range(len(allowed)):
+        graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
+            "source", f"src-{i}", capacity=n_recipients
+        )
+        graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
+            f"dst-{i}", "sink", capacity=n_recipients
+        )
+
+    for i, j in zip(*np.nonzero(allowed), strict=True):
+        graph.add_edge(  # pyright: ignore [reportUnknownMemberType]
+            f"src-{i}", f"dst-{j}", capacity=1
+        )
+
+    flow_value = cast(int, maximum_flow_value(graph, "source", "sink"))
+    return flow_value == len(allowed) * n_recipients
+
+
+@pytest.mark.parametrize("mode_single_cycle", [True, False])
+def test_check_feasibility_feasible(mode_single_cycle: bool):
+    config = get_config(6, {0: {"office": ["a"]}, 1: {"office": ["a"]}})
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    report = check_feasibility(weight_matrix, 2, mode_single_cycle, config)
+
+    assert report.feasible
+    assert report.max_n_recipients is None
+    assert str(report) == "Feasible with 2 recipients"
+
+
+def test_check_feasibility_degree():
+    # 0 avoids everyone except 1
+    config = get_config(5, {0: {"avoid": ["2", "3", "4"]}})
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    report = check_feasibility(weight_matrix, 2, True, config)
+
+    assert not report.feasible
+    assert report.max_n_recipients == 1
+    assert [problem.people for problem in report.problems] == [["0"]]
+    assert report.problems[0].constraints == ["avoid (one-way contains)"]
+    assert str(report) == (
+        "Infeasible with 2 recipients, at most 1 recipients are possible\n"
+        "- Can only give to 1 other people: 0 (excluded by: avoid (one-way contains))"
+    )
+
+
+def test_check_feasibility_feasible_builds_no_index(mocker: MockerFixture):
+    config = get_config(5, {0: {"avoid": ["1"]}})
+    weight_matrix = WeightMatrix.from_config(config, None)
+    from_config = mocker.spy(RelationshipIndex, "from_config")
+
+    report = check_feasibility(weight_matrix, 2, True, config)
+
+    assert report.feasible
+    from_config.assert_not_called()
+
+
+def test_check_feasibility_reuses_people(mocker: MockerFixture):
+    config = get_config(5, {0: {"avoid": ["2", "3", "4"]}})
+    people = CompactPeople.from_config(config, None)
+    weight_matrix = WeightMatrix.from_people(people, config.constraints)
+    from_config = mocker.spy(RelationshipIndex, "from_config")
+
+    report = check_feasibility(weight_matrix, 2, True, config, people)
+
+    assert report.problems[0].constraints == ["avoid (one-way contains)"]
+    from_config.assert_not_called()
+
+
+def test_check_feasibility_too_many_recipients():
+    config = get_config(4, {})
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    report = check_feasibility(weight_matrix, 4, False, config)
+
+    assert report.max_n_recipients == 3  # noqa: PLR2004
+    assert len(report.problems) == 8  # noqa: PLR2004
+    assert all(problem.constraints == [] for problem in report.problems)
+
+
+def test_check_feasibility_hall():
+    # 0 and 1 can each give to someone, but they can only give to 2 between them
+    config = get_config(
+        5, {0: {"avoid": ["1", "3", "4"]}, 1: {"avoid": ["0", "3", "4"]}}
+    )
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    report = check_feasibility(weight_matrix, 1, False, config)
+
+    assert report.max_n_recipients == 0
+    assert [problem.people for problem in report.problems] == [["0", "1"]]
+    assert report.problems[0].message == (
+        "These 2 people can only give to 1 people between them"
+    )
+    assert report.problems[0].constraints == ["avoid (one-way contains)"]
+
+
+def test_check_feasibility_single_cycle():
+    # two families that can only give within the family
+    family = {i: {"family": [str(i // 3)]} for i in range(6)}
+    allowed = ~np.eye(6, dtype=np.bool_)
+    allowed[:3, 3:] = False
+    allowed[3:, :3] = False
+    config = get_config(6, family)
+
+    cycle_report = check_feasibility(get_weight_matrix(allowed), 1, True, config)
+    assignment_report = check_feasibility(get_weight_matrix(allowed), 1, False, config)
+
+    assert not cycle_report.feasible
+    assert cycle_report.max_n_recipients is None
+    assert cycle_report.problems[0].people == ["3", "4", "5"]
+    assert assignment_report.feasible
+
+
+def test_check_feasibility_names_are_truncated():
+    allowed = np.zeros((12, 12), dtype=np.bool_)
+
+    report = check_feasibility(get_weight_matrix(allowed), 1, False)
+
+    assert str(report.problems[0]) == "Can only give to 0 other people: 0"
+    assert len(report.problems) == 24  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("mode_single_cycle", [True, False])
+def test_check_feasibility_no_participants(mode_single_cycle: bool):
+    allowed = np.zeros((0, 0), dtype=np.bool_)
+
+    report = check_feasibility(get_weight_matrix(allowed), 1, mode_single_cycle)
+
+    assert not report.feasible
+    assert report.max_n_recipients is None
+    assert str(report) == "Infeasible with 1 recipients\n- No participants"
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("n_recipients", [1, 2])
+def test_has_regular_assignment(seed: int, n_recipients: int):
+    rng = np.random.default_rng(seed)
+    allowed = (rng.random((7, 7)) < 0.45) & ~np.eye(7, dtype=np.bool_)  # noqa: PLR2004
+
+    assert has_regular_assignment(allowed, n_recipients) == max_flow_reference(
+        allowed, n_recipients
+    )
+
+
+def test_has_regular_assignment_hall_violators_are_named():
+    # any 3 people that can only give to the same 2 people
+    for gifters in combinations(range(6), 3):
+        allowed = ~np.eye(6, dtype=np.bool_)
+        allowed[list(gifters)] = False
+        recipients = [i for i in range(6) if i not in gifters][:2]
+        for i in gifters:
+            allowed[i, recipients] = True
+
+        report = check_feasibility(get_weight_matrix(allowed), 1, False)
+
+        assert report.problems[0].people == [str(i) for i in gifters]
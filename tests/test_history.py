@@ -0,0 +1,83 @@
+from typing import TYPE_CHECKING, cast
+
+from secret_santa_pp.history import (
+    HISTORY_PENALTY,
+    find_history_keys,
+    get_history_penalties,
+)
+from secret_santa_pp.solution import Solution
+
+from tests.helper.config import MockConfig, MockConstraint, MockPerson
+
+if TYPE_CHECKING:
+    import numpy as np
+    from numpy.typing import NDArray
+
+
+def get_config() -> MockConfig:
+    return MockConfig(
+        people=[
+            MockPerson(
+                name="a", relationships={"2022": ["b"], "2023": ["b"], "2024": ["c"]}
+            ),
+            MockPerson(
+                name="b", relationships={"2022": ["c"], "2023": ["c"], "2024": ["a"]}
+            ),
+            MockPerson(
+                name="c",
+                relationships={
+                    "2022": ["a"],
+                    "2023": ["a"],
+                    "2024": ["b"],
+                    "office": ["london"],
+                    "partner": ["d"],
+                },
+            ),
+            MockPerson(name="d", relationships={"partner": ["c"]}),
+        ],
+        constraints=[MockConstraint(relationship_key="partner", limit="exclude")],
+    )
+
+
+def test_find_history_keys():
+    config = get_config().get_model()
+
+    # office isn't a list of people and partner is used by a constraint
+    assert find_history_keys(config) == ["2022", "2023", "2024"]
+
+
+def test_get_history_penalties():
+    config = get_config().get_model()
+
+    penalties = get_history_penalties(
+        config, ["a", "b", "c"], ["2022", "2023", "2024"], penalty=8, decay=0.5
+    )
+
+    # 2024 costs 8, 2023 costs 4 and 2022 costs 2
+    dense = cast("NDArray[np.int32]", penalties.toarray())  # pyright: ignore [reportUnknownMemberType]
+    assert dense.tolist() == [[0, 6, 8], [8, 0, 6], [6, 8, 0]]
+
+
+def test_get_history_penalties_ignores_non_participants():
+    config = get_config().get_model()
+
+    penalties = get_history_penalties(config, ["b", "c"], ["2024"])
+
+    dense = cast("NDArray[np.int32]", penalties.toarray())  # pyright: ignore [reportUnknownMemberType]
+    assert dense.tolist() == [[0, 0], [HISTORY_PENALTY, 0]]
+
+
+def test_solution_generate_with_history():
+    config = MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships={"last-year": [str((i + 1) % 6)]})
+            for i in range(6)
+        ]
+    ).get_model()
+
+    solution = Solution.generate(
+        config, None, 1, mode="assignment", history_keys=["last-year"]
+    )
+
+    for i in range(6):
+        assert not solution.graph.has_edge(str(i), str((i + 1) % 6))
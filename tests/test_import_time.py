@@ -0,0 +1,93 @@
+import os
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+from secret_santa_pp.config_file import save_config
+
+from tests.helper.config import MockConfig, MockPerson
+
+ROOT_DIR = Path(__file__).parent.parent
+
+# Startup budget of every command in seconds, as the total time spent importing
+# modules (`python -X importtime`), which is generous so that slow CI runners pass.
+IMPORT_BUDGET = 2.0
+# Heavy modules that only the commands that need them should import.
+PLOTTING_MODULES = ["matplotlib"]
+SOLVER_MODULES = ["scipy"]
+
+
+def get_import_times(args: list[str], tmp_path: Path) -> dict[str, int]:
+    """Run a CLI command and return the cumulative import time (in us) by module."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-m", "secret_santa_pp.cli", *args],
+        cwd=ROOT_DIR,
+        env={**os.environ, "SECRET_SANTA_PP_CACHE_DIR": str(tmp_path / "cache")},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    import_times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        import_times[name.rstrip()] = int(cumulative)
+
+    return import_times
+
+
+@pytest.fixture
+def config_path(tmp_path: Path) -> Path:
+    path = tmp_path / "config.json"
+    names = ["a", "b", "c", "d"]
+    config = MockConfig(
+        people=[
+            MockPerson(
+                name=name,
+                email=f"{name}@example.com",
+                relationships={"2024": [names[(i + 1) % len(names)]]},
+            )
+            for i, name in enumerate(names)
+        ]
+    ).get_model()
+    save_config(config, path)
+    return path
+
+
+@pytest.mark.parametrize(
+    ("args", "excluded_modules"),
+    [
+        (
+            ["display-solution-console", "{config}", "2024"],
+            PLOTTING_MODULES + SOLVER_MODULES,
+        ),
+        (
+            ["score-solution", "{config}", "2024", "--no-lower-bound"],
+            PLOTTING_MODULES + SOLVER_MODULES,
+        ),
+        (
+            ["convert-config", "{config}", "{tmp}/config.jsonl"],
+            PLOTTING_MODULES + SOLVER_MODULES,
+        ),
+        (["check-feasibility", "{config}"], PLOTTING_MODULES),
+        (["generate-solution", "{config}", "--mode", "assignment"], PLOTTING_MODULES),
+    ],
+)
+def test_cli_import_time(
+    args: list[str], excluded_modules: list[str], config_path: Path, tmp_path: Path
+):
+    import_times = get_import_times(
+        [arg.format(config=config_path, tmp=tmp_path) for arg in args], tmp_path
+    )
+
+    imported = {name.strip().split(".")[0] for name in import_times}
+    assert imported.isdisjoint(excluded_modules)
+
+    # top level imports have a single space before the name, nested ones more
+    total = sum(t for name, t in import_times.items() if not name.startswith("  "))
+    assert total / 1e6 < IMPORT_BUDGET
@@ -0,0 +1,132 @@
+from collections.abc import Callable
+
+from networkx import (
+    is_strongly_connected,  # pyright: ignore [reportUnknownVariableType]
+)
+import pytest
+
+from secret_santa_pp.config import BASE_WEIGHT
+from secret_santa_pp.incremental import patch_solution
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.solution import assert_valid_graph
+
+
+def cycle_graph(names: list[str], n_recipients: int = 1) -> DiGraph[str]:
+    graph: DiGraph[str] = DiGraph()
+    graph.add_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        (names[i], names[(i + step) % len(names)])
+        for i in range(len(names))
+        for step in range(1, n_recipients + 1)
+    )
+    return graph
+
+
+def excluding(*excluded: tuple[str, str]) -> Callable[[str, str], int | None]:
+    def get_weight(src: str, dst: str) -> int | None:
+        return None if (src, dst) in excluded else BASE_WEIGHT
+
+    return get_weight
+
+
+def assert_single_cycle(graph: DiGraph[str]) -> None:
+    assert_valid_graph(graph, 1)
+    assert is_strongly_connected(graph)  # pyright: ignore [reportArgumentType]
+
+
+def test_patch_solution_remove():
+    graph = cycle_graph(list("abcdef"))
+
+    changed_gifters = patch_solution(graph, ["c"], [], excluding())
+
+    assert changed_gifters == ["b"]
+    assert list(graph.successors("b")) == ["d"]
+    assert_single_cycle(graph)
+
+
+def test_patch_solution_remove_excluded_pair():
+    # b can't give to d, so one of them moves somewhere else
+    graph = cycle_graph(list("abcdefgh"))
+
+    changed_gifters = patch_solution(graph, ["c"], [], excluding(("b", "d")), seed=0)
+
+    assert not graph.has_edge("b", "d")
+    assert "b" in changed_gifters
+    assert len(changed_gifters) == 3  # noqa: PLR2004
+    assert_single_cycle(graph)
+
+
+def test_patch_solution_remove_from_two_cycle():
+    graph = cycle_graph(list("abcdef"))
+    graph.remove_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        [("a", "b"), ("b", "c"), ("f", "a")]
+    )
+    graph.add_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        [("a", "b"), ("b", "a"), ("f", "c")]
+    )
+
+    changed_gifters = patch_solution(graph, ["b"], [], excluding(), seed=0)
+
+    assert "a" in changed_gifters
+    assert_valid_graph(graph, 1)
+
+
+def test_patch_solution_add():
+    graph = cycle_graph(list("abcdef"))
+
+    changed_gifters = patch_solution(graph, [], ["g"], excluding(), seed=0)
+
+    assert len(changed_gifters) == 2  # noqa: PLR2004
+    assert changed_gifters[-1] == "g"
+    assert list(graph.successors(changed_gifters[0])) == ["g"]
+    assert_single_cycle(graph)
+
+
+def test_patch_solution_add_avoids_excluded_edges():
+    graph = cycle_graph(list("abcdef"))
+    excluded = [(name, "g") for name in "abcde"]
+
+    patch_solution(graph, [], ["g"], excluding(*excluded), seed=0)
+
+    assert list(graph.predecessors("g")) == ["f"]
+    assert_single_cycle(graph)
+
+
+@pytest.mark.parametrize("n_recipients", [2, 3])
+def test_patch_solution_multiple_recipients(n_recipients: int):
+    names = [str(i) for i in range(12)]
+    graph = cycle_graph(names, n_recipients)
+    # 4 already gives to everyone else that 5 gives to
+    excluded = ("4", str(5 + n_recipients))
+
+    changed_gifters = patch_solution(
+        graph, ["0", "5"], ["new-0", "new-1"], excluding(excluded), seed=0
+    )
+
+    assert "0" not in graph
+    assert "5" not in graph
+    assert {"new-0", "new-1"} <= set(changed_gifters)
+    assert not graph.has_edge(*excluded)
+    assert_valid_graph(graph, n_recipients)
+
+
+def test_patch_solution_not_found():
+    graph = cycle_graph(list("abc"))
+
+    with pytest.raises(LookupError, match="Participant not found: d."):
+        patch_solution(graph, ["d"], [], excluding())
+
+
+def test_patch_solution_already_in_solution():
+    graph = cycle_graph(list("abc"))
+
+    with pytest.raises(LookupError, match="Participant already in the solution: a."):
+        patch_solution(graph, [], ["a"], excluding())
+
+
+def test_patch_solution_impossible_raises_error():
+    graph = cycle_graph(list("abcd"))
+    excluded = [(name, "e") for name in "abcd"]
+
+    with pytest.raises(RuntimeError, match="Invalid solution: no allowed edges"):
+        patch_solution(graph, [], ["e"], excluding(*excluded))
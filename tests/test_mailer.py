@@ -0,0 +1,172 @@
+from email.message import EmailMessage
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.email_message_manager import EmailMessageManager, TemplateManager
+from secret_santa_pp.mailer import (
+    RECIPIENT_TEMPLATE_KEYS,
+    SmtpPool,
+    SmtpSettings,
+    TokenBucket,
+    build_messages,
+    format_names,
+    send_message,
+    send_messages,
+)
+from secret_santa_pp.solution import Solution
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import MockConfig, MockPerson
+from tests.helper.smtp import SmtpStandIn
+
+NAMES = [f"person-{i}" for i in range(20)]
+
+
+@pytest.fixture
+def manager(tmp_path: Path) -> EmailMessageManager:
+    text_template = tmp_path / "message.txt"
+    text_template.write_text("Dear {gifter}, you are buying for {recipients}.")
+    html_template = tmp_path / "message.html"
+    html_template.write_text("<p>Dear {gifter}, you are buying for {recipients}.</p>")
+    return EmailMessageManager(
+        TemplateManager(),
+        "Secret santa {year}",
+        html_template,
+        text_template,
+        RECIPIENT_TEMPLATE_KEYS,
+    )
+
+
+@pytest.fixture
+def messages(manager: EmailMessageManager) -> list[EmailMessage]:
+    config = MockConfig(
+        people=[MockPerson(name=name, email=f"{name}@example.com") for name in NAMES]
+    ).get_model()
+    solution = Solution(
+        graph=DiGraph(
+            [(name, NAMES[(i + 1) % len(NAMES)]) for i, name in enumerate(NAMES)]
+        )
+    )
+    return build_messages(manager, config, solution, "Santa <santa@example.com>")
+
+
+def get_pool(server: SmtpStandIn, size: int) -> SmtpPool:
+    return SmtpPool(SmtpSettings(host="127.0.0.1", port=server.port, tls="none"), size)
+
+
+def test_format_names():
+    assert format_names([]) == ""
+    assert format_names(["a"]) == "a"
+    assert format_names(["a", "b", "c"]) == "a, b and c"
+
+
+def test_build_messages(manager: EmailMessageManager):
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", email="a@example.com"),
+            MockPerson(name="b", email="b@example.com"),
+            MockPerson(name="c", email="c@example.com"),
+        ]
+    ).get_model()
+    solution = Solution(graph=DiGraph([("a", "b"), ("a", "c"), ("b", "a")]))
+
+    messages = build_messages(
+        manager, config, solution, "santa@example.com", "elf@example.com", ["a"]
+    )
+
+    assert len(messages) == 1
+    message = messages[0]
+    assert message["To"] == "a <a@example.com>"
+    assert message["From"] == "santa@example.com"
+    assert message["Reply-To"] == "elf@example.com"
+    assert message["Subject"].startswith("Secret santa ")
+    text, html = (part.get_content() for part in message.iter_parts())  # pyright: ignore [reportAttributeAccessIssue, reportUnknownMemberType, reportUnknownVariableType]
+    assert text.strip() == "Dear a, you are buying for b and c."
+    assert html.strip() == "<p>Dear a, you are buying for b and c.</p>"
+
+
+def test_token_bucket(mocker: MockerFixture):
+    now = [0.0]
+    sleep = mocker.Mock()
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=sleep)
+
+    # the burst is free, then each token is reserved half a second after the last
+    for _ in range(4):
+        bucket.acquire()
+    assert [call.args[0] for call in sleep.call_args_list] == [0.5, 1.0]
+
+    now[0] = 10.0
+    sleep.reset_mock()
+    bucket.acquire()
+    sleep.assert_not_called()
+
+
+def test_send_messages(messages: list[EmailMessage]):
+    with SmtpStandIn(reply_delay=0.01) as server, get_pool(server, 4) as pool:
+        results = list(send_messages(messages, pool, backoff=0))
+
+    assert [result.to for result in results] == [message["To"] for message in messages]
+    assert all(result.error is None and result.attempts == 1 for result in results)
+    assert sorted(message["To"] for message in server.messages) == sorted(
+        message["To"] for message in messages
+    )
+    # slow replies keep every connection busy, so they're all used at once
+    assert server.max_concurrent_sessions == 4  # noqa: PLR2004
+    assert server.n_sessions == pool.n_connects
+
+
+def test_send_messages_rate_limit(messages: list[EmailMessage], mocker: MockerFixture):
+    rate_limiter = TokenBucket(rate=1000, burst=1)
+    spy = mocker.spy(rate_limiter, "acquire")
+
+    with SmtpStandIn() as server, get_pool(server, 4) as pool:
+        results = list(send_messages(messages, pool, rate_limiter, backoff=0))
+
+    assert all(result.error is None for result in results)
+    assert spy.call_count == len(messages)
+
+
+def test_send_messages_reconnect(messages: list[EmailMessage]):
+    with SmtpStandIn(drop_after=2) as server, get_pool(server, 2) as pool:
+        results = list(send_messages(messages, pool, max_attempts=2, backoff=0))
+
+    assert all(result.error is None for result in results)
+    assert len(server.messages) == len(messages)
+    assert pool.n_connects > 2  # noqa: PLR2004
+
+
+def test_send_message_retry(messages: list[EmailMessage], mocker: MockerFixture):
+    sleep = mocker.Mock()
+
+    with SmtpStandIn() as server, get_pool(server, 1) as pool:
+        server.data_replies = ["451 Try again later", "451 Try again later"]
+        result = send_message(messages[0], pool, backoff=1.0, sleep=sleep)
+
+    assert result.error is None
+    assert result.attempts == 3  # noqa: PLR2004
+    assert [call.args[0] for call in sleep.call_args_list] == [1.0, 2.0]
+    assert len(server.messages) == 1
+    assert pool.n_connects == 1
+
+
+def test_send_message_permanent_failure(messages: list[EmailMessage]):
+    with SmtpStandIn() as server, get_pool(server, 1) as pool:
+        server.data_replies = ["550 Mailbox unavailable"]
+        result = send_message(messages[0], pool, backoff=0)
+
+    assert result.attempts == 1
+    assert result.error is not None
+    assert "Mailbox unavailable" in result.error
+    assert len(server.messages) == 0
+
+
+def test_send_message_max_attempts(messages: list[EmailMessage]):
+    with SmtpStandIn() as server, get_pool(server, 1) as pool:
+        server.data_replies = ["451 Try again later"] * 3
+        result = send_message(messages[0], pool, max_attempts=2, backoff=0)
+
+    assert result.attempts == 2  # noqa: PLR2004
+    assert result.error is not None
+    assert len(server.messages) == 0
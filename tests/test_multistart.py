@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from secret_santa_pp.multistart import solve_cycles_multistart
+from secret_santa_pp.weights import WeightMatrix
+
+from tests.helper.solution import assert_valid_solution, get_random_weight_matrix
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_cycles_multistart(workers: int):
+    weight_matrix = get_random_weight_matrix(0, 20)
+    restarts = 3
+
+    candidates = solve_cycles_multistart(
+        weight_matrix, 2, "local-search", 0, restarts=restarts, workers=workers
+    )
+
+    assert len(candidates) == restarts
+    for edges in candidates:
+        assert_valid_solution(edges, weight_matrix.allowed, 2)
+
+
+def test_solve_cycles_multistart_same_results_across_workers():
+    weight_matrix = get_random_weight_matrix(0, 20)
+
+    serial = solve_cycles_multistart(
+        weight_matrix, 1, "local-search", 0, restarts=3, workers=1
+    )
+    parallel = solve_cycles_multistart(
+        weight_matrix, 1, "local-search", 0, restarts=3, workers=3
+    )
+
+    for (serial_src, serial_dst), (parallel_src, parallel_dst) in zip(
+        serial, parallel, strict=True
+    ):
+        assert (serial_src == parallel_src).all()
+        assert (serial_dst == parallel_dst).all()
+
+
+def test_solve_cycles_multistart_drops_failed_starts():
+    weight_matrix = WeightMatrix(
+        names=["a", "b", "c"],
+        weights=np.ones((3, 3), dtype=np.int32),
+        allowed=~np.eye(3, dtype=np.bool_),
+    )
+
+    # there are only 2 edge-disjoint cycles through 3 people
+    assert solve_cycles_multistart(weight_matrix, 3, "local-search", 0, 2) == []
+
+
+def test_solve_cycles_multistart_unknown_solver():
+    with pytest.raises(LookupError, match="TSP solver not found: unknown."):
+        solve_cycles_multistart(get_random_weight_matrix(0, 20), 1, "unknown", 0, 2, 2)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_cycles_multistart_time_limit(workers: int):
+    weight_matrix = get_random_weight_matrix(0, 20)
+
+    # only the first start runs once the time limit has been reached
+    candidates = solve_cycles_multistart(
+        weight_matrix, 2, "local-search", 0, 3, workers, time_limit=0
+    )
+
+    assert len(candidates) == 1
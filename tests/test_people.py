@@ -0,0 +1,76 @@
+from itertools import product
+from typing import cast
+
+import pytest
+
+from secret_santa_pp.config import ComparatorType
+from secret_santa_pp.people import CompactPeople
+from secret_santa_pp.solution import get_edge_weight
+
+from tests.helper.config import (
+    COMPARATORS,
+    MockConfig,
+    MockConstraint,
+    MockPerson,
+    random_mock_config,
+)
+
+
+def test_compact_people_from_config():
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"key": ["b", "x"]}),
+            MockPerson(name="b", relationships={"key": ["x", "b"], "other-key": []}),
+            MockPerson(name="c", relationships={"key": ["b", "x"]}),
+            MockPerson(name="d", relationships={"key": ["a"]}),
+        ]
+    ).get_model()
+
+    people = CompactPeople.from_config(config, ["a", "b", "c"])
+
+    assert people.names == ["a", "b", "c"]
+    assert people.values == ["a", "b", "c", "x"]
+    assert list(people.relationships) == ["key"]
+    assert people.relationships["key"] == [
+        frozenset({1, 3}),
+        frozenset({1, 3}),
+        frozenset({1, 3}),
+    ]
+    # equal relationships share one set, but the groups keep the order
+    assert people.relationships["key"][0] is people.relationships["key"][1]
+    assert people.groups["key"].tolist() == [0, 1, 0]
+    assert people.group_values["key"] == [(1, 3), (3, 1)]
+    assert [cast(list[int], group.tolist()) for group in people.get_groups("key")] == [
+        [0, 2],
+        [1],
+    ]
+    assert people.get_groups("other-key") == []
+
+
+@pytest.mark.parametrize(("comparator", "seed"), list(product(COMPARATORS, range(5))))
+def test_compact_people_meet_criterion(comparator: ComparatorType, seed: int):
+    config = random_mock_config(seed, 12).get_model()
+    constraint = MockConstraint(
+        relationship_key="key-0", comparator=comparator
+    ).get_model()
+
+    people = CompactPeople.from_config(config, None)
+
+    for i, src_person in enumerate(config.people):
+        for j, dst_person in enumerate(config.people):
+            assert people.meet_criterion(constraint, i, j) == constraint.meet_criterion(
+                src_person, dst_person
+            )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compact_people_get_edge_weight(seed: int):
+    config = random_mock_config(seed, 12).get_model()
+
+    people = CompactPeople.from_config(config, None)
+
+    for i, src_person in enumerate(config.people):
+        for j, dst_person in enumerate(config.people):
+            assert people.get_edge_weight(config.constraints, i, j) == get_edge_weight(
+                config.constraints, src_person, dst_person
+            )
@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp import plotting
+from secret_santa_pp.plotting import GraphLayout, export_graph, get_layout, get_rings
+from secret_santa_pp.wrapper import DiGraph
+
+
+def cycles_graph(*cycles: list[str]) -> DiGraph[str]:
+    return DiGraph(
+        [
+            (cycle[i], cycle[(i + 1) % len(cycle)])
+            for cycle in cycles
+            for i in range(len(cycle))
+        ]
+    )
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch.dict("os.environ", {"SECRET_SANTA_PP_CACHE_DIR": str(tmp_path)})
+
+
+def test_get_rings():
+    graph = cycles_graph(list("abc"), list("de"))
+
+    assert get_rings(graph) == [["a", "b", "c"], ["d", "e"]]
+
+
+def test_graph_layout_from_graph():
+    graph = cycles_graph(list("ab"), [str(i) for i in range(20)])
+
+    layout = GraphLayout.from_graph(graph)
+
+    # largest ring first, each ring on its own circle
+    assert layout.names == [*(str(i) for i in range(20)), "a", "b"]
+    pos = layout.get_pos()
+    big_ring = layout.positions[:20]
+    center = big_ring.mean(axis=0)
+    radii = np.linalg.norm(big_ring - center, axis=1)
+    assert np.allclose(radii, radii[0])
+    assert np.linalg.norm(pos["a"] - pos["b"]) < radii[0]
+    assert np.linalg.norm((pos["a"] + pos["b"]) / 2 - center) > radii[0]
+
+
+def test_get_layout_cache(mocker: MockerFixture):
+    graph = cycles_graph(list("abcd"))
+    spy = mocker.spy(plotting.GraphLayout, "from_graph")
+
+    first = get_layout(graph, "key")
+    second = get_layout(graph, "key")
+
+    assert spy.call_count == 1
+    assert second.names == first.names
+    assert np.array_equal(second.positions, first.positions)
+
+
+def test_get_layout_cache_changed_graph(mocker: MockerFixture):
+    spy = mocker.spy(plotting.GraphLayout, "from_graph")
+    get_layout(cycles_graph(list("abcd")), "key")
+
+    layout = get_layout(cycles_graph(list("abc"), list("de")), "key")
+
+    assert spy.call_count == 2  # noqa: PLR2004
+    assert set(layout.names) == set("abcde")
+
+
+@pytest.mark.parametrize("n_people", [4, plotting.LABEL_LIMIT + 1])
+@pytest.mark.parametrize("suffix", [".png", ".svg", ".html"])
+def test_export_graph(tmp_path: Path, n_people: int, suffix: str):
+    graph = cycles_graph([str(i) for i in range(n_people)])
+    path = tmp_path / f"graph{suffix}"
+
+    export_graph(graph, get_layout(graph), path)
+
+    assert path.stat().st_size > 0
+    if suffix == ".html":
+        assert "<svg" in path.read_text()
+
+
+def test_export_graph_unsupported_file_type(tmp_path: Path):
+    graph = cycles_graph(list("abc"))
+
+    with pytest.raises(ValueError, match="Unsupported file type: .pdf."):
+        export_graph(graph, get_layout(graph), tmp_path / "graph.pdf")
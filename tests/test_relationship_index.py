@@ -0,0 +1,73 @@
+from itertools import product
+from typing import cast
+
+import pytest
+
+from secret_santa_pp.config import ComparatorType
+from secret_santa_pp.relationship_index import RelationshipIndex
+
+from tests.helper.config import (
+    COMPARATORS,
+    MockConfig,
+    MockConstraint,
+    MockPerson,
+    random_mock_config,
+)
+
+
+def test_relationship_index_from_config():
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"key": ["b", "c", "b"]}),
+            MockPerson(name="b", relationships={"key": [], "other-key": ["a"]}),
+            MockPerson(name="c", relationships={"key": ["b", "c"]}),
+            MockPerson(name="d", relationships={"key": ["b", "c"]}),
+        ]
+    ).get_model()
+
+    index = RelationshipIndex.from_config(config, ["a", "b", "c"])
+
+    assert index.names == ["a", "b", "c"]
+    assert index.name_index == {"a": 0, "b": 1, "c": 2}
+    assert index.members == {"key": {"b": [0, 2], "c": [0, 2]}, "other-key": {"a": [1]}}
+    assert index.groups == {
+        "key": {("b", "c", "b"): [0], ("b", "c"): [2]},
+        "other-key": {("a",): [1]},
+    }
+
+
+@pytest.mark.parametrize(("comparator", "seed"), list(product(COMPARATORS, range(5))))
+def test_relationship_index_get_pairs(comparator: ComparatorType, seed: int):
+    config = random_mock_config(seed, 12).get_model()
+    constraint = MockConstraint(
+        relationship_key="key-0", comparator=comparator
+    ).get_model()
+
+    index = RelationshipIndex.from_config(config, None)
+    src, dst = index.get_pairs(constraint)
+    pairs = list(
+        zip(cast(list[int], src.tolist()), cast(list[int], dst.tolist()), strict=True)
+    )
+
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == {
+        (i, j)
+        for i, src_person in enumerate(config.people)
+        for j, dst_person in enumerate(config.people)
+        if i != j and constraint.meet_criterion(src_person, dst_person)
+    }
+
+
+def test_relationship_index_get_pairs_unknown_key():
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"key": ["b"]}),
+            MockPerson(name="b"),
+        ]
+    ).get_model()
+    constraint = MockConstraint(relationship_key="other-key").get_model()
+
+    src, dst = RelationshipIndex.from_config(config, None).get_pairs(constraint)
+
+    assert src.tolist() == []
+    assert dst.tolist() == []
@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from secret_santa_pp.config import BASE_WEIGHT, LIMIT_PENALTIES
+from secret_santa_pp.scoring import score_solution
+from secret_santa_pp.solution import Solution
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import (
+    MockConfig,
+    MockConstraint,
+    MockPerson,
+    random_mock_config,
+)
+
+
+def get_config() -> MockConfig:
+    # 0 and 1 are partners, 1 and 2 went to the same school, 2 and 3 work together
+    return MockConfig(
+        people=[
+            MockPerson(name="0", relationships={"partner": ["1"]}),
+            MockPerson(name="1", relationships={"partner": ["0"], "school": ["a"]}),
+            MockPerson(name="2", relationships={"school": ["a"], "office": ["b"]}),
+            MockPerson(name="3", relationships={"office": ["b"]}),
+        ],
+        constraints=[
+            MockConstraint(relationship_key="partner", limit="exclude"),
+            MockConstraint(
+                relationship_key="school",
+                comparator="equality",
+                limit="low-probability",
+            ),
+            MockConstraint(
+                relationship_key="office",
+                comparator="equality",
+                limit="medium-probability",
+            ),
+        ],
+    )
+
+
+def test_score_solution():
+    config = get_config().get_model()
+    graph: DiGraph[str] = DiGraph([("0", "1"), ("1", "2"), ("2", "3"), ("3", "0")])
+
+    score = score_solution(graph, config)
+
+    assert score.n_people == 4  # noqa: PLR2004
+    assert score.n_pairings == 4  # noqa: PLR2004
+    penalty = LIMIT_PENALTIES["low-probability"] + LIMIT_PENALTIES["medium-probability"]
+    assert score.total_penalty == penalty
+    assert score.total_weight == score.n_pairings * BASE_WEIGHT + penalty
+    assert score.limit_counts == {
+        "exclude": 1,
+        "low-probability": 1,
+        "medium-probability": 1,
+    }
+    assert [hits.count for hits in score.constraint_hits] == [1, 1, 1]
+    # 0 <-> 2 and 1 <-> 3 avoids every constraint
+    assert score.lower_bound == 0
+
+
+def test_score_solution_without_lower_bound():
+    config = get_config().get_model()
+    graph: DiGraph[str] = DiGraph([("0", "2"), ("2", "0"), ("1", "3"), ("3", "1")])
+
+    score = score_solution(graph, config, lower_bound=False)
+
+    assert score.total_penalty == 0
+    assert score.lower_bound is None
+
+
+def test_score_solution_person_not_in_config():
+    config = get_config().get_model()
+    graph: DiGraph[str] = DiGraph([("0", "1"), ("1", "4"), ("4", "5"), ("5", "0")])
+
+    with pytest.raises(LookupError, match="Person not found: 4, 5. Everyone"):
+        score_solution(graph, config)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_score_solution_matches_edge_weights(seed: int):
+    config = random_mock_config(seed, 12).get_model()
+    people = {person.name: person for person in config.people}
+    names = list(people)
+    random.Random(seed).shuffle(names)  # noqa: S311
+    graph: DiGraph[str] = DiGraph(
+        [
+            (names[i], names[(i + step) % len(names)])
+            for i in range(12)
+            for step in (1, 2)
+        ]
+    )
+
+    score = score_solution(graph, config, lower_bound=False)
+
+    n_excluded = 0
+    total_weight = 0
+    for src, dst in graph.edges:
+        met = [
+            c for c in config.constraints if c.meet_criterion(people[src], people[dst])
+        ]
+        n_excluded += any(c.limit == "exclude" for c in met)
+        total_weight += BASE_WEIGHT + sum(LIMIT_PENALTIES.get(c.limit, 0) for c in met)
+
+    assert score.limit_counts["exclude"] == n_excluded
+    assert score.total_weight == total_weight
+
+
+def test_solution_score_lower_bound():
+    config = random_mock_config(0, 12).get_model()
+    solution = Solution.generate(config, None, 1, mode="assignment")
+
+    score = solution.score(config)
+
+    # the assignment solution is optimal, so it meets the lower bound
+    assert score.lower_bound == score.total_penalty
+    assert "Lower bound: " in str(score)
@@ -0,0 +1,61 @@
+import pytest
+
+from secret_santa_pp.config import Config
+from secret_santa_pp.selection import select_participants
+
+from tests.helper.config import MockConfig, MockPerson
+
+
+@pytest.fixture
+def config() -> Config:
+    return MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"office": ["London"], "team": ["x"]}),
+            MockPerson(name="b", relationships={"office": ["London"], "team": ["y"]}),
+            MockPerson(name="c", relationships={"office": ["New York"], "team": ["x"]}),
+            MockPerson(name="Jane Doe", relationships={"office": ["London"]}),
+            MockPerson(name="all", relationships={"office": ["Paris"]}),
+        ]
+    ).get_model()
+
+
+@pytest.mark.parametrize(
+    ("selection", "expected_names"),
+    [
+        ("all", ["a", "b", "c", "Jane Doe", "all"]),
+        ("b", ["b"]),
+        ('"all"', ["all"]),
+        ("office=London", ["a", "b", "Jane Doe"]),
+        ('office="New York"', ["c"]),
+        ("office=Berlin", []),
+        ('office=London except "Jane Doe"', ["a", "b"]),
+        ("office=London and team=x", ["a"]),
+        ("c or office=London and team=x", ["a", "c"]),
+        ("(c or office=London) and team=x", ["a", "c"]),
+        ("all except office=London except c", ["all"]),
+        ("  team=y or a  ", ["a", "b"]),
+    ],
+)
+def test_select_participants(config: Config, selection: str, expected_names: list[str]):
+    assert select_participants(config, selection) == expected_names
+
+
+@pytest.mark.parametrize(
+    ("selection", "problem"),
+    [
+        ("", "expected a name or relationship at position 0"),
+        ("office=", "expected a relationship value at position 7"),
+        ("a or", "expected a name or relationship at position 4"),
+        ("(a or b", "expected '\\)' at position 7"),
+        ("a b", "unexpected 'b' at position 2"),
+        ('a or "b', "unexpected '\"' at position 5"),
+    ],
+)
+def test_select_participants_invalid(config: Config, selection: str, problem: str):
+    with pytest.raises(ValueError, match=f"Invalid selection: {problem}."):
+        select_participants(config, selection)
+
+
+def test_select_participants_person_not_found(config: Config):
+    with pytest.raises(LookupError, match="Person not found: d."):
+        select_participants(config, "a or d")
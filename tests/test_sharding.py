@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from secret_santa_pp.sharding import get_shards, solve_cycles_sharded
+
+from tests.helper.solution import assert_valid_solution, get_weight_matrix
+
+
+def test_get_shards():
+    shards = get_shards(23, 5, 1, 0)
+
+    assert [len(shard) for shard in shards] == [6, 6, 6, 5]
+    assert (np.sort(np.concatenate(shards)) == np.arange(23)).all()
+
+
+def test_get_shards_fewer_people_than_shard_size():
+    shards = get_shards(3, 5, 1, 0)
+
+    assert len(shards) == 1
+    assert (np.sort(shards[0]) == np.arange(3)).all()
+
+
+def test_get_shards_by_group():
+    groups = [[0, 2, 4, 6], [1, 3, 5, 7]]
+
+    shards = get_shards(10, 4, 1, 0, groups)
+
+    assert [shard.tolist() for shard in shards] == [[0, 2, 4, 6, 1], [3, 5, 7, 8, 9]]
+
+
+@pytest.mark.parametrize(("shard_size", "n_recipients"), [(2, 1), (4, 2), (6, 3)])
+def test_get_shards_too_small_raises_error(shard_size: int, n_recipients: int):
+    with pytest.raises(ValueError, match=f"Shard size too small: {shard_size}"):
+        get_shards(20, shard_size, n_recipients, 0)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("n_recipients", [1, 2, 3])
+def test_solve_cycles_sharded(workers: int, n_recipients: int):
+    n_people = 40
+    allowed = ~np.eye(n_people, dtype=np.bool_)
+    weight_matrix = get_weight_matrix(allowed, seed=0)
+    shards = get_shards(n_people, 10, n_recipients, 0)
+
+    edges = solve_cycles_sharded(
+        weight_matrix, n_recipients, "local-search", 0, shards, workers=workers
+    )
+
+    assert_valid_solution(edges, allowed, n_recipients)
+
+
+def test_solve_cycles_sharded_respects_exclusions_at_seams():
+    # most edges between shards are excluded
+    n_people = 30
+    shards = [np.arange(10), np.arange(10, 20), np.arange(20, 30)]
+    rng = np.random.default_rng(0)
+    allowed = rng.random((n_people, n_people)) < 0.2  # noqa: PLR2004
+    for shard in shards:
+        allowed[np.ix_(shard, shard)] = True
+    np.fill_diagonal(allowed, val=False)
+    weight_matrix = get_weight_matrix(allowed, seed=0)
+
+    edges = solve_cycles_sharded(weight_matrix, 2, "local-search", 0, shards)
+
+    assert_valid_solution(edges, allowed, 2)
+
+
+def test_solve_cycles_sharded_no_seam_raises_error():
+    n_people = 20
+    shards = [np.arange(10), np.arange(10, 20)]
+    allowed = np.zeros((n_people, n_people), dtype=np.bool_)
+    for shard in shards:
+        allowed[np.ix_(shard, shard)] = True
+    np.fill_diagonal(allowed, val=False)
+    weight_matrix = get_weight_matrix(allowed, seed=0)
+
+    with pytest.raises(RuntimeError, match="Invalid solution: no allowed edges"):
+        solve_cycles_sharded(weight_matrix, 1, "local-search", 0, shards)
+
+
+def test_solve_cycles_sharded_infeasible_shard_raises_error():
+    # there are only 2 edge-disjoint cycles through 3 people
+    n_people = 6
+    allowed = ~np.eye(n_people, dtype=np.bool_)
+    weight_matrix = get_weight_matrix(allowed, seed=0)
+    shards = [np.arange(3), np.arange(3, 6)]
+
+    with pytest.raises(RuntimeError, match="Invalid solution: no cycle found"):
+        solve_cycles_sharded(weight_matrix, 3, "local-search", 0, shards)
@@ -1,14 +1,22 @@
+import io
 from itertools import pairwise
 import re
 
+import numpy as np
 import pytest
 from pytest_mock import MockerFixture
 
 from secret_santa_pp.config import ComparatorType, LimitType
-from secret_santa_pp.solution import Solution, get_edge_weight, tsp_solver
+from secret_santa_pp.solution import Solution, SolutionMode, get_edge_weight
+from secret_santa_pp.weights import WeightMatrix
 from secret_santa_pp.wrapper import DiGraph
 
-from tests.helper.config import MockConfig, MockConstraint, MockPerson
+from tests.helper.config import (
+    MockConfig,
+    MockConstraint,
+    MockPerson,
+    random_mock_config,
+)
 
 
 @pytest.mark.parametrize(
@@ -58,21 +66,6 @@ def test_get_edge_weight(
     assert get_edge_weight(constraints, src_person, dst_person) == expected_weight
 
 
-def test_tsp_solver(mocker: MockerFixture):
-    mock_simulated_annealing_tsp = mocker.patch(
-        "secret_santa_pp.solution.approximation.simulated_annealing_tsp", autospec=True
-    )
-    mock_simulated_annealing_tsp.return_value = ["a", "b", "c"]
-
-    graph: DiGraph[str] = DiGraph()
-    return_value = tsp_solver(graph, "weight")
-
-    assert return_value == ["a", "b", "c"]
-    mock_simulated_annealing_tsp.assert_called_once_with(
-        graph, "greedy", weight="weight", max_iterations=100, N_inner=1000
-    )
-
-
 def test_solution_load():
     path = [str(i) for i in range(5)] + [str(i) for i in range(2)]
     src_dst_list_map = {
@@ -103,56 +96,48 @@ def test_solution_load_key_not_found():
         Solution.load(config, "invalid-key")
 
 
-def test_solution_init_graph(mocker: MockerFixture):
-    mock_get_edge_weight = mocker.patch(
-        "secret_santa_pp.solution.get_edge_weight", autospec=True
-    )
-    mock_get_edge_weight.side_effect = list(range(1, 7))
-
+def test_solution_init_graph():
     participants = [str(i) for i in range(3)]
     config = MockConfig(
-        people=[MockPerson(name=str(i)) for i in range(5)],
+        people=[
+            MockPerson(name="0", relationships={"key": ["1"]}),
+            MockPerson(name="1", relationships={"key": ["0", "2"]}),
+            MockPerson(name="2", relationships={"other-key": ["0"]}),
+            *[MockPerson(name=str(i)) for i in range(3, 5)],
+        ],
+        constraints=[
+            MockConstraint(relationship_key="key", limit="low-probability"),
+            MockConstraint(relationship_key="other-key", limit="exclude"),
+        ],
     ).get_model()
 
     solution = Solution(graph=DiGraph())
     solution.init_graph(config, participants)
 
-    assert len(solution.graph.nodes) == len(participants)
-
-    weight_counter = 1
-    for i, p1 in enumerate(participants):
-        for p2 in participants[i + 1 :]:
-            assert solution.graph[p1][p2]["weight"] == weight_counter
-            weight_counter += 1
+    assert sorted(solution.graph.nodes) == participants
+    assert {
+        (src, dst, weight)
+        for src, dst, weight in solution.graph.edges.data(  # pyright: ignore [reportUnknownVariableType]
+            "weight"
+        )
+    } == {("0", "1", 5), ("0", "2", 1), ("1", "0", 5), ("1", "2", 5), ("2", "1", 1)}
 
-            assert solution.graph[p2][p1]["weight"] == weight_counter
-            weight_counter += 1
 
-
-def test_solution_init_graph_no_participants(mocker: MockerFixture):
-    mock_get_edge_weight = mocker.patch(
-        "secret_santa_pp.solution.get_edge_weight", autospec=True
-    )
-    mock_get_edge_weight.side_effect = list(range(1, 21))
-
-    config = MockConfig(
-        people=[MockPerson(name=str(i)) for i in range(5)],
-    ).get_model()
+def test_solution_init_graph_no_participants():
+    config = MockConfig(people=[MockPerson(name=str(i)) for i in range(5)]).get_model()
 
     solution = Solution(graph=DiGraph())
     solution.init_graph(config, None)
 
     expected_participants = [str(i) for i in range(5)]
-    assert len(solution.graph.nodes) == len(expected_participants)
-
-    weight_counter = 1
-    for i, p1 in enumerate(expected_participants):
-        for p2 in expected_participants[i + 1 :]:
-            assert solution.graph[p1][p2]["weight"] == weight_counter
-            weight_counter += 1
+    assert list(solution.graph.nodes) == expected_participants
 
-            assert solution.graph[p2][p1]["weight"] == weight_counter
-            weight_counter += 1
+    for p1 in expected_participants:
+        for p2 in expected_participants:
+            if p1 == p2:
+                assert not solution.graph.has_edge(p1, p2)
+            else:
+                assert solution.graph[p1][p2]["weight"] == 1
 
 
 def test_solution_generate_solution(mocker: MockerFixture):
@@ -160,11 +145,11 @@ def test_solution_generate_solution(mocker: MockerFixture):
         ["0", "1", "2", "3", "4", "0"],
         ["4", "3", "2", "1", "0", "4"],
     ]
-    mock_traveling_salesman_problem = mocker.patch(
-        "secret_santa_pp.solution.approximation.traveling_salesman_problem",
-        autospec=True,
+    # the solver returns tours, without the closing node
+    mock_solver = mocker.Mock(
+        side_effect=[[int(p) for p in path[:-1]] for path in paths]
     )
-    mock_traveling_salesman_problem.side_effect = paths
+    mocker.patch.dict("secret_santa_pp.tsp.TSP_SOLVERS", {"annealing": mock_solver})
 
     graph: DiGraph[str] = DiGraph()
     participants = [str(i) for i in range(5)]
@@ -178,7 +163,7 @@ def test_solution_generate_solution(mocker: MockerFixture):
             )
 
     solution = Solution(graph=graph)
-    solution.generate_solution(2)
+    solution.generate_solution(2, solver="annealing")
 
     for p in participants:
         assert solution.graph.in_degree(p) == len(paths)
@@ -229,3 +214,306 @@ def test_solution_verify_solution_empty_graph_raises_error():
 
     with pytest.raises(RuntimeError, match="Invalid solution: empty graph"):
         solution._verify_solution(n_recipients=1)  # pyright: ignore[reportPrivateUsage]
+
+
+@pytest.mark.parametrize("n_recipients", [1, 2])
+def test_solution_generate_assignment(n_recipients: int):
+    config = MockConfig(
+        people=[
+            MockPerson(name="0", relationships={"key": ["1"]}),
+            MockPerson(name="1", relationships={"key": ["0"]}),
+            *[MockPerson(name=str(i)) for i in range(2, 6)],
+        ],
+        constraints=[MockConstraint(relationship_key="key", limit="exclude")],
+    ).get_model()
+
+    solution = Solution.generate(config, None, n_recipients, mode="assignment")
+
+    assert sorted(solution.graph.nodes) == [str(i) for i in range(6)]
+    assert not solution.graph.has_edge("0", "1")
+    assert not solution.graph.has_edge("1", "0")
+    for src, dst, weight in solution.graph.edges.data(  # pyright: ignore [reportUnknownVariableType]
+        "weight"
+    ):
+        assert src != dst
+        assert weight == 1
+
+
+def test_solution_generate_assignment_from_graph():
+    graph: DiGraph[str] = DiGraph()
+    graph.add_weighted_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        [("a", "b", 1), ("a", "c", 3), ("b", "a", 1), ("b", "c", 1), ("c", "a", 3)]
+    )
+
+    solution = Solution(graph=graph)
+    solution.generate_assignment(1)
+
+    assert sorted(solution.graph.edges.data("weight")) == [  # pyright: ignore [reportUnknownArgumentType, reportUnknownMemberType]
+        ("a", "b", 1),
+        ("b", "c", 1),
+        ("c", "a", 3),
+    ]
+
+
+@pytest.mark.parametrize("n_recipients", [1, 2, 3])
+def test_solution_generate_cycles(n_recipients: int):
+    config = MockConfig(
+        people=[
+            MockPerson(name="0", relationships={"key": ["1"]}),
+            MockPerson(name="1", relationships={"key": ["0"]}),
+            *[MockPerson(name=str(i)) for i in range(2, 8)],
+        ],
+        constraints=[MockConstraint(relationship_key="key", limit="exclude")],
+    ).get_model()
+
+    solution = Solution.generate(config, None, n_recipients, seed=0)
+
+    assert sorted(solution.graph.nodes) == [str(i) for i in range(8)]
+    assert not solution.graph.has_edge("0", "1")
+    assert not solution.graph.has_edge("1", "0")
+    for src, dst, weight in solution.graph.edges.data(  # pyright: ignore [reportUnknownVariableType]
+        "weight"
+    ):
+        assert src != dst
+        assert weight == 1
+
+
+def test_solution_generate_solution_no_cycle_raises_error():
+    # c can't give to anyone so there's no cycle through everyone
+    graph: DiGraph[str] = DiGraph()
+    graph.add_weighted_edges_from(  # pyright: ignore [reportUnknownMemberType]
+        [("a", "b", 1), ("b", "a", 1), ("a", "c", 1), ("b", "c", 1)]
+    )
+
+    solution = Solution(graph=graph)
+
+    with pytest.raises(RuntimeError, match="Invalid solution: no cycle found"):
+        solution.generate_solution(1)
+
+
+def test_solution_generate_solution_keeps_best_valid_start(mocker: MockerFixture):
+    weight_matrix = WeightMatrix(
+        names=["a", "b", "c"],
+        weights=np.array([[0, 1, 5], [5, 0, 1], [1, 5, 0]], dtype=np.int32),
+        allowed=~np.eye(3, dtype=np.bool_),
+    )
+    invalid = (np.array([0, 1]), np.array([1, 0]))
+    expensive = (np.array([0, 2, 1]), np.array([2, 1, 0]))
+    cheap = (np.array([0, 1, 2]), np.array([1, 2, 0]))
+    mock_solve_cycles_multistart = mocker.patch(
+        "secret_santa_pp.solution.solve_cycles_multistart", autospec=True
+    )
+    mock_solve_cycles_multistart.return_value = [expensive, invalid, cheap]
+
+    solution = Solution(graph=DiGraph(), weight_matrix=weight_matrix)
+    solution.generate_solution(1, seed=1, restarts=3, workers=2)
+
+    assert sorted(solution.graph.edges) == [("a", "b"), ("b", "c"), ("c", "a")]
+    mock_solve_cycles_multistart.assert_called_once_with(
+        weight_matrix, 1, "local-search", 1, 3, 2, None
+    )
+
+
+def test_solution_generate_infeasible_raises_error(mocker: MockerFixture):
+    # everyone in a family of 3 can only give to the 3 people outside of it
+    config = MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships={"family": [str(i // 3)]})
+            for i in range(6)
+        ],
+        constraints=[
+            MockConstraint(
+                relationship_key="family", comparator="equality", limit="exclude"
+            )
+        ],
+    ).get_model()
+    mock_generate_solution = mocker.patch.object(
+        Solution, "generate_solution", autospec=True
+    )
+
+    with pytest.raises(RuntimeError, match="Infeasible with 4 recipients"):
+        Solution.generate(config, None, 4)
+
+    mock_generate_solution.assert_not_called()
+
+
+@pytest.mark.parametrize("shard_key", [None, "office"])
+def test_solution_generate_sharded(mocker: MockerFixture, shard_key: str | None):
+    config = MockConfig(
+        people=[
+            MockPerson(
+                name=str(i),
+                relationships={"partner": [str(i ^ 1)], "office": [str(i % 3)]},
+            )
+            for i in range(30)
+        ],
+        constraints=[MockConstraint(relationship_key="partner", limit="exclude")],
+    ).get_model()
+
+    mock_from_people = mocker.spy(WeightMatrix, "from_people")
+
+    solution = Solution.generate(
+        config, None, 2, seed=0, shard_size=10, shard_key=shard_key
+    )
+    config.update_from_graph(solution.graph, "solution")
+
+    # only the shards' weights are built, never everyone's
+    assert [len(call.args[0].names) for call in mock_from_people.call_args_list] == [
+        10,
+        10,
+        10,
+    ]
+
+    assert sorted(config.load_graph("solution").edges) == sorted(solution.graph.edges)
+    for i in range(0, 30, 2):
+        assert not solution.graph.has_edge(str(i), str(i + 1))
+        assert not solution.graph.has_edge(str(i + 1), str(i))
+
+
+def test_solution_generate_sharded_infeasible_shard_raises_error():
+    # everyone excludes the rest of their office, which is their whole shard
+    config = MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships={"office": [str(i // 10)]})
+            for i in range(20)
+        ],
+        constraints=[
+            MockConstraint(
+                relationship_key="office", comparator="equality", limit="exclude"
+            )
+        ],
+    ).get_model()
+
+    with pytest.raises(RuntimeError, match="Shard 1 of 2: Infeasible"):
+        Solution.generate(config, None, 1, seed=0, shard_size=10, shard_key="office")
+
+
+def test_solution_update_participants():
+    config = MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships={"partner": [str(i ^ 1)]})
+            for i in range(10)
+        ],
+        constraints=[MockConstraint(relationship_key="partner", limit="exclude")],
+    ).get_model()
+    graph: DiGraph[str] = DiGraph([(str(i), str((i + 2) % 8)) for i in range(8)])
+    solution = Solution(graph=graph)
+
+    changed_gifters = solution.update_participants(config, ["3"], ["8", "9"], seed=0)
+
+    assert sorted(solution.graph.nodes) == ["0", "1", "2", "4", "5", "6", "7", "8", "9"]
+    assert "1" in changed_gifters
+    assert {"8", "9"} <= set(changed_gifters)
+    assert not solution.graph.has_edge("8", "9")
+    assert not solution.graph.has_edge("9", "8")
+
+
+def test_solution_update_participants_person_not_found():
+    config = MockConfig(people=[MockPerson(name=str(i)) for i in range(3)]).get_model()
+    solution = Solution(graph=DiGraph([("0", "1"), ("1", "2"), ("2", "0")]))
+
+    with pytest.raises(LookupError, match="Person not found: 3."):
+        solution.update_participants(config, [], ["3"])
+
+
+def test_solution_update_participants_removed_not_in_config():
+    # 3 was deleted from the config, so the stored solution lost their recipients
+    config = MockConfig(people=[MockPerson(name=str(i)) for i in range(3)]).get_model()
+    solution = Solution(graph=DiGraph([("0", "1"), ("1", "2"), ("2", "3")]))
+
+    with pytest.raises(LookupError, match="Person not found: 3. People that dropped"):
+        solution.update_participants(config, ["3"], [])
+
+
+@pytest.mark.parametrize("mode", ["cycle", "assignment"])
+def test_solution_add_rounds(mode: SolutionMode):
+    config = MockConfig(
+        people=[
+            MockPerson(name=str(i), relationships={"partner": [str(i ^ 1)]})
+            for i in range(10)
+        ],
+        constraints=[MockConstraint(relationship_key="partner", limit="exclude")],
+    ).get_model()
+    edges = [(str(i), str((i + 2) % 10)) for i in range(10)]
+    solution = Solution(graph=DiGraph(edges))
+
+    solution.add_rounds(config, 2, mode=mode, seed=0)
+
+    for src, dst in edges:
+        assert solution.graph.has_edge(src, dst)
+    for i in range(0, 10, 2):
+        assert not solution.graph.has_edge(str(i), str(i + 1))
+        assert not solution.graph.has_edge(str(i + 1), str(i))
+    for node in solution.graph.nodes:
+        assert len(solution.graph[node]) == 3  # noqa: PLR2004
+
+
+def test_solution_add_rounds_person_not_in_config():
+    config = MockConfig(people=[MockPerson(name=str(i)) for i in range(4)]).get_model()
+    edges = [(str(i), str((i + 1) % 6)) for i in range(6)]
+    solution = Solution(graph=DiGraph(edges))
+
+    with pytest.raises(LookupError, match="Person not found: 4, 5. Everyone"):
+        solution.add_rounds(config, 1, seed=0)
+
+
+def test_solution_add_rounds_infeasible_raises_error():
+    config = MockConfig(people=[MockPerson(name=str(i)) for i in range(3)]).get_model()
+    solution = Solution(graph=DiGraph([("0", "1"), ("1", "2"), ("2", "0")]))
+
+    # only the reverse cycle is left
+    with pytest.raises(RuntimeError, match="Infeasible with 2 recipients"):
+        solution.add_rounds(config, 2)
+
+
+def test_solution_print_batches(mocker: MockerFixture):
+    mocker.patch("secret_santa_pp.solution.PRINT_BATCH_SIZE", 2)
+    console = mocker.Mock()
+    solution = Solution(graph=DiGraph([("a", "b"), ("b", "c"), ("c", "a")]))
+
+    solution.print(console)
+
+    assert [call.args[0] for call in console.print.call_args_list] == [
+        "a: b\nb: c",
+        "c: a",
+    ]
+
+
+def test_solution_print_gifters(mocker: MockerFixture):
+    console = mocker.Mock()
+    solution = Solution(graph=DiGraph([("a", "b"), ("b", "c"), ("c", "a")]))
+
+    solution.print(console, gifters=["c", "a"])
+
+    console.print.assert_called_once_with("c: a\na: b", markup=False, highlight=False)
+
+
+def test_solution_print_gifter_not_found(mocker: MockerFixture):
+    solution = Solution(graph=DiGraph([("a", "b"), ("b", "a")]))
+
+    with pytest.raises(LookupError, match="Gifter not found: c."):
+        solution.print(mocker.Mock(), gifters=["c"])
+
+
+@pytest.mark.parametrize("delimiter", ["\t", ","])
+def test_solution_write_delimited(delimiter: str):
+    solution = Solution(
+        graph=DiGraph([("a", "b"), ("a", "c"), ("b", "a"), ("b", "c"), ("c", "a")])
+    )
+    fp = io.StringIO()
+
+    solution.write_delimited(fp, delimiter, gifters=["b"])
+
+    assert fp.getvalue().splitlines() == [
+        delimiter.join(["gifter", "recipient_1", "recipient_2"]),
+        delimiter.join(["b", "a", "c"]),
+    ]
+
+
+def test_solution_generate_invalid_n_recipients(mocker: MockerFixture):
+    spy = mocker.spy(Solution, "init_weight_matrix")
+
+    with pytest.raises(ValueError, match="Invalid number of recipients: 0"):
+        Solution.generate(random_mock_config(0, 5).get_model(), None, 0)
+
+    spy.assert_not_called()
@@ -0,0 +1,158 @@
+from pathlib import Path
+import sqlite3
+
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.config_file import (
+    load_config_and_solution,
+    load_solution,
+    save_solution,
+)
+from secret_santa_pp.store import ConfigStore
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import MockConfig, MockConstraint, MockPerson
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, mocker: MockerFixture) -> None:
+    mocker.patch.dict("os.environ", {"SECRET_SANTA_PP_CACHE_DIR": str(tmp_path)})
+
+
+def get_mock_config() -> MockConfig:
+    return MockConfig(
+        people=[
+            MockPerson(
+                name="a",
+                email="a@example.com",
+                relationships={"key": ["b", "x"], "2024": ["b"]},
+            ),
+            MockPerson(name="b", email="b@example.com", relationships={"2024": ["c"]}),
+            MockPerson(name="c", email="c@example.com", relationships={"2024": ["a"]}),
+        ],
+        constraints=[
+            MockConstraint(relationship_key="key"),
+            MockConstraint(relationship_key="2024", limit="low-probability"),
+        ],
+    )
+
+
+def test_config_store_save_and_load_config(tmp_path: Path):
+    mock_config = get_mock_config()
+
+    with ConfigStore(tmp_path / "config.db", create=True) as store:
+        store.save_config(mock_config.get_model())
+    with ConfigStore(tmp_path / "config.db") as store:
+        config = store.load_config()
+
+    mock_config.assert_equivalent(config)
+
+
+def test_config_store_not_found(tmp_path: Path):
+    path = tmp_path / "typo.db"
+
+    with pytest.raises(FileNotFoundError, match="Config file not found: .*typo.db."):
+        ConfigStore(path)
+
+    assert not path.exists()
+
+
+def test_config_store_load_config_names(tmp_path: Path):
+    with ConfigStore(tmp_path / "config.db", create=True) as store:
+        store.save_config(get_mock_config().get_model())
+
+        config = store.load_config(["c", "a", "unknown"])
+
+    assert [person.name for person in config.people] == ["a", "c"]
+    assert config.people[0].relationships == {"key": ["b", "x"], "2024": ["b"]}
+    assert len(config.constraints) == 2  # noqa: PLR2004
+
+
+def test_config_store_load_graph(tmp_path: Path):
+    with ConfigStore(tmp_path / "config.db", create=True) as store:
+        store.save_config(get_mock_config().get_model())
+
+        graph = store.load_graph("2024")
+
+    assert list(graph.edges) == [("a", "b"), ("b", "c"), ("c", "a")]
+
+
+def test_config_store_save_graph(tmp_path: Path):
+    graph: DiGraph[str] = DiGraph([("a", "c"), ("c", "a")])
+
+    with ConfigStore(tmp_path / "config.db", create=True) as store:
+        store.save_config(get_mock_config().get_model())
+        store.save_graph(graph, "2024", removed=["b"])
+        store.save_graph(graph, "2025")
+
+        config = store.load_config()
+
+    assert [person.relationships for person in config.people] == [
+        {"key": ["b", "x"], "2024": ["c"], "2025": ["c"]},
+        {},
+        {"2024": ["a"], "2025": ["a"]},
+    ]
+
+
+def test_config_store_save_graph_is_transactional(tmp_path: Path):
+    graph: DiGraph[str] = DiGraph([("a", "c"), ("c", "a")])
+
+    with ConfigStore(tmp_path / "config.db", create=True) as store:
+        store.save_config(get_mock_config().get_model())
+        store.connection.execute(
+            "CREATE TRIGGER fail BEFORE INSERT ON relationships"
+            " WHEN NEW.value = 'c' BEGIN SELECT RAISE(ABORT, 'fail'); END"
+        )
+
+        with pytest.raises(sqlite3.IntegrityError, match="fail"):
+            store.save_graph(graph, "2024")
+
+        assert list(store.load_graph("2024").edges) == [
+            ("a", "b"),
+            ("b", "c"),
+            ("c", "a"),
+        ]
+
+
+@pytest.mark.parametrize("file_name", ["config.json", "config.db"])
+def test_save_and_load_solution(tmp_path: Path, file_name: str):
+    path = tmp_path / file_name
+    config = get_mock_config().get_model()
+    graph: DiGraph[str] = DiGraph([("a", "c"), ("c", "a")])
+    if path.suffix == ".db":
+        with ConfigStore(path, create=True) as store:
+            store.save_config(config)
+
+    save_solution(path, config, graph, "2025", removed=["b"])
+    solution = load_solution(path, "2025")
+
+    assert list(solution.graph.edges) == [("a", "c"), ("c", "a")]
+
+
+def test_load_solution_not_found(tmp_path: Path):
+    path = tmp_path / "config.db"
+    config = get_mock_config().get_model()
+    with ConfigStore(path, create=True) as store:
+        store.save_config(config)
+
+    with pytest.raises(LookupError, match="Solution key not found: 2025."):
+        load_solution(path, "2025")
+
+
+@pytest.mark.parametrize("file_name", ["config.json", "config.db"])
+def test_load_config_and_solution(tmp_path: Path, file_name: str):
+    path = tmp_path / file_name
+    config = get_mock_config().get_model()
+    if path.suffix == ".db":
+        with ConfigStore(path, create=True) as store:
+            store.save_config(config)
+    save_solution(path, config, DiGraph([("a", "c"), ("c", "a")]), "2025")
+
+    loaded_config, solution = load_config_and_solution(path, "2025")
+
+    assert list(solution.graph.edges) == [("a", "c"), ("c", "a")]
+    # SQLite files only load the solution's participants
+    assert [person.name for person in loaded_config.people] == (
+        ["a", "b", "c"] if path.suffix == ".json" else ["a", "c"]
+    )
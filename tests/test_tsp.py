@@ -0,0 +1,309 @@
+import numpy as np
+from numpy.typing import NDArray
+import pytest
+from pytest_mock import MockerFixture
+
+from secret_santa_pp.deadline import Deadline
+from secret_santa_pp.tsp import (
+    ANNEALING_MIN_MOVES,
+    ANNEALING_PATIENCE,
+    TSP_SOLVERS,
+    ResidualGraph,
+    anneal_tour,
+    get_nearest_neighbour_tour,
+    get_neighbour_lists,
+    get_tsp_solver,
+    improve_tour,
+    repair_tour,
+    solve_cycles,
+)
+
+
+def get_tour_cost(tour: NDArray[np.intp], weights: NDArray[np.int32]) -> int:
+    return int(weights[tour, np.roll(tour, -1)].sum())
+
+
+def random_weights(seed: int, n_nodes: int) -> NDArray[np.int32]:
+    rng = np.random.default_rng(seed)
+    return rng.integers(1, 10, size=(n_nodes, n_nodes), dtype=np.int32)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n_nodes", [3, 4, 30])
+def test_anneal_tour(seed: int, n_nodes: int):
+    rng = np.random.default_rng(seed)
+    weights = random_weights(seed, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+    tour = rng.permutation(n_nodes)
+
+    annealed = anneal_tour(tour, weights, available, rng)
+
+    assert (np.sort(annealed) == np.arange(n_nodes)).all()
+    assert get_tour_cost(annealed, weights) <= get_tour_cost(tour, weights)
+
+
+def test_anneal_tour_stops_on_convergence(mocker: MockerFixture):
+    rng = mocker.Mock(wraps=np.random.default_rng(0))
+    weights = np.ones((3, 3), dtype=np.int32)
+    available = ~np.eye(3, dtype=np.bool_)
+
+    annealed = anneal_tour(np.array([0, 1, 2]), weights, available, rng)
+
+    assert (annealed == [0, 1, 2]).all()
+    # one batch of moves per temperature step
+    assert rng.integers.call_count == ANNEALING_PATIENCE
+    assert rng.integers.call_args.kwargs["size"] == (ANNEALING_MIN_MOVES, 2)
+
+
+def test_anneal_tour_stops_on_deadline():
+    rng = np.random.default_rng(0)
+    weights = random_weights(0, 30)
+    available = ~np.eye(30, dtype=np.bool_)
+    tour = rng.permutation(30)
+
+    annealed = anneal_tour(tour, weights, available, rng, Deadline(0))
+
+    assert (annealed == tour).all()
+
+
+def test_get_tsp_solver():
+    assert get_tsp_solver("local-search") is TSP_SOLVERS["local-search"]
+
+    with pytest.raises(LookupError, match="TSP solver not found: unknown."):
+        get_tsp_solver("unknown")
+
+
+def test_solve_annealing():
+    weights = np.arange(9, dtype=np.int32).reshape(3, 3)
+    available = ~np.eye(3, dtype=np.bool_)
+    available[0, 1] = False
+
+    residual = ResidualGraph(weights, available)
+    tour = get_tsp_solver("annealing")(
+        residual, np.random.default_rng(0), Deadline(None)
+    )
+
+    # the only cycle through everyone without 0 -> 1
+    start = tour.index(0)
+    assert [*tour[start:], *tour[:start]] == [0, 2, 1]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_get_nearest_neighbour_tour(seed: int):
+    weights = random_weights(seed, 20)
+    available = ~np.eye(20, dtype=np.bool_)
+
+    tour = get_nearest_neighbour_tour(weights, available, np.random.default_rng(seed))
+
+    assert (np.sort(tour) == np.arange(20)).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n_nodes", [3, 4, 5, 30])
+def test_improve_tour(seed: int, n_nodes: int):
+    rng = np.random.default_rng(seed)
+    weights = random_weights(seed, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+    tour = rng.permutation(n_nodes)
+
+    improved = improve_tour(tour, weights, available, rng)
+
+    assert (np.sort(improved) == np.arange(n_nodes)).all()
+    assert get_tour_cost(improved, weights) <= get_tour_cost(tour, weights)
+
+
+def test_improve_tour_stops_on_deadline():
+    rng = np.random.default_rng(0)
+    weights = random_weights(0, 30)
+    available = ~np.eye(30, dtype=np.bool_)
+    tour = rng.permutation(30)
+
+    improved = improve_tour(tour, weights, available, rng, Deadline(0))
+
+    assert (improved == tour).all()
+
+
+def test_improve_tour_finds_only_available_cycle():
+    # the only cycle through everyone is 0 -> 1 -> ... -> n - 1 -> 0
+    n_nodes = 12
+    weights = np.ones((n_nodes, n_nodes), dtype=np.int32)
+    available = np.zeros((n_nodes, n_nodes), dtype=np.bool_)
+    available[np.arange(n_nodes), np.roll(np.arange(n_nodes), -1)] = True
+    rng = np.random.default_rng(0)
+
+    improved = improve_tour(rng.permutation(n_nodes), weights, available, rng)
+
+    start = int(np.flatnonzero(improved == 0)[0])
+    assert (np.roll(improved, -start) == np.arange(n_nodes)).all()
+
+
+@pytest.mark.parametrize("solver", sorted(TSP_SOLVERS))
+def test_tsp_solvers_return_cycle(solver: str):
+    n_nodes = 8
+    weights = random_weights(0, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+
+    residual = ResidualGraph(weights, available)
+    tour = get_tsp_solver(solver)(residual, np.random.default_rng(0), Deadline(None))
+
+    assert sorted(tour) == list(range(n_nodes))
+
+
+def test_repair_tour_moves_node():
+    n_nodes = 6
+    weights = random_weights(0, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+    available[0, 1] = False
+
+    repaired = repair_tour(np.arange(n_nodes), weights, available)
+
+    assert repaired is not None
+    assert (np.sort(repaired) == np.arange(n_nodes)).all()
+    assert available[repaired, np.roll(repaired, -1)].all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_repair_tour(seed: int):
+    n_nodes = 50
+    rng = np.random.default_rng(seed)
+    weights = random_weights(seed, n_nodes)
+    available = (rng.random((n_nodes, n_nodes)) < 0.8) & ~np.eye(  # noqa: PLR2004
+        n_nodes, dtype=np.bool_
+    )
+    tour = rng.permutation(n_nodes)
+    assert not available[tour, np.roll(tour, -1)].all()
+
+    repaired = repair_tour(tour, weights, available)
+
+    assert repaired is not None
+    assert (np.sort(repaired) == np.arange(n_nodes)).all()
+    assert available[repaired, np.roll(repaired, -1)].all()
+
+
+def test_repair_tour_impossible():
+    # 0 can't give to anyone
+    n_nodes = 5
+    weights = random_weights(0, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+    available[0] = False
+
+    assert repair_tour(np.arange(n_nodes), weights, available) is None
+
+
+def test_residual_graph_use_edges():
+    weights = np.arange(9, dtype=np.int32).reshape(3, 3)
+    allowed = ~np.eye(3, dtype=np.bool_)
+    residual = ResidualGraph(weights, allowed)
+
+    residual.use_edges(np.array([0, 1]), np.array([1, 2]))
+
+    assert sorted(zip(*np.nonzero(residual.available), strict=True)) == [
+        (0, 2),
+        (1, 0),
+        (2, 0),
+        (2, 1),
+    ]
+    assert allowed[0, 1]
+    assert allowed[1, 2]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+def test_get_neighbour_lists(mocker: MockerFixture, chunk_size: int):
+    mocker.patch("secret_santa_pp.tsp.NEIGHBOUR_CHUNK_SIZE", chunk_size)
+    n_nodes, n_neighbours = 10, 3
+    weights = random_weights(0, n_nodes)
+    available = ~np.eye(n_nodes, dtype=np.bool_)
+    available[0, 1:] = False
+
+    successors, predecessors = get_neighbour_lists(
+        weights, available, n_neighbours, np.random.default_rng(0)
+    )
+
+    cost = np.where(available, weights, np.iinfo(np.int32).max).astype(np.int64)
+    np.fill_diagonal(cost, np.iinfo(np.int64).max)
+    for node in range(n_nodes):
+        assert node not in successors[node]
+        assert node not in predecessors[node]
+        assert sorted(cost[node, successors[node]]) == sorted(cost[node])[:n_neighbours]
+        assert (
+            sorted(cost[predecessors[node], node])
+            == sorted(cost[:, node])[:n_neighbours]
+        )
+
+
+@pytest.mark.parametrize("n_recipients", [1, 3])
+def test_solve_cycles(n_recipients: int):
+    n_nodes = 12
+    weights = random_weights(0, n_nodes)
+    allowed = ~np.eye(n_nodes, dtype=np.bool_)
+
+    src, dst = solve_cycles(
+        weights, allowed, n_recipients, "local-search", 0, Deadline(None)
+    )
+
+    assert allowed[src, dst].all()
+    assert len(np.unique(src * n_nodes + dst)) == len(src)
+    assert np.bincount(src).tolist() == [n_recipients] * n_nodes
+    assert np.bincount(dst).tolist() == [n_recipients] * n_nodes
+
+
+def test_solve_cycles_completes_after_deadline():
+    n_nodes = 12
+    weights = random_weights(0, n_nodes)
+    allowed = ~np.eye(n_nodes, dtype=np.bool_)
+
+    src, dst = solve_cycles(weights, allowed, 2, "local-search", 0, Deadline(0))
+
+    assert allowed[src, dst].all()
+    assert np.bincount(src).tolist() == [2] * n_nodes
+    assert np.bincount(dst).tolist() == [2] * n_nodes
+
+
+def test_solve_cycles_repairs_invalid_round(mocker: MockerFixture):
+    n_nodes = 6
+    weights = random_weights(0, n_nodes)
+    allowed = ~np.eye(n_nodes, dtype=np.bool_)
+    allowed[0, 1] = False
+    mock_solver = mocker.Mock(return_value=list(range(n_nodes)))
+    mocker.patch("secret_santa_pp.tsp.get_tsp_solver", return_value=mock_solver)
+
+    src, dst = solve_cycles(weights, allowed, 1, "mock", 0, Deadline(None))
+
+    assert allowed[src, dst].all()
+    assert (np.sort(src) == np.arange(n_nodes)).all()
+    mock_solver.assert_called_once()
+
+
+def test_solve_cycles_solves_round_again_if_repair_fails(mocker: MockerFixture):
+    n_nodes = 6
+    weights = random_weights(0, n_nodes)
+    allowed = ~np.eye(n_nodes, dtype=np.bool_)
+    allowed[0, 1] = False
+    valid = [0, 2, 1, 3, 4, 5]
+    mock_solver = mocker.Mock(side_effect=[list(range(n_nodes)), valid])
+    mocker.patch("secret_santa_pp.tsp.get_tsp_solver", return_value=mock_solver)
+    mocker.patch("secret_santa_pp.tsp.repair_tour", return_value=None)
+
+    src, _ = solve_cycles(weights, allowed, 1, "mock", 0, Deadline(None))
+
+    assert src.tolist() == valid
+    assert mock_solver.call_count == 2  # noqa: PLR2004
+
+
+@pytest.mark.parametrize("n_recipients", [0, -1])
+def test_solve_cycles_invalid_n_recipients_raises_error(n_recipients: int):
+    weights = random_weights(0, 5)
+    allowed = ~np.eye(5, dtype=np.bool_)
+
+    with pytest.raises(ValueError, match="Invalid number of recipients"):
+        solve_cycles(weights, allowed, n_recipients, "local-search", 0, Deadline(None))
+
+
+def test_solve_cycles_no_cycle_raises_error():
+    n_nodes = 5
+    weights = random_weights(0, n_nodes)
+    allowed = ~np.eye(n_nodes, dtype=np.bool_)
+    allowed[0] = False
+
+    with pytest.raises(RuntimeError, match="Invalid solution: no cycle found"):
+        solve_cycles(weights, allowed, 1, "nearest-neighbour", 0, Deadline(None))
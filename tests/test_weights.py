@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from secret_santa_pp.config import Config
+from secret_santa_pp.history import get_history_penalties
+from secret_santa_pp.solution import get_edge_weight
+from secret_santa_pp.weights import LazyWeights, WeightMatrix
+from secret_santa_pp.wrapper import DiGraph
+
+from tests.helper.config import (
+    MockConfig,
+    MockConstraint,
+    MockPerson,
+    random_mock_config,
+)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_weight_matrix_from_config(seed: int):
+    config = random_mock_config(seed, 15).get_model()
+
+    weight_matrix = WeightMatrix.from_config(config, None)
+
+    assert weight_matrix.names == [person.name for person in config.people]
+    for i, src_person in enumerate(config.people):
+        for j, dst_person in enumerate(config.people):
+            if i == j:
+                assert not weight_matrix.allowed[i, j]
+                continue
+
+            weight = get_edge_weight(config.constraints, src_person, dst_person)
+            if weight is None:
+                assert not weight_matrix.allowed[i, j]
+            else:
+                assert weight_matrix.allowed[i, j]
+                assert weight_matrix.weights[i, j] == weight
+
+
+def test_weight_matrix_from_config_participants():
+    config = MockConfig(
+        people=[
+            MockPerson(name="a", relationships={"key": ["b", "c"]}),
+            MockPerson(name="b"),
+            MockPerson(name="c"),
+            MockPerson(name="d", relationships={"key": ["a"]}),
+        ],
+        constraints=[MockConstraint(relationship_key="key", limit="low-probability")],
+    ).get_model()
+
+    weight_matrix = WeightMatrix.from_config(config, ["d", "a", "c"])
+
+    assert weight_matrix.names == ["a", "c", "d"]
+    assert weight_matrix.weights[~np.eye(3, dtype=np.bool_)].tolist() == [
+        5,
+        1,
+        1,
+        1,
+        5,
+        1,
+    ]
+
+
+def test_weight_matrix_to_graph():
+    weight_matrix = WeightMatrix(
+        names=["a", "b", "c"],
+        weights=np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]], dtype=np.int32),
+        allowed=np.array(
+            [[False, True, True], [False, False, True], [True, False, False]]
+        ),
+    )
+
+    graph = weight_matrix.to_graph()
+
+    assert {
+        (src, dst, weight)
+        for src, dst, weight in graph.edges.data(  # pyright: ignore [reportUnknownVariableType]
+            "weight"
+        )
+    } == {("a", "b", 2), ("a", "c", 3), ("b", "c", 6), ("c", "a", 7)}
+
+
+def test_weight_matrix_exclude_edges():
+    weight_matrix = WeightMatrix(
+        names=["a", "b", "c"],
+        weights=np.ones((3, 3), dtype=np.int32),
+        allowed=~np.eye(3, dtype=np.bool_),
+    )
+
+    weight_matrix.exclude_edges(DiGraph([("a", "b"), ("c", "a"), ("c", "d")]))
+
+    assert weight_matrix.allowed.tolist() == [
+        [False, False, True],
+        [True, False, True],
+        [False, True, False],
+    ]
+
+
+def get_dense_weights(
+    config: Config, participants: list[str] | None, history_keys: list[str]
+) -> WeightMatrix:
+    weight_matrix = WeightMatrix.from_config(config, participants)
+    weight_matrix.add_penalties(
+        get_history_penalties(config, weight_matrix.names, history_keys)
+    )
+    return weight_matrix
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_lazy_weights_get_submatrix(seed: int):
+    config = random_mock_config(seed, 15).get_model()
+    participants = [person.name for person in config.people[1:]]
+    dense = get_dense_weights(config, participants, ["key-0"])
+    indices = np.random.default_rng(seed).permutation(len(participants))[:8]
+
+    submatrix = LazyWeights(config, participants, ["key-0"]).get_submatrix(indices)
+
+    assert submatrix.names == [participants[i] for i in indices]
+    assert (submatrix.allowed == dense.allowed[np.ix_(indices, indices)]).all()
+    assert (
+        submatrix.weights[submatrix.allowed]
+        == dense.weights[np.ix_(indices, indices)][submatrix.allowed]
+    ).all()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_lazy_weights_get_edges(seed: int):
+    config = random_mock_config(seed, 15).get_model()
+    dense = get_dense_weights(config, None, ["key-0"])
+    src, dst = np.random.default_rng(seed).integers(15, size=(2, 50))
+
+    weights, allowed = LazyWeights(config, None, ["key-0"]).get_edges(src, dst)
+
+    assert (allowed == dense.allowed[src, dst]).all()
+    assert (weights[allowed] == dense.weights[src, dst][allowed]).all()